@@ -0,0 +1,113 @@
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .resilience import DeadlineExceededError
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Signos que no cambian la intención de una pregunta ("¿Cuándo...?" == "cuándo...")
+_QUESTION_MARKS = re.compile(r"[¿¡?!]")
+# Puntuación final de palabra (no la de cifras como 1,250 o 1.5)
+_TRAILING_PUNCTUATION = re.compile(r"[.,;:]+(?=\s|$)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normaliza un texto para comparar intenciones: sin tildes, en minúsculas, sin
+    signos de interrogación o exclamación y con los espacios colapsados.
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char)).casefold()
+    text = _QUESTION_MARKS.sub("", text)
+    text = _TRAILING_PUNCTUATION.sub("", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def make_key(*parts: str) -> str:
+    """
+    Clave compacta para un conjunto de textos normalizados.
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(normalize_text(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "followers")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas idénticas en curso: la primera ejecuta la función y las que
+    llegan mientras tanto con la misma clave esperan y reciben su resultado.
+    """
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "executions": 0, "coalesced": 0}
+
+    def do(self, key: str, func: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Ejecuta `func` o espera a la ejecución en curso con la misma clave.
+        Devuelve (resultado, compartido).
+        """
+        with self._lock:
+            self._stats["requests"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["executions"] += 1
+            else:
+                call.followers += 1
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            if not call.event.wait(timeout):
+                raise DeadlineExceededError(f"Plazo agotado esperando una llamada compartida ({self.name})")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            if call.followers:
+                logger.info("%s: %d solicitudes compartieron una ejecución", self.name, call.followers)
+            call.event.set()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Devuelve solicitudes, ejecuciones reales y proporción de solicitudes agrupadas.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            in_flight = len(self._calls)
+        return {
+            **stats,
+            "in_flight": in_flight,
+            "coalescing_ratio": round(stats["coalesced"] / stats["requests"], 3) if stats["requests"] else 0.0,
+        }
@@ -1,19 +1,44 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterator, TYPE_CHECKING
+import itertools
 import logging
+import queue
 import re
-from langchain.chat_models import init_chat_model
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from langchain_core.messages import HumanMessage, AIMessage
-from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
 
-from .state import ConversationState, create_initial_state
-from utils.prompts import SYSTEM_PROMPT
+# LangGraph y el SDK de Vertex se importan bajo demanda (ver `workflow` y
+# `_build_chat_model`) para que importar este módulo sea rápido; el perfilador
+# lo construye quien crea el agente
+if TYPE_CHECKING:
+    from langgraph.graph.state import CompiledStateGraph
+    from .profiling import RequestProfiler
 
-# Configurar logging básico
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+from .state import ConversationState, create_initial_state
+from .scheduler import LLMScheduler, Priority, SchedulerOverloadedError
+from .resilience import Deadline, ResiliencePolicy
+from .message_log import MessageLog
+from .speculation import ToolSpeculator
+from .coalescing import SingleFlight, make_key
+from .tokens import (
+    TokenCounter, PromptBudget, PromptSection, TokenUsageLog, SHRINK_KEEP_HEAD, SHRINK_KEEP_TAIL
+)
+from .model_router import (
+    ModelRouter, TIER_FLASH, TIER_PRO,
+    STAGE_TOOL_SELECTION, STAGE_RESPONSE, STAGE_COMBINED_RESPONSE, STAGE_CLOSING
 )
+from tools.results import ToolResult
+from utils.logging_setup import log_context
+from utils.prompts import (
+    SYSTEM_PROMPT, TOOL_ANSWER_TEMPLATES, DEFAULT_TOOL_ANSWER_TEMPLATE, TOOL_RESULTS_FORMAT_NOTE,
+    MULTI_REQUEST_INTRO, MULTI_REQUEST_SECTION, MULTI_REQUEST_SECTION_PROMPT,
+    MULTI_REQUEST_CLOSING, MULTI_REQUEST_CLOSING_PROMPT, MULTI_REQUEST_TIMEOUT_NOTICE,
+    RESPONSE_INSTRUCTIONS, COMBINED_RESPONSE_INTRO, COMBINED_RESPONSE_INSTRUCTIONS
+)
+
+# Configurar logging (los handlers los instala `utils.logging_setup.configure_logging`
+# en el punto de entrada; los registros por turno usan formato diferido)
 logger = logging.getLogger(__name__)
 
 class ConversationalAgent:
@@ -25,43 +50,189 @@ class ConversationalAgent:
                  project_id: str = None,
                  location: str = None,
                  tools: List = None,
-                 model_name: str = "gemini-1.5-pro"):
+                 model_name: str = "gemini-1.5-pro",
+                 scheduler: Optional[LLMScheduler] = None,
+                 resilience: Optional[ResiliencePolicy] = None,
+                 fallback_model_name: Optional[str] = "gemini-1.5-flash",
+                 fast_model_name: Optional[str] = "gemini-1.5-flash",
+                 stage_models: Optional[Dict[str, str]] = None,
+                 model_factory: Optional[Callable[[str], Any]] = None,
+                 template_answers: bool = True,
+                 history_messages: int = 10,
+                 compress_history_after: Optional[int] = 20,
+                 checkpointing: bool = False,
+                 speculative_tools: bool = True,
+                 pipelined_multi: bool = True,
+                 multi_request_closing: str = "template",
+                 max_prompt_tokens: int = 8000,
+                 token_counter: Optional[TokenCounter] = None,
+                 coalesce_requests: bool = True,
+                 profiler: Optional["RequestProfiler"] = None):
         """
         Inicializa el agente conversacional.
+        
+        `stage_models` permite fijar el nivel ("flash", "pro" o "auto") por etapa
+        y `model_factory` sustituir la construcción de modelos (p. ej. por
+        `FakeChatModel` para pruebas sin conexión). Con `template_answers` las
+        herramientas que marcan su salida como respuesta final se responden con
+        una plantilla local, sin llamar al LLM.
+        
+        El historial de cada sesión se guarda en un `MessageLog` compacto; los
+        prompts incluyen sus últimos `history_messages` mensajes y los anteriores
+        a `compress_history_after` se comprimen. Con `checkpointing` el grafo
+        además guarda sus checkpoints en un `MemorySaver` (útil para depurar).
+        Con `speculative_tools`, cuando la herramienta la elige el LLM se ejecutan
+        en paralelo las herramientas probables y se reutiliza la elegida.
+        Con `pipelined_multi` las solicitudes múltiples se resuelven en paralelo y
+        cada sección se entrega en cuanto está lista; `multi_request_closing`
+        ("template" o "llm") decide cómo se redacta el cierre.
+        Los prompts se ajustan a `max_prompt_tokens` recortando primero el
+        historial antiguo y luego los resultados de herramientas más extensos.
+        Con `coalesce_requests` las llamadas idénticas en curso (mismo prompt
+        normalizado, es decir, misma intención y misma salida de herramienta) y
+        las ejecuciones de herramientas con la misma consulta se comparten.
+        Con un `profiler` los turnos pedidos (`process_message(..., profile=True)`)
+        o muestreados guardan su perfil de CPU y su diff de memoria en disco.
         """
         self.project_id = project_id
         self.location = location
         self.tools = tools or []
         
-        # Inicializar el modelo LLM
-        self.llm = init_chat_model(
-            model_name, 
-            model_provider="google_vertexai",
-            temperature=0.2
+        # Planificador compartido para todas las llamadas al LLM
+        self.scheduler = scheduler or LLMScheduler()
+        
+        # Política de plazos, reintentos y degradación para las llamadas al LLM
+        self.resilience = resilience or ResiliencePolicy()
+        self.fallback_model_name = fallback_model_name
+        self.template_answers = template_answers
+        self.history_messages = history_messages
+        self.compress_history_after = compress_history_after
+        self.checkpointing = checkpointing
+        
+        # Ejecución especulativa de herramientas durante el enrutamiento por LLM
+        self.speculator = ToolSpeculator() if speculative_tools else None
+        
+        # Solicitudes múltiples en tubería: una sección por solicitud, en paralelo
+        self.pipelined_multi = pipelined_multi
+        self.multi_request_closing = multi_request_closing
+        self._section_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="multi-request")
+        
+        # Conteo de tokens, presupuesto por prompt y registro de uso por turno
+        self.token_counter = token_counter or TokenCounter()
+        self.prompt_budget = PromptBudget(max_prompt_tokens, self.token_counter)
+        self.token_usage = TokenUsageLog()
+        self._turn_ids = itertools.count(1)
+        
+        # Agrupación de solicitudes idénticas en curso (una sola llamada real)
+        self.llm_flight = SingleFlight("llm") if coalesce_requests else None
+        self.tool_flight = SingleFlight("tools") if coalesce_requests else None
+        
+        # Perfilado opcional por turno (CPU y memoria)
+        self.profiler = profiler
+        
+        # Destino de los fragmentos de la respuesta por turno transmitido (turn_id -> función)
+        self._token_sinks: Dict[str, Callable[[str], None]] = {}
+        
+        # Enrutador de modelos por nivel: rápido para clasificación, grande cuando hace falta
+        tier_models = {TIER_PRO: model_name}
+        if fast_model_name:
+            tier_models[TIER_FLASH] = fast_model_name
+        self.model_router = ModelRouter(
+            tier_models=tier_models,
+            model_factory=model_factory or self._build_chat_model,
+            stage_tiers=stage_models
         )
         
-        # Inicializar memoria
-        self.memory = MemorySaver()
+        # El modelo principal, la memoria y el grafo se construyen en el primer uso
+        self.memory = None
+        self._workflow = None
+        self._workflow_lock = threading.Lock()
+        logger.info("Agente inicializado con %d herramientas", len(self.tools))
         
-        # Crear y compilar el grafo de estados
-        self.workflow = self._create_workflow()
-        logger.info(f"Agente inicializado con {len(self.tools)} herramientas")
+        # Historial compacto de la conversación por sesión
+        self.conversation_contexts: Dict[str, MessageLog] = {}
         
-        # Diccionario para almacenar el contexto de la conversación por sesión
-        self.conversation_contexts = {}
+    @property
+    def llm(self) -> Any:
+        """
+        Modelo LLM principal, construido en el primer uso.
+        """
+        return self.model_router.get_tier_model(TIER_PRO)
+    
+    @property
+    def workflow(self) -> "CompiledStateGraph":
+        """
+        Grafo de estados compilado, construido en el primer uso.
+        """
+        if self._workflow is None:
+            with self._workflow_lock:
+                if self._workflow is None:
+                    # El historial vive en `conversation_contexts`; los checkpoints
+                    # del grafo solo se guardan si se piden explícitamente
+                    if self.checkpointing:
+                        from langgraph.checkpoint.memory import MemorySaver
+                        self.memory = MemorySaver()
+                    
+                    # Crear y compilar el grafo de estados
+                    self._workflow = self._create_workflow()
+        return self._workflow
+    
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Construye por adelantado el grafo y el modelo principal para que el
+        primer mensaje no pague el costo de importación. Con `background=True`
+        se hace en un hilo aparte y se devuelve dicho hilo.
+        """
+        def _warm() -> None:
+            try:
+                self.workflow
+                self.llm
+            except Exception as e:
+                logger.warning("No se pudo precalentar el agente: %s", e)
         
-    def process_message(self, message: str, session_id: str = "default") -> str:
+        if not background:
+            _warm()
+            return None
+        thread = threading.Thread(target=_warm, name="agent-warm-up", daemon=True)
+        thread.start()
+        return thread
+    
+    def process_message(self, message: str, session_id: str = "default",
+                        priority: Priority = Priority.INTERACTIVE, profile: bool = False,
+                        on_token: Optional[Callable[[str], None]] = None) -> str:
         """
         Procesa un mensaje del usuario y devuelve una respuesta, manteniendo
         el contexto de la conversación para cada sesión.
+        
+        `priority` permite distinguir turnos interactivos de reproducciones por lotes.
+        Con `profile` (y un `profiler` configurado) el turno se perfila. Con
+        `on_token` la respuesta final del LLM se pide por fragmentos y el texto
+        de cada uno se pasa a esa función según llega.
+        """
+        # Contexto del turno: prioridad y plazo absoluto que se propaga a cada llamada al LLM
+        turn_context = self._new_turn_context(message, session_id, priority)
+        turn_id = turn_context["turn_id"]
+        if on_token is not None:
+            self._token_sinks[turn_id] = on_token
+        try:
+            with log_context(session_id, turn_id):
+                if self.profiler is not None and self.profiler.should_profile(profile):
+                    with self.profiler.profile_turn(turn_id, session_id):
+                        return self._process_turn(message, session_id, turn_context)
+                return self._process_turn(message, session_id, turn_context)
+        finally:
+            self._token_sinks.pop(turn_id, None)
+    
+    def _process_turn(self, message: str, session_id: str, turn_context: Dict[str, Any]) -> str:
+        """
+        Ejecuta un turno completo: solicitudes múltiples o el grafo de estados.
         """
         try:
             # Configuración para el checkpointer
             config = {"configurable": {"thread_id": session_id}}
             
             # Crear o recuperar el historial de mensajes para esta sesión
-            if session_id not in self.conversation_contexts:
-                self.conversation_contexts[session_id] = []
+            session_log = self._get_session_log(session_id)
             
             # Añadir el nuevo mensaje a la lista
             human_msg = HumanMessage(content=message)
@@ -69,14 +240,26 @@ class ConversationalAgent:
             # Pre-análisis para detectar solicitudes múltiples
             multi_requests = self._detect_multiple_requests(message)
             if multi_requests:
-                logger.info(f"Detectadas múltiples solicitudes: {multi_requests}")
+                logger.info("Detectadas %d solicitudes en el mensaje", len(multi_requests))
+                if self.pipelined_multi:
+                    # Si el turno se transmite, cada sección se entrega en cuanto está lista
+                    on_token = self._token_sinks.get(turn_context["turn_id"])
+                    sections = []
+                    for section in self._stream_multiple_requests(message, multi_requests, session_id, turn_context):
+                        if on_token is not None:
+                            on_token(section)
+                        sections.append(section)
+                    return "".join(sections)
                 # Procesar cada solicitud por separado y combinar resultados
-                results = self._process_multiple_requests(multi_requests, session_id)
+                results = self._process_multiple_requests(multi_requests, session_id, turn_context)
+                session_log.add_turn(message, results)
                 return results
             
             # Construir el input con el historial actualizado
             state_input = {
-                "messages": [human_msg]
+                "messages": [human_msg],
+                "context": turn_context,
+                "tool_results": {}
             }
             
             # Ejecutar el workflow con checkpointing
@@ -88,18 +271,121 @@ class ConversationalAgent:
             # Obtener el último mensaje del agente
             for msg in reversed(messages):
                 if isinstance(msg, AIMessage):
-                    # Guardar el mensaje en el contexto
-                    self.conversation_contexts[session_id].append(human_msg)
-                    self.conversation_contexts[session_id].append(msg)
+                    # Guardar el turno en el historial compacto de la sesión
+                    session_log.add_turn(message, msg.content)
                     return msg.content
             
             # Si no hay respuesta del agente
             return "Lo siento, no pude procesar tu mensaje."
             
         except Exception as e:
-            logger.error(f"Error al procesar mensaje: {str(e)}")
+            logger.error("Error al procesar mensaje (%d caracteres): %s", len(message), e)
             return f"Lo siento, ocurrió un error: {str(e)}"
     
+    def _new_turn_context(self, message: str, session_id: str, priority: Priority) -> Dict[str, Any]:
+        """
+        Contexto inicial de un turno: sesión, prioridad, plazo absoluto y tamaño del mensaje.
+        """
+        return {
+            "session_id": session_id,
+            "turn_id": f"{session_id}-{next(self._turn_ids)}",
+            "priority": int(priority),
+            "deadline": self.resilience.new_deadline().expires_at,
+            "user_message_chars": len(message)
+        }
+    
+    def get_token_usage(self, session_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Devuelve el uso de tokens de los últimos turnos: tokens de entrada y salida
+        por llamada, tokens por sección del prompt y secciones recortadas.
+        """
+        return self.token_usage.recent(limit, session_id)
+    
+    def export_token_usage(self, path: str) -> int:
+        """
+        Exporta el uso de tokens por turno a un archivo JSONL.
+        """
+        return self.token_usage.export_jsonl(path)
+    
+    def export_session(self, session_id: str) -> List[Dict[str, str]]:
+        """
+        Exporta el historial de una sesión como lista de {"role", "content"}
+        (p. ej. para migrarla a otro proceso).
+        """
+        session_log = self.conversation_contexts.get(session_id)
+        return session_log.to_records() if session_log is not None else []
+    
+    def import_session(self, session_id: str, history: List[Dict[str, str]]) -> None:
+        """
+        Restaura el historial de una sesión exportada con `export_session`.
+        """
+        self.conversation_contexts[session_id] = MessageLog.from_records(
+            history, compress_after=self.compress_history_after
+        )
+    
+    def _get_session_log(self, session_id: str) -> MessageLog:
+        """
+        Devuelve (o crea) el historial compacto de una sesión.
+        """
+        session_log = self.conversation_contexts.get(session_id)
+        if session_log is None:
+            session_log = self.conversation_contexts.setdefault(
+                session_id, MessageLog(compress_after=self.compress_history_after)
+            )
+        return session_log
+    
+    def drop_session(self, session_id: str) -> None:
+        """
+        Elimina el historial y el checkpoint de una sesión.
+        """
+        self.conversation_contexts.pop(session_id, None)
+        if self.memory is not None:
+            self.memory.delete_thread(session_id)
+        if self.profiler is not None:
+            self.profiler.forget(session_id)
+    
+    def stream_message(self, message: str, session_id: str = "default",
+                       priority: Priority = Priority.INTERACTIVE, profile: bool = False) -> Iterator[str]:
+        """
+        Procesa un mensaje y entrega la respuesta a medida que se genera.
+        
+        El turno corre en otro hilo con `process_message` (mismo contexto de
+        registro y perfilado) y los fragmentos del LLM se entregan según
+        llegan. Las respuestas que no pasan por el LLM (plantillas, errores) se
+        entregan enteras al final; si el texto final difiere de lo ya
+        transmitido (p. ej. un error a mitad de respuesta), se añade aparte.
+        Las solicitudes múltiples en tubería se entregan sección a sección a
+        medida que cada una termina, sin esperar a las demás.
+        """
+        chunks: "queue.Queue[Optional[str]]" = queue.Queue()
+        outcome: Dict[str, Any] = {}
+        
+        def run_turn() -> None:
+            try:
+                outcome["response"] = self.process_message(message, session_id, priority, profile, on_token=chunks.put)
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                chunks.put(None)
+        
+        threading.Thread(target=run_turn, name="stream-turn", daemon=True).start()
+        streamed = []
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            streamed.append(chunk)
+            yield chunk
+        
+        if "error" in outcome:
+            raise outcome["error"]
+        response, sent = outcome["response"], "".join(streamed)
+        if response.startswith(sent):
+            if len(response) > len(sent):
+                yield response[len(sent):]
+        else:
+            yield "\n\n" + response
+    
     def _detect_multiple_requests(self, message: str) -> List[str]:
         """
         Detecta si el mensaje contiene múltiples solicitudes separadas.
@@ -171,51 +457,133 @@ class ConversationalAgent:
             return any(syn in text for syn in synonyms[concept])
         return False
     
-    def _process_multiple_requests(self, requests: List[str], session_id: str) -> str:
+    def _sub_request_query(self, request: str) -> Optional[tuple]:
+        """
+        Traduce una solicitud individual a (herramienta, consulta adaptada).
+        """
+        if "ranking" in request:
+            # Extraer el tipo de ranking
+            r_type = request.replace("ranking por ", "")
+            return "company_ranking", f"dame el ranking de empresas por {r_type}"
+        if "festivo" in request or "feriado" in request:
+            return "datetime", "dime los próximos días festivos"
+        if "fecha" in request:
+            return "datetime", "qué fecha es hoy"
+        if "hora" in request:
+            return "datetime", "qué hora es ahora"
+        return None
+    
+    def _process_multiple_requests(self, requests: List[str], session_id: str,
+                                   context: Optional[Dict[str, Any]] = None) -> str:
         """
         Procesa múltiples solicitudes y combina los resultados en una sola respuesta.
         """
         results = {}
         
         for request in requests:
-            logger.info(f"Procesando solicitud individual: {request}")
+            logger.debug("Procesando solicitud individual (%d caracteres)", len(request))
             
-            # Preparar mensaje adaptado para cada solicitud
-            if "ranking" in request:
-                # Extraer el tipo de ranking
-                r_type = request.replace("ranking por ", "")
-                message = f"dame el ranking de empresas por {r_type}"
-                
-                # Forzar el uso de la herramienta company_ranking
-                tool_results = self._force_tool_execution("company_ranking", message)
-                results[request] = tool_results
-                
-            elif "festivo" in request or "feriado" in request:
-                message = "dime los próximos días festivos"
-                
-                # Forzar el uso de la herramienta datetime
-                tool_results = self._force_tool_execution("datetime", message)
-                results[request] = tool_results
-                
-            elif "fecha" in request:
-                message = "qué fecha es hoy"
-                
-                # Forzar el uso de la herramienta datetime
-                tool_results = self._force_tool_execution("datetime", message)
-                results[request] = tool_results
-                
-            elif "hora" in request:
-                message = "qué hora es ahora"
-                
-                # Forzar el uso de la herramienta datetime
-                tool_results = self._force_tool_execution("datetime", message)
-                results[request] = tool_results
+            # Forzar el uso de la herramienta correspondiente con un mensaje adaptado
+            sub_query = self._sub_request_query(request)
+            if sub_query:
+                tool_name, message = sub_query
+                results[request] = self._force_tool_execution(tool_name, message)
         
         # Combinar resultados en una sola respuesta
-        response = self._generate_combined_response(results)
+        response = self._generate_combined_response(results, context)
         return response
     
-    def _force_tool_execution(self, tool_name: str, query: str) -> str:
+    def _stream_multiple_requests(self, message: str, requests: List[str], session_id: str,
+                                  context: Dict[str, Any]) -> Iterator[str]:
+        """
+        Variante en tubería de `_process_multiple_requests`: cada solicitud se
+        resuelve en paralelo y su sección se entrega en cuanto está lista; al
+        final se añade un cierre (plantilla local o una pasada corta del LLM).
+        """
+        parts: List[str] = []
+        futures = {
+            self._section_executor.submit(self._run_in_log_context, context, self._build_section, request, context): request
+            for request in requests
+        }
+        try:
+            parts.append(MULTI_REQUEST_INTRO)
+            yield MULTI_REQUEST_INTRO
+            
+            deadline = context.get("deadline")
+            timeout = Deadline(deadline).remaining() if deadline else None
+            try:
+                for future in as_completed(futures, timeout=timeout):
+                    section = future.result()
+                    if section:
+                        parts.append(section)
+                        yield section
+            except FuturesTimeoutError:
+                pending = [request for future, request in futures.items() if not future.done()]
+                logger.warning("Plazo agotado con %d de %d solicitudes pendientes", len(pending), len(requests))
+                notice = MULTI_REQUEST_TIMEOUT_NOTICE.format(requests=", ".join(pending))
+                parts.append(notice)
+                yield notice
+            
+            closing = self._closing_section(requests, context)
+            parts.append(closing)
+            yield closing
+        finally:
+            for future in futures:
+                future.cancel()
+            self._get_session_log(session_id).add_turn(message, "".join(parts))
+    
+    @staticmethod
+    def _run_in_log_context(context: Dict[str, Any], fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Ejecuta `fn` en otro hilo con la sesión y el turno del contexto en sus registros.
+        """
+        with log_context(context.get("session_id"), context.get("turn_id")):
+            return fn(*args)
+    
+    def _build_section(self, request: str, context: Dict[str, Any]) -> str:
+        """
+        Ejecuta la herramienta de una solicitud y redacta su sección: con la
+        plantilla local si el resultado ya es la respuesta, o con una llamada
+        corta al LLM que solo recibe ese resultado.
+        """
+        sub_query = self._sub_request_query(request)
+        if not sub_query:
+            return ""
+        tool_name, query = sub_query
+        logger.debug("Procesando solicitud individual (%d caracteres)", len(request))
+        result = self._force_tool_execution(tool_name, query)
+        
+        tool = next((t for t in self.tools if t.name.lower() == tool_name), None)
+        if self.template_answers and tool is not None and tool.is_final_answer(query):
+            body = result.render()
+        else:
+            # El resultado puede ocupar como máximo la mitad del presupuesto del prompt
+            result_text = self.token_counter.truncate(result.compact(), self.prompt_budget.max_prompt_tokens // 2)
+            prompt = MULTI_REQUEST_SECTION_PROMPT.format(
+                system_prompt=SYSTEM_PROMPT, request=request,
+                format_note=TOOL_RESULTS_FORMAT_NOTE, result=result_text
+            )
+            section_context = {**context, "selected_tool": tool_name, "routing": "keyword"}
+            try:
+                body = self._invoke_llm(prompt, section_context, stage=STAGE_RESPONSE).content
+            except Exception as e:
+                logger.error("Error redactando la sección de %s: %s", tool_name, e)
+                body = result.render()
+        return MULTI_REQUEST_SECTION.format(title=request.capitalize(), body=body.strip())
+    
+    def _closing_section(self, requests: List[str], context: Dict[str, Any]) -> str:
+        """
+        Texto final que enlaza las secciones de una respuesta múltiple.
+        """
+        if self.multi_request_closing == "llm":
+            prompt = MULTI_REQUEST_CLOSING_PROMPT.format(requests=", ".join(requests))
+            try:
+                return self._invoke_llm(prompt, context, stage=STAGE_CLOSING).content.strip()
+            except Exception as e:
+                logger.warning("No se pudo generar el cierre con el LLM: %s", e)
+        return MULTI_REQUEST_CLOSING
+    
+    def _force_tool_execution(self, tool_name: str, query: str) -> ToolResult:
         """
         Fuerza la ejecución de una herramienta específica.
         """
@@ -224,45 +592,196 @@ class ConversationalAgent:
             tool = next((t for t in self.tools if t.name.lower() == tool_name.lower()), None)
             
             if tool:
-                logger.info(f"Forzando ejecución de herramienta: {tool_name}")
-                result = tool.run(query)
-                logger.info(f"Resultado obtenido de la herramienta {tool_name}")
+                logger.info("Forzando ejecución de herramienta: %s", tool_name)
+                result = self._run_tool(tool, query)
+                logger.debug("Resultado obtenido de la herramienta %s", tool_name)
                 return result
             else:
-                logger.warning(f"Herramienta no encontrada: {tool_name}")
-                return f"No se encontró la herramienta {tool_name}"
+                logger.warning("Herramienta no encontrada: %s", tool_name)
+                return ToolResult.message(tool_name, f"No se encontró la herramienta {tool_name}")
                 
         except Exception as e:
-            logger.error(f"Error ejecutando herramienta {tool_name}: {str(e)}")
-            return f"Error al ejecutar la herramienta {tool_name}: {str(e)}"
+            logger.error("Error ejecutando herramienta %s: %s", tool_name, e)
+            return ToolResult.message(tool_name, f"Error al ejecutar la herramienta {tool_name}: {str(e)}")
     
-    def _generate_combined_response(self, results: Dict[str, str]) -> str:
+    def _generate_combined_response(self, results: Dict[str, ToolResult],
+                                    context: Optional[Dict[str, Any]] = None) -> str:
         """
         Genera una respuesta combinada basada en los resultados de múltiples solicitudes.
         """
-        # Construir un prompt para el LLM para generar una respuesta combinada
-        prompt = f"""{SYSTEM_PROMPT}
-
-El usuario ha solicitado múltiples tipos de información. He obtenido los siguientes resultados:
-
-"""
-        
+        # Construir un prompt para el LLM para generar una respuesta combinada;
+        # si no cabe en el presupuesto se recortan primero los resultados más extensos
+        sections = [
+            PromptSection("system", SYSTEM_PROMPT, priority=100),
+            PromptSection("intro", COMBINED_RESPONSE_INTRO.format(format_note=TOOL_RESULTS_FORMAT_NOTE), priority=100),
+        ]
         for request, result in results.items():
-            prompt += f"--- Información sobre {request} ---\n{result}\n\n"
-        
-        prompt += """
-Por favor, genera una respuesta única que combine todos estos resultados de manera coherente y natural.
-La respuesta debe fluir bien y no parecer simplemente una lista de resultados pegados juntos.
-"""
+            sections.append(PromptSection(
+                f"result:{request}", result.compact(), priority=40, shrink=SHRINK_KEEP_HEAD,
+                header=f"--- Información sobre {request} ---\n"
+            ))
+        sections.append(PromptSection("instructions", COMBINED_RESPONSE_INSTRUCTIONS, priority=100))
+        prompt, prompt_usage = self.prompt_budget.fit(sections)
         
         # Generar respuesta con el LLM
-        response = self.llm.invoke(prompt)
+        stage_context = {**(context or {}), "result_count": len(results)}
+        response = self._invoke_llm(prompt, stage_context, stage=STAGE_COMBINED_RESPONSE, prompt_usage=prompt_usage)
         return response.content
     
-    def _create_workflow(self) -> StateGraph:
+    def _invoke_llm(self, prompt: str, context: Optional[Dict[str, Any]] = None,
+                    stage: str = STAGE_RESPONSE, prompt_usage: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Invoca el LLM a través del planificador y la política de resiliencia,
+        usando la prioridad y el plazo del turno y el nivel de modelo de la etapa.
+        Registra los tokens de la llamada (exactos si el modelo los reporta) y,
+        con `prompt_usage`, los tokens por sección del prompt. Si ya hay en curso
+        una llamada con el mismo prompt normalizado en la misma etapa, se espera
+        su respuesta en lugar de repetirla.
+        """
+        context = context or {}
+        tier = self.model_router.select_tier(stage, prompt, context)
+        llm = self.model_router.get_tier_model(tier)
+        priority = Priority(context.get("priority", Priority.INTERACTIVE))
+        if "deadline" in context:
+            deadline = Deadline(context["deadline"])
+        else:
+            deadline = self.resilience.new_deadline()
+        
+        def primary(max_wait: float) -> Any:
+            return self.scheduler.invoke(llm, prompt, priority=priority, max_wait=max_wait)
+        
+        fallback = None
+        fallback_llm = self._get_fallback_llm()
+        if fallback_llm is not None and fallback_llm is not llm:
+            def fallback(max_wait: float) -> Any:
+                return self.scheduler.invoke(fallback_llm, prompt, priority=priority, max_wait=max_wait)
+        
+        start = time.monotonic()
+        
+        def call() -> Any:
+            try:
+                return self.resilience.call(primary, deadline, fallback)
+            except Exception:
+                self.model_router.record(tier, time.monotonic() - start, 0, 0, error=True)
+                raise
+        
+        shared = False
+        if self.llm_flight is not None:
+            key = make_key(stage, tier, prompt)
+            response, shared = self.llm_flight.do(key, call, timeout=deadline.remaining())
+            if shared:
+                # Cada llamador recibe su propia copia de la respuesta compartida
+                response = response.model_copy() if hasattr(response, "model_copy") else response
+        else:
+            response = call()
+        
+        self._record_llm_usage(response, prompt, context, stage, tier, start, prompt_usage, shared)
+        return response
+    
+    def _stream_llm(self, prompt: str, context: Dict[str, Any], on_token: Callable[[str], None],
+                    stage: str = STAGE_RESPONSE, prompt_usage: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Variante de `_invoke_llm` que pide la respuesta por fragmentos (`llm.stream`)
+        y pasa el texto de cada uno a `on_token` en cuanto llega. Usa el mismo
+        planificador, plazo, reintentos y degradación; las respuestas por
+        fragmentos no se agrupan con otras llamadas. Devuelve el mensaje completo.
+        """
+        tier = self.model_router.select_tier(stage, prompt, context)
+        llm = self.model_router.get_tier_model(tier)
+        priority = Priority(context.get("priority", Priority.INTERACTIVE))
+        if "deadline" in context:
+            deadline = Deadline(context["deadline"])
+        else:
+            deadline = self.resilience.new_deadline()
+        
+        def primary(max_wait: float) -> Iterator[Any]:
+            return self.scheduler.stream(llm, prompt, priority=priority, max_wait=max_wait)
+        
+        fallback = None
+        fallback_llm = self._get_fallback_llm()
+        if fallback_llm is not None and fallback_llm is not llm:
+            def fallback(max_wait: float) -> Iterator[Any]:
+                return self.scheduler.stream(fallback_llm, prompt, priority=priority, max_wait=max_wait)
+        
+        start = time.monotonic()
+        response = None
+        try:
+            for chunk in self.resilience.stream(primary, deadline, fallback):
+                # Los fragmentos de LangChain se suman en un solo mensaje (contenido y uso)
+                response = chunk if response is None else response + chunk
+                if isinstance(chunk.content, str) and chunk.content:
+                    on_token(chunk.content)
+        except Exception:
+            self.model_router.record(tier, time.monotonic() - start, 0, 0, error=True)
+            raise
+        if response is None:
+            response = AIMessage(content="")
+        
+        self._record_llm_usage(response, prompt, context, stage, tier, start, prompt_usage, shared=False)
+        return response
+    
+    def _record_llm_usage(self, response: Any, prompt: str, context: Dict[str, Any], stage: str, tier: str,
+                          start: float, prompt_usage: Optional[Dict[str, Any]], shared: bool) -> None:
+        """
+        Anota los tokens de una llamada en el enrutador y en el registro del turno.
+        """
+        # Preferir el conteo que reporta el modelo; si no, el conteo local
+        usage_metadata = getattr(response, "usage_metadata", None) or {}
+        exact = bool(usage_metadata.get("input_tokens"))
+        if exact:
+            prompt_tokens = usage_metadata["input_tokens"]
+            completion_tokens = usage_metadata.get("output_tokens", 0)
+        else:
+            prompt_tokens = prompt_usage["prompt_tokens"] if prompt_usage else self.token_counter.count(prompt)
+            completion_tokens = self.token_counter.count(str(response.content))
+        
+        # Las llamadas agrupadas no consumen tokens en el modelo: solo se anotan en el turno
+        if not shared:
+            self.model_router.record(tier, time.monotonic() - start, prompt_tokens, completion_tokens)
+        self.token_usage.record(context, stage, tier, prompt_tokens, completion_tokens, exact, prompt_usage,
+                                coalesced=shared)
+    
+    def _run_tool(self, tool: Any, query: str) -> ToolResult:
+        """
+        Ejecuta una herramienta, compartiendo el resultado con las ejecuciones
+        idénticas (misma herramienta y consulta normalizada) que estén en curso.
+        """
+        if self.tool_flight is None:
+            return tool.run_structured(query)
+        result, _ = self.tool_flight.do(make_key(tool.name, query), lambda: tool.run_structured(query))
+        return result
+    
+    def _build_chat_model(self, model_name: str) -> Any:
+        """
+        Construye un modelo de chat de Vertex AI.
+        """
+        from langchain.chat_models import init_chat_model
+        
+        return init_chat_model(
+            model_name,
+            model_provider="google_vertexai",
+            temperature=0.2
+        )
+    
+    def _get_fallback_llm(self) -> Any:
+        """
+        Construye bajo demanda el modelo de respaldo (más rápido y barato).
+        """
+        if not self.fallback_model_name:
+            return None
+        try:
+            return self.model_router.get_model(self.fallback_model_name)
+        except Exception as e:
+            logger.warning("No se pudo inicializar el modelo de respaldo: %s", e)
+            self.fallback_model_name = None
+            return None
+    
+    def _create_workflow(self) -> "CompiledStateGraph":
         """
         Crea el grafo de estados para el agente.
         """
+        from langgraph.graph import StateGraph, END
+        
         # Crear el grafo con el tipo de estado definido
         workflow = StateGraph(ConversationState)
         
@@ -285,7 +804,15 @@ La respuesta debe fluir bien y no parecer simplemente una lista de resultados pe
             }
         )
         
-        workflow.add_edge("execute_tool", "generate_response")
+        # Si la herramienta ya produjo la respuesta final, terminar sin llamar al LLM
+        workflow.add_conditional_edges(
+            "execute_tool",
+            self._needs_generation,
+            {
+                True: "generate_response",
+                False: END
+            }
+        )
         workflow.add_edge("generate_response", END)
         
         # Definir el punto de entrada
@@ -328,10 +855,10 @@ La respuesta debe fluir bien y no parecer simplemente una lista de resultados pe
             # Esto ayuda a forzar el uso de herramientas cuando el LLM podría no detectarlas
             tool_to_use = self._pre_check_tools(last_message)
             if tool_to_use:
-                logger.info(f"Pre-detección directa de herramienta: {tool_to_use}")
+                logger.info("Pre-detección directa de herramienta: %s", tool_to_use)
                 # Actualizar el contexto con la herramienta seleccionada directamente
                 context = state.get("context", {})
-                updated_context = {**context, "selected_tool": tool_to_use}
+                updated_context = {**context, "selected_tool": tool_to_use, "routing": "keyword"}
                 return {
                     **state,
                     "context": updated_context,
@@ -358,8 +885,17 @@ La respuesta debe fluir bien y no parecer simplemente una lista de resultados pe
             - NO respondas "ninguna" a menos que estés 100% seguro de que ninguna herramienta es apropiada.
             """
             
+            # Mientras el LLM decide, ejecutar en paralelo las herramientas probables
+            speculation = self.speculator.start(last_message, self.tools) if self.speculator else None
+            
             # Consultar al LLM
-            response = self.llm.invoke(tool_selection_prompt)
+            try:
+                response = self._invoke_llm(tool_selection_prompt, state.get("context", {}),
+                                            stage=STAGE_TOOL_SELECTION)
+            except Exception:
+                if speculation is not None:
+                    speculation.resolve("ninguna")
+                raise
             tool_response = response.content.strip().lower()
             
             # Procesar la respuesta para extraer el nombre de la herramienta
@@ -374,7 +910,7 @@ La respuesta debe fluir bien y no parecer simplemente una lista de resultados pe
                     tool_to_use = name
                     break
             
-            logger.info(f"Herramienta seleccionada: {tool_to_use}")
+            logger.info("Herramienta seleccionada: %s", tool_to_use)
             
             # Asegurarse de que context esté inicializado
             context = state.get("context", {})
@@ -382,21 +918,34 @@ La respuesta debe fluir bien y no parecer simplemente una lista de resultados pe
             # Actualizar el contexto con la herramienta seleccionada
             updated_context = {
                 **context,
-                "selected_tool": tool_to_use
+                "selected_tool": tool_to_use,
+                "routing": "llm"
             }
             
+            # Reutilizar el resultado especulativo de la herramienta elegida, si lo hay
+            tool_results = state.get("tool_results", {})
+            if speculation is not None:
+                deadline = context.get("deadline")
+                timeout = Deadline(deadline).remaining() if deadline else None
+                speculative_result = speculation.resolve(tool_to_use, timeout=timeout)
+                if speculative_result is not None:
+                    logger.info("Acierto de ejecución especulativa: %s", tool_to_use)
+                    tool_results = {**tool_results, tool_to_use: speculative_result}
+                    updated_context["speculative_hit"] = True
+            
             return {
                 **state,
                 "context": updated_context,
+                "tool_results": tool_results,
                 "next_step": "execute_tool" if tool_to_use != "ninguna" else "generate_response"
             }
             
         except Exception as e:
-            logger.error(f"Error en select_tool: {str(e)}")
+            logger.error("Error en select_tool: %s", e)
             # Devolver un estado seguro con un contexto vacío
             return {
                 **state,
-                "context": {"selected_tool": "ninguna"},
+                "context": {**state.get("context", {}), "selected_tool": "ninguna"},
                 "next_step": "generate_response"  # En caso de error, ir directamente a la respuesta
             }
     
@@ -410,14 +959,15 @@ La respuesta debe fluir bien y no parecer simplemente una lista de resultados pe
         # Palabras clave para datetime
         datetime_keywords = [
             "fecha", "día", "hora", "tiempo", "feriado", "festivo", "holiday",
-            "zona horaria", "calendario", "reloj", "cuando es", "qué día", "que hora"
+            "zona horaria", "calendario", "reloj", "cuando es", "qué día", "que hora",
+            "reunión", "llamada"
         ]
         
         # Palabras clave para company_ranking
         company_keywords = [
             "empresa", "compañía", "ranking", "rank", "clasificación", "top", 
             "mayor", "mejor", "inversión", "ingresos", "valor", "mercado", 
-            "empleados", "trabajadores", "personal"
+            "empleados", "trabajadores", "personal", "factur", "invierte"
         ]
         
         # Verificar coincidencias para cada herramienta
@@ -461,9 +1011,25 @@ La respuesta debe fluir bien y no parecer simplemente una lista de resultados pe
                     break
             
             if selected_tool:
-                logger.info(f"Ejecutando herramienta: {selected_tool.name}")
-                result = selected_tool.run(last_message)
-                tool_results[selected_tool.name] = result
+                if context.get("speculative_hit") and selected_tool.name in tool_results:
+                    # La herramienta ya se ejecutó mientras el LLM decidía
+                    result = tool_results[selected_tool.name]
+                else:
+                    logger.info("Ejecutando herramienta: %s", selected_tool.name)
+                    result = self._run_tool(selected_tool, last_message)
+                    tool_results[selected_tool.name] = result
+                
+                # Vía rápida: la herramienta ya tiene la respuesta completa
+                if self.template_answers and selected_tool.is_final_answer(last_message):
+                    logger.info("Respuesta directa con plantilla para %s", selected_tool.name)
+                    answer = self._render_tool_answer(selected_tool.name, result)
+                    return {
+                        **state,
+                        "messages": messages + [AIMessage(content=answer)],
+                        "context": {**context, "final_answer": True},
+                        "tool_results": tool_results,
+                        "next_step": "complete"
+                    }
                 
                 return {
                     **state,
@@ -471,19 +1037,32 @@ La respuesta debe fluir bien y no parecer simplemente una lista de resultados pe
                     "next_step": "generate_response"
                 }
             else:
-                logger.warning(f"No se encontró la herramienta: {selected_tool_name}")
+                logger.warning("No se encontró la herramienta: %s", selected_tool_name)
                 return {
                     **state,
                     "next_step": "generate_response"
                 }
                 
         except Exception as e:
-            logger.error(f"Error ejecutando herramienta: {str(e)}")
+            logger.error("Error ejecutando herramienta: %s", e)
             return {
                 **state,
                 "next_step": "generate_response"
             }
     
+    def _needs_generation(self, state: ConversationState) -> bool:
+        """
+        Determina si hace falta generar la respuesta con el LLM tras ejecutar la herramienta.
+        """
+        return state.get("next_step") != "complete"
+    
+    def _render_tool_answer(self, tool_name: str, result: ToolResult) -> str:
+        """
+        Construye la respuesta final a partir del resultado de una herramienta.
+        """
+        template = TOOL_ANSWER_TEMPLATES.get(tool_name, DEFAULT_TOOL_ANSWER_TEMPLATE)
+        return template.format(result=result.render().strip())
+    
     def _generate_response(self, state: ConversationState) -> ConversationState:
         """
         Genera una respuesta basada en el estado actual.
@@ -493,33 +1072,45 @@ La respuesta debe fluir bien y no parecer simplemente una lista de resultados pe
             # Acceso seguro a tool_results
             tool_results = state.get("tool_results", {})
             
+            # Historial previo de la sesión: se convierte a mensajes solo aquí, al construir el prompt
+            session_id = state.get("context", {}).get("session_id")
+            previous_messages = []
+            if session_id in self.conversation_contexts and self.history_messages > 0:
+                previous_messages = self.conversation_contexts[session_id].to_messages(self.history_messages)
+            
             # Construir el contexto para el LLM
-            history = "\n".join([f"Usuario: {msg.content}" if isinstance(msg, HumanMessage) else f"Asistente: {msg.content}" for msg in messages])
+            def as_lines(items: List[Any]) -> str:
+                return "\n".join([f"Usuario: {msg.content}" if isinstance(msg, HumanMessage) else f"Asistente: {msg.content}" for msg in items])
+            history = as_lines(previous_messages)
+            current = as_lines(messages)
             
             # Añadir resultados de herramientas si hay
             tool_info = ""
             if tool_results:
-                tool_info = "Resultados de herramientas:\n"
-                for tool_name, result in tool_results.items():
-                    tool_info += f"- {tool_name}: {result}\n"
+                tool_info = "".join(f"- {tool_name}:\n{result.compact()}\n" for tool_name, result in tool_results.items())
             
-            # El prompt final para el LLM
-            prompt = f"""{SYSTEM_PROMPT}
-
-Historial de conversación:
-{history}
-
-{tool_info}
-
-Por favor, genera una respuesta apropiada para el usuario basada en toda esta información.
-Recuerda: 
-1. Usa EXACTAMENTE los datos proporcionados por las herramientas, no los inventes ni modifiques.
-2. Si las herramientas proporcionan nombres, cifras o datos específicos, úsalos tal cual.
-3. Cuando las herramientas devuelven resultados, haz que tu respuesta sea clara y directa.
-"""
+            # El prompt final para el LLM: si excede el presupuesto se recorta primero
+            # el historial (conservando los mensajes más recientes) y luego los resultados
+            prompt, prompt_usage = self.prompt_budget.fit([
+                PromptSection("system", SYSTEM_PROMPT, priority=100),
+                PromptSection("history", history, priority=10, shrink=SHRINK_KEEP_TAIL,
+                              header="Historial de conversación:\n"),
+                PromptSection("user_message", current, priority=90,
+                              header="" if history else "Historial de conversación:\n"),
+                PromptSection("tool_results", tool_info, priority=50, shrink=SHRINK_KEEP_HEAD,
+                              header=f"{TOOL_RESULTS_FORMAT_NOTE}\n\nResultados de herramientas:\n",
+                              min_tokens=256),
+                PromptSection("instructions", RESPONSE_INSTRUCTIONS, priority=100),
+            ])
             
-            # Generar respuesta con el LLM
-            response = self.llm.invoke(prompt)
+            # Generar respuesta con el LLM; si el turno se transmite, por fragmentos
+            context = state.get("context", {})
+            on_token = self._token_sinks.get(context.get("turn_id"))
+            if on_token is not None:
+                response = self._stream_llm(prompt, context, on_token, stage=STAGE_RESPONSE,
+                                            prompt_usage=prompt_usage)
+            else:
+                response = self._invoke_llm(prompt, context, stage=STAGE_RESPONSE, prompt_usage=prompt_usage)
             
             # Actualizar el estado con la respuesta
             new_messages = messages + [AIMessage(content=response.content)]
@@ -531,9 +1122,14 @@ Recuerda:
             }
             
         except Exception as e:
-            logger.error(f"Error generando respuesta: {str(e)}")
+            logger.error("Error generando respuesta: %s", e)
             # Añadir un mensaje de error como respuesta
-            error_response = "Lo siento, tuve un problema al generar una respuesta. Por favor, intenta nuevamente."
+            if isinstance(e, SchedulerOverloadedError):
+                error_response = "En este momento estoy atendiendo muchas solicitudes. Por favor, intenta nuevamente en unos segundos."
+            elif isinstance(e, TimeoutError):
+                error_response = "Lo siento, la respuesta está tardando más de lo normal. Por favor, intenta nuevamente."
+            else:
+                error_response = "Lo siento, tuve un problema al generar una respuesta. Por favor, intenta nuevamente."
             new_messages = messages + [AIMessage(content=error_response)]
             
             return {
@@ -0,0 +1,93 @@
+import random
+import re
+import threading
+import time
+from typing import Any, Iterator, Optional, Sequence
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+
+class FakeChatModel:
+    """
+    Modelo de chat local que imita las interfaces `invoke` y `stream` de los modelos de LangChain.
+
+    Permite probar el enrutamiento por niveles, la resiliencia y la carga del agente
+    sin acceso a Vertex AI. La latencia sigue una distribución log-normal.
+    """
+
+    def __init__(self,
+                 model_name: str = "fake-model",
+                 latency_median: float = 0.0,
+                 latency_sigma: float = 0.0,
+                 failure_rate: float = 0.0,
+                 tool_names: Sequence[str] = ("datetime", "company_ranking"),
+                 chunk_words: int = 4,
+                 chunk_delay: float = 0.0,
+                 seed: Optional[int] = None):
+        self.model_name = model_name
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.failure_rate = failure_rate
+        self.tool_names = list(tool_names)
+        self.chunk_words = chunk_words
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _sample_latency(self) -> float:
+        if self.latency_median <= 0:
+            return 0.0
+        with self._lock:
+            return self.latency_median * self._random.lognormvariate(0.0, self.latency_sigma)
+
+    def invoke(self, prompt: Any, config: Optional[dict] = None, **kwargs) -> AIMessage:
+        """
+        Devuelve una respuesta determinista tras simular la latencia del modelo.
+        """
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.failure_rate
+        time.sleep(self._sample_latency())
+        if fail:
+            raise RuntimeError(f"503 {self.model_name} unavailable (simulado)")
+
+        text = str(prompt)
+        return AIMessage(content=self._answer(text))
+
+    def stream(self, prompt: Any, config: Optional[dict] = None, **kwargs) -> Iterator[AIMessageChunk]:
+        """
+        Igual que `invoke`, pero entrega la respuesta en fragmentos de pocas
+        palabras separados por `chunk_delay` segundos.
+        """
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.failure_rate
+        time.sleep(self._sample_latency())
+        if fail:
+            raise RuntimeError(f"503 {self.model_name} unavailable (simulado)")
+
+        words = re.findall(r'\S+\s*|\s+', self._answer(str(prompt)))
+        for i in range(0, len(words), self.chunk_words):
+            if i and self.chunk_delay > 0:
+                time.sleep(self.chunk_delay)
+            yield AIMessageChunk(content="".join(words[i:i + self.chunk_words]))
+
+    def _answer(self, text: str) -> str:
+        # Prompt de selección de herramienta: responder solo con el nombre
+        if "Herramientas disponibles" in text:
+            said = re.search(r'El usuario ha dicho: "(.*?)"', text, re.DOTALL)
+            user_text = said.group(1).lower() if said else text.lower()
+            if any(word in user_text for word in ["hora", "fecha", "feriado", "día", "navidad", "semana", "cuándo", "lunes"]):
+                return "datetime" if "datetime" in self.tool_names else "ninguna"
+            if any(word in user_text for word in ["empresa", "ranking", "inversi", "ingreso", "grupo", "sector", "negocio", "puesto"]):
+                return "company_ranking" if "company_ranking" in self.tool_names else "ninguna"
+            return "ninguna"
+
+        # Prompt de generación: devolver los resultados de herramientas si los hay
+        if "Resultados de herramientas:" in text:
+            results = text.split("Resultados de herramientas:", 1)[1]
+            results = results.split("Por favor, genera", 1)[0].strip()
+            return f"Aquí tienes la información solicitada:\n{results}"
+
+        return f"[{self.model_name}] Respuesta simulada."
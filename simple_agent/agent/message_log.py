@@ -0,0 +1,148 @@
+from array import array
+from enum import IntEnum
+import sys
+import threading
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+
+class Role(IntEnum):
+    """
+    Rol de un mensaje del historial (se guarda como un solo byte).
+    """
+    USER = 0
+    ASSISTANT = 1
+
+
+# Nombres de rol usados al exportar e importar sesiones
+ROLE_NAMES: Tuple[str, ...] = ("user", "assistant")
+
+
+class MessageLog:
+    """
+    Historial compacto de una sesión.
+
+    Guarda los roles en un `array` de bytes y los textos como cadenas simples;
+    los mensajes más antiguos se agrupan en bloques comprimidos con zlib. Los
+    objetos de LangChain solo se crean al construir un prompt (`to_messages`).
+    """
+
+    __slots__ = ("compress_after", "block_size", "_roles", "_hot", "_blocks", "_cold_count", "_lock")
+
+    def __init__(self, compress_after: Optional[int] = 20, block_size: int = 16):
+        """
+        Con `compress_after` se mantienen sin comprimir al menos los últimos
+        `compress_after` mensajes; los anteriores se comprimen en bloques de
+        `block_size` mensajes. `None` desactiva la compresión.
+        """
+        self.compress_after = compress_after
+        self.block_size = block_size
+        self._roles = array("B")
+        self._hot: List[str] = []
+        # Bloques comprimidos: (textos UTF-8 concatenados y comprimidos, longitudes en bytes)
+        self._blocks: List[Tuple[bytes, array]] = []
+        self._cold_count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._roles)
+
+    def append(self, role: Role, text: str) -> None:
+        """
+        Añade un mensaje al final del historial.
+        """
+        with self._lock:
+            self._roles.append(role)
+            self._hot.append(text)
+            if self.compress_after is not None and len(self._hot) >= self.compress_after + self.block_size:
+                self._compress_oldest()
+
+    def add_turn(self, user_text: str, assistant_text: str) -> None:
+        """
+        Añade un turno completo (mensaje del usuario y respuesta del asistente).
+        """
+        self.append(Role.USER, user_text)
+        self.append(Role.ASSISTANT, assistant_text)
+
+    def _compress_oldest(self) -> None:
+        texts = self._hot[:self.block_size]
+        del self._hot[:self.block_size]
+        encoded = [text.encode("utf-8") for text in texts]
+        self._blocks.append((zlib.compress(b"".join(encoded)), array("I", (len(data) for data in encoded))))
+        self._cold_count += len(texts)
+
+    def _decompress_block(self, index: int) -> List[str]:
+        data, lengths = self._blocks[index]
+        raw = zlib.decompress(data)
+        texts, offset = [], 0
+        for length in lengths:
+            texts.append(raw[offset:offset + length].decode("utf-8"))
+            offset += length
+        return texts
+
+    def tail(self, count: Optional[int] = None) -> List[Tuple[Role, str]]:
+        """
+        Devuelve los últimos `count` mensajes (todos si es None) como (rol, texto).
+        Solo se descomprimen los bloques necesarios.
+        """
+        with self._lock:
+            total = len(self._roles)
+            start = 0 if count is None else max(0, total - count)
+            texts: List[str] = []
+            if start < self._cold_count:
+                first_block = start // self.block_size
+                for index in range(first_block, len(self._blocks)):
+                    texts.extend(self._decompress_block(index))
+                texts = texts[start - first_block * self.block_size:]
+            texts.extend(self._hot[max(0, start - self._cold_count):])
+            roles = self._roles[start:]
+        return [(Role(role), text) for role, text in zip(roles, texts)]
+
+    def __iter__(self) -> Iterator[Tuple[Role, str]]:
+        return iter(self.tail())
+
+    def to_messages(self, count: Optional[int] = None) -> List[BaseMessage]:
+        """
+        Convierte los últimos `count` mensajes en objetos de LangChain.
+        """
+        return [
+            HumanMessage(content=text) if role == Role.USER else AIMessage(content=text)
+            for role, text in self.tail(count)
+        ]
+
+    def to_records(self) -> List[Dict[str, str]]:
+        """
+        Exporta el historial como lista de {"role", "content"}.
+        """
+        return [{"role": ROLE_NAMES[role], "content": text} for role, text in self.tail()]
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, str]], **kwargs) -> "MessageLog":
+        """
+        Reconstruye un historial exportado con `to_records`.
+        """
+        log = cls(**kwargs)
+        for record in records:
+            log.append(Role(ROLE_NAMES.index(record["role"])), record["content"])
+        return log
+
+    def nbytes(self) -> int:
+        """
+        Memoria aproximada ocupada por el historial, en bytes.
+        """
+        with self._lock:
+            size = sys.getsizeof(self) + sys.getsizeof(self._roles) + sys.getsizeof(self._hot)
+            size += sum(sys.getsizeof(text) for text in self._hot)
+            size += sys.getsizeof(self._blocks)
+            size += sum(sys.getsizeof(block) + sys.getsizeof(block[0]) + sys.getsizeof(block[1]) for block in self._blocks)
+        return size
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "messages": len(self),
+            "compressed_messages": self._cold_count,
+            "blocks": len(self._blocks),
+            "bytes": self.nbytes(),
+        }
@@ -0,0 +1,175 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from .scheduler import LLMScheduler
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Etapas del agente que llaman al LLM
+STAGE_TOOL_SELECTION = "tool_selection"
+STAGE_RESPONSE = "response"
+STAGE_COMBINED_RESPONSE = "combined_response"
+STAGE_CLOSING = "closing"
+
+# Niveles de modelo
+TIER_FLASH = "flash"
+TIER_PRO = "pro"
+TIER_AUTO = "auto"
+
+# Configuración por defecto: la selección de herramienta siempre va al modelo rápido
+DEFAULT_STAGE_TIERS: Dict[str, str] = {
+    STAGE_TOOL_SELECTION: TIER_FLASH,
+    STAGE_RESPONSE: TIER_AUTO,
+    STAGE_COMBINED_RESPONSE: TIER_AUTO,
+    STAGE_CLOSING: TIER_FLASH,
+}
+
+# Costos aproximados en USD por 1.000 tokens (entrada, salida)
+DEFAULT_TIER_COSTS: Dict[str, tuple] = {
+    TIER_FLASH: (0.000075, 0.0003),
+    TIER_PRO: (0.00125, 0.005),
+}
+
+
+class TierStats:
+    """
+    Latencia, tokens y costo acumulados para un nivel de modelo.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.latencies: List[float] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost, 6),
+            "latency_p50": percentile(0.50),
+            "latency_p95": percentile(0.95),
+        }
+
+
+class ModelRouter:
+    """
+    Enruta cada etapa del agente a un nivel de modelo (rápido o grande).
+
+    En modo automático usa el modelo rápido para respuestas cortas basadas en
+    herramientas y escala al modelo grande en turnos largos o ambiguos.
+    """
+
+    def __init__(self,
+                 tier_models: Dict[str, str],
+                 model_factory: Callable[[str], Any],
+                 stage_tiers: Optional[Dict[str, str]] = None,
+                 tier_costs: Optional[Dict[str, tuple]] = None,
+                 long_prompt_tokens: int = 1500,
+                 long_message_chars: int = 300,
+                 max_flash_results: int = 2):
+        """
+        Inicializa el enrutador.
+
+        `tier_models` asocia cada nivel ("flash", "pro") con un nombre de modelo y
+        `model_factory` construye un modelo a partir de su nombre.
+        """
+        self.tier_models = dict(tier_models)
+        self.model_factory = model_factory
+        self.stage_tiers = {**DEFAULT_STAGE_TIERS, **(stage_tiers or {})}
+        self.tier_costs = {**DEFAULT_TIER_COSTS, **(tier_costs or {})}
+        self.long_prompt_tokens = long_prompt_tokens
+        self.long_message_chars = long_message_chars
+        self.max_flash_results = max_flash_results
+
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, TierStats] = {tier: TierStats() for tier in self.tier_models}
+
+    def get_model(self, model_name: str) -> Any:
+        """
+        Devuelve (y cachea) el modelo con el nombre indicado.
+        """
+        with self._lock:
+            if model_name not in self._models:
+                logger.info("Inicializando modelo %s", model_name)
+                self._models[model_name] = self.model_factory(model_name)
+            return self._models[model_name]
+
+    def get_tier_model(self, tier: str) -> Any:
+        """
+        Devuelve el modelo asociado a un nivel.
+        """
+        return self.get_model(self.tier_models[tier])
+
+    def select_tier(self, stage: str, prompt: str, context: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Elige el nivel de modelo para una etapa según la configuración y el turno.
+        """
+        tier = self.stage_tiers.get(stage, TIER_AUTO)
+        if tier != TIER_AUTO:
+            return tier if tier in self.tier_models else TIER_PRO
+
+        context = context or {}
+        if TIER_FLASH not in self.tier_models:
+            return TIER_PRO
+
+        # Prompts largos (historial extenso o muchos resultados) van al modelo grande
+        if LLMScheduler.estimate_tokens(prompt) > self.long_prompt_tokens:
+            return TIER_PRO
+
+        # Mensajes largos del usuario suelen requerir más razonamiento
+        if context.get("user_message_chars", 0) > self.long_message_chars:
+            return TIER_PRO
+
+        if stage == STAGE_COMBINED_RESPONSE:
+            if context.get("result_count", 0) > self.max_flash_results:
+                return TIER_PRO
+            return TIER_FLASH
+
+        # Respuesta: si la herramienta se eligió por palabras clave, la respuesta es
+        # una reformulación corta de sus datos; si no hubo herramienta o el LLM tuvo
+        # que decidir, el turno se considera ambiguo
+        selected_tool = context.get("selected_tool", "ninguna")
+        if selected_tool != "ninguna" and context.get("routing") == "keyword":
+            return TIER_FLASH
+        return TIER_PRO
+
+    def record(self, tier: str, latency: float, input_tokens: int,
+               output_tokens: int, error: bool = False) -> None:
+        """
+        Registra latencia, tokens y costo de una llamada.
+        """
+        input_cost, output_cost = self.tier_costs.get(tier, (0.0, 0.0))
+        with self._lock:
+            stats = self._stats.setdefault(tier, TierStats())
+            stats.calls += 1
+            stats.latencies.append(latency)
+            if len(stats.latencies) > 1000:
+                del stats.latencies[:500]
+            if error:
+                stats.errors += 1
+                return
+            stats.input_tokens += input_tokens
+            stats.output_tokens += output_tokens
+            stats.cost += input_tokens / 1000 * input_cost + output_tokens / 1000 * output_cost
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Devuelve las métricas por nivel de modelo.
+        """
+        with self._lock:
+            return {tier: stats.to_dict() for tier, stats in self._stats.items()}
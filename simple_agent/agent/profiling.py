@@ -0,0 +1,251 @@
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Variables de entorno para activar el perfilado sin tocar el código
+ENV_PROFILE_DIR = "AGENT_PROFILE_DIR"
+ENV_PROFILE_RATE = "AGENT_PROFILE_RATE"
+ENV_PROFILE_MEMORY = "AGENT_PROFILE_MEMORY"
+
+# Archivo con una línea JSON por turno perfilado
+INDEX_FILE = "index.jsonl"
+
+# Marcos internos que no aportan a los diffs de memoria
+_MEMORY_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _safe_name(text: str) -> str:
+    # Los ids de sesión vienen del cliente: solo caracteres seguros en nombres de archivo
+    return re.sub(r"[^\w.-]", "_", text)[:80]
+
+
+class StackSampler:
+    """
+    Muestreador de pilas de un hilo.
+
+    Un hilo aparte lee cada `interval` segundos la pila del hilo observado
+    (`sys._current_frames`) y cuenta cada pila completa. El resultado se
+    escribe en formato de pilas colapsadas ("raíz;...;hoja cuenta"), el que
+    usan flamegraph.pl, speedscope o py-spy.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """
+    Perfilado opcional de turnos del agente.
+
+    Un turno se perfila si se pide explícitamente o con probabilidad
+    `sample_rate`. De cada turno perfilado se escriben en `output_dir`:
+
+    - `<turno>.pstats`: perfil de cProfile del hilo del turno (`pstats.Stats`,
+      snakeviz);
+    - `<turno>.collapsed`: pilas muestreadas cada `sample_interval` segundos
+      en formato colapsado;
+    - `<turno>.memdiff.txt` (con `memory`): diferencia entre la instantánea de
+      tracemalloc de este turno y la del turno perfilado anterior de la misma
+      sesión (o la del arranque).
+
+    Además se añade una línea a `index.jsonl` con la duración y los archivos
+    del turno. Solo se perfila el hilo del turno: el trabajo que se reparte a
+    otros hilos (secciones en paralelo, herramientas especulativas) aparece
+    como espera. tracemalloc es global al proceso, así que los diffs de
+    memoria incluyen lo que asignaron otros turnos simultáneos.
+    """
+
+    def __init__(self,
+                 output_dir: str = "profiles",
+                 sample_rate: float = 0.0,
+                 cpu: bool = True,
+                 memory: bool = False,
+                 sample_interval: float = 0.005,
+                 memory_frames: int = 10,
+                 top_stats: int = 30,
+                 max_sessions: int = 256):
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.cpu = cpu
+        self.memory = memory
+        self.sample_interval = sample_interval
+        self.top_stats = top_stats
+        self.max_sessions = max_sessions
+        self.profiled = 0
+        self.cpu_skipped = 0
+        self._lock = threading.Lock()
+        # cProfile no admite varios perfiles activos a la vez en todas las
+        # versiones de Python: un turno simultáneo solo se muestrea
+        self._cpu_lock = threading.Lock()
+        self._snapshots: "OrderedDict[str, tracemalloc.Snapshot]" = OrderedDict()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        os.makedirs(output_dir, exist_ok=True)
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(memory_frames)
+            self._baseline = self._take_snapshot()
+
+    @classmethod
+    def from_env(cls) -> Optional["RequestProfiler"]:
+        """
+        Perfilador configurado por variables de entorno, o None si no se define
+        `AGENT_PROFILE_DIR`. `AGENT_PROFILE_RATE` (0 por defecto: solo turnos
+        pedidos) y `AGENT_PROFILE_MEMORY=1` completan la configuración.
+        """
+        output_dir = os.getenv(ENV_PROFILE_DIR)
+        if not output_dir:
+            return None
+        return cls(
+            output_dir=output_dir,
+            sample_rate=float(os.getenv(ENV_PROFILE_RATE, "0")),
+            memory=os.getenv(ENV_PROFILE_MEMORY, "").lower() in ("1", "true", "yes")
+        )
+
+    def should_profile(self, requested: bool = False) -> bool:
+        """
+        Decide si se perfila un turno: siempre si se pide, si no por muestreo.
+        """
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    @contextmanager
+    def profile_turn(self, turn_id: str, session_id: str) -> Iterator[None]:
+        """
+        Perfila el bloque (un turno) en el hilo actual y escribe los resultados al salir.
+        """
+        sampler = StackSampler(threading.get_ident(), self.sample_interval)
+        profile = None
+        if self.cpu:
+            if self._cpu_lock.acquire(blocking=False):
+                profile = cProfile.Profile()
+            else:
+                with self._lock:
+                    self.cpu_skipped += 1
+        started = time.perf_counter()
+        sampler.start()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._cpu_lock.release()
+            sampler.stop()
+            elapsed = time.perf_counter() - started
+            try:
+                base = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{_safe_name(turn_id)}")
+                record = self._write_cpu(base, turn_id, session_id, elapsed, profile, sampler)
+                # Liberar el perfil antes de la instantánea para que no aparezca en el diff
+                profile = sampler = None
+                if self.memory and tracemalloc.is_tracing():
+                    self._write_memory(base, session_id, record)
+                self._write_index(record)
+            except Exception as e:
+                logger.warning("No se pudo guardar el perfil del turno %s: %s", turn_id, e)
+
+    def forget(self, session_id: str) -> None:
+        """
+        Descarta la instantánea de memoria de una sesión.
+        """
+        with self._lock:
+            self._snapshots.pop(session_id, None)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "output_dir": self.output_dir,
+                "sample_rate": self.sample_rate,
+                "profiled_turns": self.profiled,
+                "cpu_skipped": self.cpu_skipped,
+                "memory_sessions": len(self._snapshots),
+            }
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(_MEMORY_FILTERS)
+
+    def _write_cpu(self, base: str, turn_id: str, session_id: str, elapsed: float,
+                   profile: Optional[cProfile.Profile], sampler: StackSampler) -> Dict[str, Any]:
+        record: Dict[str, Any] = {
+            "turn_id": turn_id,
+            "session_id": session_id,
+            "elapsed_ms": round(elapsed * 1000, 2),
+            "samples": sum(sampler.stacks.values()),
+            "files": [],
+        }
+        if profile is not None:
+            profile.dump_stats(f"{base}.pstats")
+            record["files"].append(f"{base}.pstats")
+        with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+            f.write(sampler.collapsed())
+        record["files"].append(f"{base}.collapsed")
+        return record
+
+    def _write_memory(self, base: str, session_id: str, record: Dict[str, Any]) -> None:
+        snapshot = self._take_snapshot()
+        with self._lock:
+            previous = self._snapshots.pop(session_id, None) or self._baseline
+            self._snapshots[session_id] = snapshot
+            while len(self._snapshots) > self.max_sessions:
+                self._snapshots.popitem(last=False)
+        if previous is None:
+            return
+        stats = snapshot.compare_to(previous, "lineno")
+        record["memory_diff_kb"] = round(sum(stat.size_diff for stat in stats) / 1024, 1)
+        with open(f"{base}.memdiff.txt", "w", encoding="utf-8") as f:
+            f.write(f"# turno {record['turn_id']} (sesión {session_id}): {record['memory_diff_kb']} KiB\n")
+            for stat in stats[:self.top_stats]:
+                f.write(f"{stat}\n")
+        record["files"].append(f"{base}.memdiff.txt")
+
+    def _write_index(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.profiled += 1
+            with open(os.path.join(self.output_dir, INDEX_FILE), "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        logger.info("Turno %s perfilado en %s ms", record["turn_id"], record["elapsed_ms"])
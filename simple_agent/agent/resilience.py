@@ -0,0 +1,356 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+from .scheduler import SchedulerOverloadedError
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Nombres de excepciones transitorias (Vertex AI / google.api_core) que vale la pena reintentar
+RETRYABLE_ERROR_NAMES = {
+    "ServiceUnavailable", "ResourceExhausted", "DeadlineExceeded", "TooManyRequests",
+    "InternalServerError", "GatewayTimeout", "Aborted", "RetryError"
+}
+
+RETRYABLE_ERROR_MARKERS = ["429", "500", "503", "504", "unavailable", "timeout", "timed out", "quota", "exhausted"]
+
+# Marca de respuesta por fragmentos que terminó sin ningún fragmento
+_END = object()
+
+
+class DeadlineExceededError(TimeoutError):
+    """
+    Se lanza cuando se agota el tiempo disponible para el turno.
+    """
+
+
+class Deadline:
+    """
+    Plazo absoluto para un turno, basado en el reloj monotónico.
+    """
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        """
+        Crea un plazo que vence dentro de `seconds` segundos.
+        """
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        """
+        Segundos restantes hasta el vencimiento (nunca negativo).
+        """
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Determina si un error del modelo es transitorio y puede reintentarse.
+    """
+    if isinstance(error, (SchedulerOverloadedError, DeadlineExceededError)):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in RETRYABLE_ERROR_MARKERS)
+
+
+def _close_stream(chunks: Iterator[Any]) -> None:
+    close = getattr(chunks, "close", None)
+    if close is not None:
+        close()
+
+
+def _close_abandoned_stream(future: Future) -> None:
+    if future.exception() is None:
+        _close_stream(future.result()[0])
+
+
+class LatencyTracker:
+    """
+    Registra latencias recientes para estimar percentiles.
+    """
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float, default: float) -> float:
+        """
+        Devuelve el percentil `p` (0-1) o `default` si aún no hay suficientes muestras.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < 10:
+            return default
+        return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+
+class ResiliencePolicy:
+    """
+    Política de timeouts, reintentos con jitter, solicitudes de cobertura (hedging)
+    y degradación a un modelo más rápido para las llamadas al LLM.
+    """
+
+    def __init__(self,
+                 turn_timeout: float = 30.0,
+                 attempt_timeout: float = 15.0,
+                 max_attempts: int = 3,
+                 base_delay: float = 0.5,
+                 max_delay: float = 4.0,
+                 hedge: bool = False,
+                 hedge_quantile: float = 0.95,
+                 default_hedge_delay: float = 3.0,
+                 fallback_margin: float = 1.5,
+                 max_workers: int = 16):
+        """
+        Inicializa la política.
+
+        Se degrada al modelo de respaldo cuando el tiempo restante del turno es menor
+        que `fallback_margin` veces la latencia p95 observada del modelo principal.
+        """
+        self.turn_timeout = turn_timeout
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.default_hedge_delay = default_hedge_delay
+        self.fallback_margin = fallback_margin
+
+        self.latency = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-call")
+
+        # Métricas
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0,
+            "timeouts": 0, "fallbacks": 0, "failures": 0
+        }
+
+    def new_deadline(self) -> Deadline:
+        """
+        Crea el plazo para un nuevo turno.
+        """
+        return Deadline.after(self.turn_timeout)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def _backoff(self, attempt: int) -> float:
+        """
+        Retardo exponencial con jitter completo para el intento `attempt` (desde 1).
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def should_fallback(self, deadline: Deadline) -> bool:
+        """
+        Indica si conviene usar el modelo de respaldo por cercanía del plazo.
+        """
+        p95 = self.latency.percentile(0.95, default=self.attempt_timeout / 3)
+        return deadline.remaining() < p95 * self.fallback_margin
+
+    def call(self,
+             primary: Callable[[float], Any],
+             deadline: Optional[Deadline] = None,
+             fallback: Optional[Callable[[float], Any]] = None) -> Any:
+        """
+        Ejecuta `primary(timeout)` aplicando plazo, reintentos y hedging.
+
+        Ambas funciones reciben el tiempo máximo que pueden esperar en cola.
+        """
+        deadline = deadline or self.new_deadline()
+        self._count("calls")
+        last_error: Optional[Exception] = None
+
+        for attempt in range(1, self.max_attempts + 1):
+            if deadline.expired():
+                break
+
+            use_fallback = fallback is not None and self.should_fallback(deadline)
+            fn = fallback if use_fallback else primary
+            if use_fallback:
+                logger.info("Plazo cercano (%.1fs): usando modelo de respaldo", deadline.remaining())
+                self._count("fallbacks")
+
+            try:
+                return self._attempt(fn, deadline, track=not use_fallback)
+            except Exception as e:
+                last_error = e
+                if not is_retryable(e) or attempt == self.max_attempts:
+                    break
+                delay = self._backoff(attempt)
+                if delay >= deadline.remaining():
+                    break
+                logger.warning("Error transitorio en llamada al LLM (intento %d): %s. Reintentando en %.2fs", attempt, e, delay)
+                self._count("retries")
+                time.sleep(delay)
+
+        self._count("failures")
+        if last_error is None:
+            raise DeadlineExceededError("Plazo del turno agotado antes de llamar al LLM")
+        raise last_error
+
+    def _attempt(self, fn: Callable[[float], Any], deadline: Deadline, track: bool) -> Any:
+        """
+        Un intento con timeout y, opcionalmente, una solicitud de cobertura.
+        """
+        timeout = min(self.attempt_timeout, deadline.remaining())
+        start = time.monotonic()
+        futures = {self._executor.submit(fn, timeout)}
+        hedge_future: Optional[Future] = None
+
+        if self.hedge:
+            hedge_delay = self.latency.percentile(self.hedge_quantile, self.default_hedge_delay)
+            if hedge_delay < timeout:
+                done, _ = wait(futures, timeout=hedge_delay)
+                if not done:
+                    logger.info("Lanzando solicitud de cobertura tras %.2fs", hedge_delay)
+                    self._count("hedges")
+                    hedge_future = self._executor.submit(fn, max(0.0, timeout - hedge_delay))
+                    futures.add(hedge_future)
+
+        remaining = timeout - (time.monotonic() - start)
+        first_error: Optional[Exception] = None
+        pending = set(futures)
+        while pending and remaining > 0:
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    if track:
+                        self.latency.record(time.monotonic() - start)
+                    if future is hedge_future:
+                        self._count("hedge_wins")
+                    return future.result()
+                first_error = first_error or error
+            remaining = timeout - (time.monotonic() - start)
+
+        if pending:
+            # Las llamadas bloqueantes no se pueden cancelar; se abandonan y su resultado se ignora
+            self._count("timeouts")
+            if track:
+                self.latency.record(timeout)
+            raise TimeoutError(f"La llamada al LLM superó {timeout:.1f}s")
+        raise first_error
+
+    def stream(self,
+               primary: Callable[[float], Iterator[Any]],
+               deadline: Optional[Deadline] = None,
+               fallback: Optional[Callable[[float], Iterator[Any]]] = None) -> Iterator[Any]:
+        """
+        Variante de `call` para respuestas por fragmentos.
+
+        El timeout por intento, los reintentos y la degradación se aplican hasta
+        recibir el primer fragmento; después los fragmentos se entregan según
+        llegan (un error a mitad de respuesta ya no se reintenta) y el plazo del
+        turno se comprueba entre fragmentos. No se lanzan solicitudes de cobertura.
+        """
+        deadline = deadline or self.new_deadline()
+        self._count("calls")
+        last_error: Optional[Exception] = None
+        opened = None
+
+        for attempt in range(1, self.max_attempts + 1):
+            if deadline.expired():
+                break
+
+            use_fallback = fallback is not None and self.should_fallback(deadline)
+            fn = fallback if use_fallback else primary
+            if use_fallback:
+                logger.info("Plazo cercano (%.1fs): usando modelo de respaldo", deadline.remaining())
+                self._count("fallbacks")
+
+            try:
+                opened = self._open_stream(fn, deadline)
+                break
+            except Exception as e:
+                last_error = e
+                if not is_retryable(e) or attempt == self.max_attempts:
+                    break
+                delay = self._backoff(attempt)
+                if delay >= deadline.remaining():
+                    break
+                logger.warning("Error transitorio al abrir la respuesta del LLM (intento %d): %s. Reintentando en %.2fs",
+                               attempt, e, delay)
+                self._count("retries")
+                time.sleep(delay)
+
+        if opened is None:
+            self._count("failures")
+            if last_error is None:
+                raise DeadlineExceededError("Plazo del turno agotado antes de llamar al LLM")
+            raise last_error
+
+        chunks, first, start = opened
+        try:
+            if first is not _END:
+                yield first
+            for chunk in chunks:
+                if deadline.expired():
+                    self._count("timeouts")
+                    raise DeadlineExceededError("Plazo del turno agotado durante la respuesta del LLM")
+                yield chunk
+            if not use_fallback:
+                self.latency.record(time.monotonic() - start)
+        except Exception:
+            self._count("failures")
+            raise
+        finally:
+            _close_stream(chunks)
+
+    def _open_stream(self, fn: Callable[[float], Iterator[Any]], deadline: Deadline) -> tuple:
+        """
+        Abre una respuesta por fragmentos y espera el primero con el timeout del intento.
+
+        Devuelve el iterador, el primer fragmento (`_END` si la respuesta vino
+        vacía) y el instante de inicio.
+        """
+        timeout = min(self.attempt_timeout, deadline.remaining())
+        start = time.monotonic()
+
+        def first_chunk() -> tuple:
+            chunks = fn(timeout)
+            return chunks, next(chunks, _END)
+
+        future = self._executor.submit(first_chunk)
+        try:
+            chunks, first = future.result(timeout=timeout)
+        except FuturesTimeoutError:
+            if future.done():
+                # El propio intento terminó con un TimeoutError
+                raise
+            # El intento se abandona; si llega a abrirse se cierra para liberar su cupo
+            future.add_done_callback(_close_abandoned_stream)
+            self._count("timeouts")
+            raise TimeoutError(f"El LLM no empezó a responder en {timeout:.1f}s")
+        return chunks, first, start
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Devuelve contadores de la política y la latencia p95 observada.
+        """
+        with self._lock:
+            metrics: Dict[str, Any] = dict(self._stats)
+        metrics["latency_p95"] = self.latency.percentile(0.95, default=0.0)
+        return metrics
@@ -0,0 +1,258 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """
+    Clases de prioridad para las llamadas al LLM (menor valor = mayor prioridad).
+    """
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+class SchedulerOverloadedError(RuntimeError):
+    """
+    Se lanza cuando el planificador descarta una solicitud por sobrecarga.
+    """
+
+
+class TokenBucket:
+    """
+    Cubo de tokens para limitar la tasa de consumo por minuto.
+    """
+
+    def __init__(self, capacity_per_minute: float):
+        self.capacity = float(capacity_per_minute)
+        self.refill_rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+        self.last_refill = now
+
+    def time_until_available(self, amount: float) -> float:
+        """
+        Devuelve los segundos que faltan para disponer de `amount` tokens.
+        """
+        self._refill()
+        # Una solicitud mayor que la capacidad nunca cabría; se limita a un cubo lleno
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount: float) -> None:
+        """
+        Descuenta tokens del cubo (puede quedar en negativo para cobrar consumo real).
+        """
+        self._refill()
+        self.tokens -= amount
+
+
+class _Ticket:
+    """
+    Solicitud en espera dentro de la cola del planificador.
+    """
+    __slots__ = ("priority", "seq", "tokens", "enqueued_at")
+
+    def __init__(self, priority: int, seq: int, tokens: int):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class LLMScheduler:
+    """
+    Planificador entre el agente y el modelo de chat.
+
+    Combina un límite de tasa por cubo de tokens (solicitudes y tokens por minuto),
+    un pool acotado de llamadas concurrentes, clases de prioridad y descarte de
+    carga según la profundidad de la cola.
+    """
+
+    def __init__(self,
+                 max_concurrency: int = 4,
+                 requests_per_minute: int = 60,
+                 tokens_per_minute: int = 120_000,
+                 max_queue_depth: int = 32,
+                 batch_shed_ratio: float = 0.5,
+                 max_queue_wait: float = 30.0):
+        """
+        Inicializa el planificador.
+
+        `batch_shed_ratio` indica a qué fracción de `max_queue_depth` se empiezan a
+        descartar las solicitudes de prioridad BATCH, para reservar el resto de la
+        cola a los turnos interactivos.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.batch_shed_ratio = batch_shed_ratio
+        self.max_queue_wait = max_queue_wait
+
+        self._request_bucket = TokenBucket(requests_per_minute)
+        self._token_bucket = TokenBucket(tokens_per_minute)
+
+        self._lock = threading.Condition()
+        self._queue: List[_Ticket] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+
+        # Métricas
+        self._wait_times: Deque[float] = deque(maxlen=1000)
+        self._completed = 0
+        self._failed = 0
+        self._shed: Dict[str, int] = {p.name: 0 for p in Priority}
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """
+        Estimación rápida de tokens (aprox. 4 caracteres por token).
+        """
+        return max(1, len(text) // 4)
+
+    def invoke(self, llm: Any, prompt: Any, priority: Priority = Priority.INTERACTIVE,
+               max_wait: Optional[float] = None) -> Any:
+        """
+        Ejecuta `llm.invoke(prompt)` respetando los límites del planificador.
+        """
+        priority = Priority(priority)
+        tokens = self.estimate_tokens(str(prompt))
+        self._acquire(priority, tokens, max_wait)
+
+        try:
+            response = llm.invoke(prompt)
+            # Cobrar los tokens de salida una vez conocidos
+            output_tokens = self.estimate_tokens(str(getattr(response, "content", "")))
+            with self._lock:
+                self._token_bucket.consume(output_tokens)
+                self._completed += 1
+            return response
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._lock.notify_all()
+
+    def stream(self, llm: Any, prompt: Any, priority: Priority = Priority.INTERACTIVE,
+               max_wait: Optional[float] = None) -> Iterator[Any]:
+        """
+        Variante de `invoke` que entrega los fragmentos de `llm.stream(prompt)`.
+
+        El cupo se pide al empezar a iterar y se ocupa hasta que la respuesta
+        termina o se cierra el generador; los tokens de salida se cobran según
+        lo que se haya recibido.
+        """
+        priority = Priority(priority)
+        tokens = self.estimate_tokens(str(prompt))
+        self._acquire(priority, tokens, max_wait)
+
+        received: List[str] = []
+        try:
+            for chunk in llm.stream(prompt):
+                received.append(str(getattr(chunk, "content", "")))
+                yield chunk
+            with self._lock:
+                self._completed += 1
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                if received:
+                    self._token_bucket.consume(self.estimate_tokens("".join(received)))
+                self._in_flight -= 1
+                self._lock.notify_all()
+
+    def _acquire(self, priority: Priority, tokens: int, max_wait: Optional[float]) -> None:
+        """
+        Espera turno en la cola hasta que haya concurrencia y cupo de tasa disponibles.
+        """
+        max_wait = self.max_queue_wait if max_wait is None else max_wait
+
+        with self._lock:
+            depth = len(self._queue)
+            limit = self.max_queue_depth
+            if priority != Priority.INTERACTIVE:
+                limit = int(self.max_queue_depth * self.batch_shed_ratio)
+            if depth >= limit:
+                self._shed[priority.name] += 1
+                logger.warning("Solicitud %s descartada: cola con %d solicitudes en espera", priority.name, depth)
+                raise SchedulerOverloadedError(f"Cola de LLM saturada ({depth} en espera)")
+
+            ticket = _Ticket(int(priority), next(self._seq), tokens)
+            heapq.heappush(self._queue, ticket)
+            deadline = ticket.enqueued_at + max_wait
+
+            while True:
+                now = time.monotonic()
+                wait = None
+                if self._queue[0] is ticket and self._in_flight < self.max_concurrency:
+                    wait = max(
+                        self._request_bucket.time_until_available(1),
+                        self._token_bucket.time_until_available(tokens)
+                    )
+                    if wait == 0.0:
+                        break
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    self._shed[priority.name] += 1
+                    self._lock.notify_all()
+                    logger.warning("Solicitud %s descartada tras %.1fs en cola", priority.name, max_wait)
+                    raise SchedulerOverloadedError(f"Tiempo máximo de espera en cola superado ({max_wait:.1f}s)")
+
+                self._lock.wait(timeout=min(remaining, wait) if wait else remaining)
+
+            heapq.heappop(self._queue)
+            self._request_bucket.consume(1)
+            self._token_bucket.consume(tokens)
+            self._in_flight += 1
+            self._wait_times.append(time.monotonic() - ticket.enqueued_at)
+            # Despertar al siguiente en la cola por si también puede avanzar
+            self._lock.notify_all()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Devuelve métricas del planificador, incluyendo tiempos de espera en cola.
+        """
+        with self._lock:
+            waits = sorted(self._wait_times)
+            metrics = {
+                "queue_depth": len(self._queue),
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+                "shed": dict(self._shed),
+            }
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p * len(waits)))]
+
+        metrics["queue_wait_p50"] = percentile(0.50)
+        metrics["queue_wait_p95"] = percentile(0.95)
+        metrics["queue_wait_max"] = waits[-1] if waits else 0.0
+        return metrics
@@ -0,0 +1,176 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Raíces de palabras que sugieren cada herramienta cuando las palabras clave
+# exactas de `_pre_check_tools` no coinciden y el enrutamiento pasa al LLM
+SPECULATION_HINTS: Dict[str, List[str]] = {
+    "datetime": [
+        "hoy", "mañana", "ayer", "semana", "mes", "año", "horari", "madrugada",
+        "tarde", "noche", "lunes", "martes", "miércoles", "jueves", "viernes",
+        "sábado", "domingo", "navidad", "vacacion", "puente", "cuánto falta",
+        "cuándo", "madrid", "londres", "tokio", "nueva york"
+    ],
+    "company_ranking": [
+        "empres", "compañ", "negocio", "corporaci", "grupo", "sector", "puesto", "millon",
+        "dólar", "usd", "factur", "gananci", "vend", "banc", "miner", "retail",
+        "capital", "bolsa", "acciones", "emple", "invier", "líder", "grande"
+    ],
+}
+
+
+class _Speculation:
+    """
+    Herramientas lanzadas en paralelo para un turno mientras el LLM decide.
+    """
+
+    def __init__(self, speculator: "ToolSpeculator", futures: Dict[str, Future]):
+        self._speculator = speculator
+        self.futures = futures
+
+    def resolve(self, selected_tool: str, timeout: Optional[float] = None) -> Optional[Any]:
+        """
+        Devuelve el resultado especulado de la herramienta elegida (o None si no se
+        especuló) y descarta el resto.
+        """
+        selected_tool = selected_tool.lower()
+        result = None
+        for name, future in self.futures.items():
+            if name == selected_tool:
+                continue
+            # Si aún no empezó, se cancela; si ya corre, su tiempo cuenta como desperdicio
+            if future.cancel():
+                self._speculator._record_cancelled()
+            else:
+                future.add_done_callback(self._speculator._record_wasted)
+
+        future = self.futures.get(selected_tool)
+        duration = 0.0
+        if future is not None:
+            try:
+                result, duration = future.result(timeout=timeout)
+            except Exception as e:
+                logger.warning("La ejecución especulativa de %s falló: %s", selected_tool, e)
+                result = None
+        if self.futures:
+            self._speculator._record_outcome(selected_tool, result is not None, duration)
+        return result
+
+
+class ToolSpeculator:
+    """
+    Ejecuta especulativamente las herramientas probables mientras el LLM elige.
+
+    Solo se especulan herramientas marcadas como seguras (`speculative = True`:
+    baratas y sin efectos secundarios). Si el LLM elige una herramienta especulada
+    su resultado se reutiliza, de modo que la herramienta sale del camino crítico;
+    el resto se descarta y se contabiliza como trabajo desperdiciado.
+    """
+
+    def __init__(self, max_candidates: int = 2, min_score: int = 1, max_workers: int = 4,
+                 hints: Optional[Dict[str, List[str]]] = None):
+        self.max_candidates = max_candidates
+        self.min_score = min_score
+        self.hints = hints if hints is not None else SPECULATION_HINTS
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool-speculation")
+        self._lock = threading.Lock()
+        self._stats = {
+            "speculations": 0,
+            "tool_runs": 0,
+            "hits": 0,
+            "misses": 0,
+            "no_tool": 0,
+            "wasted_runs": 0,
+            "cancelled_runs": 0,
+            "wasted_time": 0.0,
+            "saved_time": 0.0,
+        }
+
+    def score_tools(self, message: str, tools: Sequence[Any]) -> Dict[str, int]:
+        """
+        Puntúa cada herramienta segura según las pistas presentes en el mensaje.
+        """
+        text = message.lower()
+        scores = {}
+        for tool in tools:
+            if not getattr(tool, "speculative", False):
+                continue
+            name = tool.name.lower()
+            scores[name] = sum(1 for hint in self.hints.get(name, []) if hint in text)
+        return scores
+
+    def start(self, message: str, tools: Sequence[Any]) -> _Speculation:
+        """
+        Lanza en segundo plano las herramientas con mejor puntuación para el mensaje.
+        """
+        scores = self.score_tools(message, tools)
+        candidates = sorted(
+            (name for name, score in scores.items() if score >= self.min_score),
+            key=lambda name: scores[name], reverse=True
+        )[:self.max_candidates]
+
+        tools_by_name = {tool.name.lower(): tool for tool in tools}
+        futures = {name: self._executor.submit(self._run_tool, tools_by_name[name], message) for name in candidates}
+        if futures:
+            logger.info("Ejecución especulativa de herramientas: %s", list(futures))
+            with self._lock:
+                self._stats["speculations"] += 1
+                self._stats["tool_runs"] += len(futures)
+        return _Speculation(self, futures)
+
+    @staticmethod
+    def _run_tool(tool: Any, message: str) -> tuple:
+        start = time.monotonic()
+        result = tool.run_structured(message)
+        return result, time.monotonic() - start
+
+    def _record_outcome(self, selected_tool: str, hit: bool, duration: float) -> None:
+        with self._lock:
+            if hit:
+                self._stats["hits"] += 1
+                self._stats["saved_time"] += duration
+            elif selected_tool == "ninguna":
+                self._stats["no_tool"] += 1
+            else:
+                self._stats["misses"] += 1
+
+    def _record_wasted(self, future: Future) -> None:
+        try:
+            _, duration = future.result()
+        except Exception:
+            duration = 0.0
+        with self._lock:
+            self._stats["wasted_runs"] += 1
+            self._stats["wasted_time"] += duration
+
+    def _record_cancelled(self) -> None:
+        with self._lock:
+            self._stats["cancelled_runs"] += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Devuelve la tasa de acierto y el trabajo desperdiciado de la especulación.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        resolved = stats["hits"] + stats["misses"] + stats["no_tool"]
+        return {
+            "speculations": stats["speculations"],
+            "tool_runs": stats["tool_runs"],
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "no_tool": stats["no_tool"],
+            "hit_rate": round(stats["hits"] / resolved, 3) if resolved else 0.0,
+            "wasted_runs": stats["wasted_runs"],
+            "cancelled_runs": stats["cancelled_runs"],
+            "wasted_time_ms": round(stats["wasted_time"] * 1000, 2),
+            "saved_time_ms": round(stats["saved_time"] * 1000, 2),
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -11,8 +11,8 @@ class ConversationState(TypedDict):
     # Contexto actual de la conversación
     context: Dict[str, Any]
     
-    # Resultados de herramientas
-    tool_results: Dict[str, str]
+    # Resultados estructurados de herramientas (`tools.results.ToolResult`)
+    tool_results: Dict[str, Any]
     
     # Estado de ejecución del grafo
     next_step: str
@@ -0,0 +1,253 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+import json
+import logging
+import math
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Segmentación aproximada de un tokenizador BPE: palabras, números y signos sueltos
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+# Estrategias para recortar una sección cuando el prompt excede el presupuesto
+SHRINK_NONE = "none"
+SHRINK_KEEP_HEAD = "keep_head"
+SHRINK_KEEP_TAIL = "keep_tail"
+
+# Nota que sustituye a las líneas recortadas
+_OMITTED_HEAD = "[... {omitted} líneas omitidas por límite de tokens]"
+_OMITTED_TAIL = "[... {omitted} líneas anteriores omitidas por límite de tokens]"
+
+
+class TokenCounter:
+    """
+    Conteo local de tokens con caché por texto.
+
+    Aproxima un tokenizador de subpalabras: cada signo cuenta como un token y
+    cada palabra como `ceil(len / chars_per_token)`. Con `tokenizer` se puede
+    usar una función de conteo exacta en su lugar.
+    """
+
+    def __init__(self, chars_per_token: float = 4.0, cache_size: int = 4096,
+                 tokenizer: Optional[Callable[[str], int]] = None):
+        self.chars_per_token = chars_per_token
+        self.tokenizer = tokenizer
+        self._count_cached = lru_cache(maxsize=cache_size)(self._count)
+
+    def _count(self, text: str) -> int:
+        if self.tokenizer is not None:
+            return self.tokenizer(text)
+        tokens = 0
+        for match in TOKEN_PATTERN.finditer(text):
+            length = match.end() - match.start()
+            tokens += 1 if length <= self.chars_per_token else math.ceil(length / self.chars_per_token)
+        return tokens
+
+    def count(self, text: str) -> int:
+        """
+        Devuelve el número de tokens de un texto (cacheado).
+        """
+        if not text:
+            return 0
+        return self._count_cached(text)
+
+    def truncate(self, text: str, max_tokens: int, keep: str = SHRINK_KEEP_HEAD) -> str:
+        """
+        Recorta un texto por líneas completas hasta `max_tokens`, conservando el
+        inicio (`keep_head`) o el final (`keep_tail`) y dejando una nota con lo omitido.
+        """
+        if self.count(text) <= max_tokens:
+            return text
+        lines = text.split("\n")
+        note = _OMITTED_HEAD if keep == SHRINK_KEEP_HEAD else _OMITTED_TAIL
+        # La nota de lo omitido también cuenta para el límite
+        available = max_tokens - self.count(note.format(omitted=len(lines))) - 1
+        ordered = lines if keep == SHRINK_KEEP_HEAD else list(reversed(lines))
+        kept: List[str] = []
+        used = 0
+        for line in ordered:
+            cost = self.count(line) + 1
+            if used + cost > available:
+                break
+            kept.append(line)
+            used += cost
+
+        # Una única línea enorme: recortar por caracteres
+        if not kept and lines:
+            chars = max(0, int(available * self.chars_per_token))
+            line = ordered[0]
+            kept = [line[:chars] if keep == SHRINK_KEEP_HEAD else line[-chars:]] if chars else []
+        omitted = len(lines) - len(kept)
+
+        if keep == SHRINK_KEEP_HEAD:
+            return "\n".join(kept + [note.format(omitted=omitted)])
+        return "\n".join([note.format(omitted=omitted)] + list(reversed(kept)))
+
+
+@dataclass
+class PromptSection:
+    """
+    Parte de un prompt con su prioridad (mayor = más importante) y la forma de
+    recortarla si el prompt no cabe en el presupuesto.
+    """
+    name: str
+    text: str
+    priority: int
+    shrink: str = SHRINK_NONE
+    header: str = ""
+    min_tokens: int = 0
+
+    def render(self) -> str:
+        if not self.text:
+            return ""
+        return f"{self.header}{self.text}"
+
+
+class PromptBudget:
+    """
+    Ajusta un prompt a un máximo de tokens recortando primero las secciones de
+    menor prioridad (historial antiguo, resultados extensos).
+    """
+
+    def __init__(self, max_prompt_tokens: int = 8000, counter: Optional[TokenCounter] = None):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.counter = counter or TokenCounter()
+
+    def fit(self, sections: Sequence[PromptSection]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Devuelve el prompt ajustado y el uso de tokens por sección.
+        """
+        sections = list(sections)
+        original = {section.name: self.counter.count(section.render()) for section in sections}
+        counts = dict(original)
+        total = sum(counts.values())
+        truncated = []
+
+        if total > self.max_prompt_tokens:
+            shrinkable = sorted(
+                (section for section in sections if section.shrink != SHRINK_NONE),
+                key=lambda section: section.priority
+            )
+            for section in shrinkable:
+                excess = total - self.max_prompt_tokens
+                if excess <= 0:
+                    break
+                header_tokens = self.counter.count(section.header)
+                target = max(section.min_tokens, counts[section.name] - header_tokens - excess)
+                shortened = self.counter.truncate(section.text, target, keep=section.shrink)
+                if shortened == section.text:
+                    continue
+                section.text = shortened
+                new_count = self.counter.count(section.render())
+                total -= counts[section.name] - new_count
+                counts[section.name] = new_count
+                truncated.append(section.name)
+            if truncated:
+                logger.info("Prompt recortado a %d tokens (secciones: %s)", total, truncated)
+
+        prompt = "\n\n".join(text for text in (section.render() for section in sections) if text)
+        usage = {
+            "budget": self.max_prompt_tokens,
+            "prompt_tokens": total,
+            "original_tokens": sum(original.values()),
+            "sections": counts,
+            "truncated": truncated,
+            "over_budget": total > self.max_prompt_tokens,
+        }
+        return prompt, usage
+
+
+class TokenUsageLog:
+    """
+    Registro del uso de tokens por turno (llamadas al LLM y secciones de cada prompt).
+    """
+
+    def __init__(self, max_turns: int = 1000):
+        self.max_turns = max_turns
+        self._turns: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, context: Dict[str, Any], stage: str, tier: str,
+               prompt_tokens: int, completion_tokens: int, exact: bool,
+               prompt_usage: Optional[Dict[str, Any]] = None, coalesced: bool = False) -> None:
+        """
+        Añade una llamada al LLM al turno indicado en `context["turn_id"]`.
+        `coalesced` marca las llamadas que reutilizaron otra idéntica en curso.
+        """
+        turn_id = context.get("turn_id", "sin-turno")
+        call = {
+            "stage": stage,
+            "tier": tier,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "exact": exact,
+        }
+        if coalesced:
+            call["coalesced"] = True
+        if prompt_usage:
+            call["sections"] = prompt_usage["sections"]
+            call["truncated"] = prompt_usage["truncated"]
+            call["original_prompt_tokens"] = prompt_usage["original_tokens"]
+        with self._lock:
+            turn = self._turns.get(turn_id)
+            if turn is None:
+                turn = {
+                    "turn_id": turn_id,
+                    "session_id": context.get("session_id"),
+                    "timestamp": time.time(),
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "calls": [],
+                }
+                self._turns[turn_id] = turn
+                while len(self._turns) > self.max_turns:
+                    self._turns.popitem(last=False)
+            turn["prompt_tokens"] += prompt_tokens
+            turn["completion_tokens"] += completion_tokens
+            turn["calls"].append(call)
+
+    def get_turn(self, turn_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            turn = self._turns.get(turn_id)
+            return json.loads(json.dumps(turn)) if turn else None
+
+    def recent(self, limit: int = 20, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Devuelve los últimos turnos registrados (opcionalmente de una sesión).
+        """
+        with self._lock:
+            turns = [turn for turn in self._turns.values() if session_id is None or turn["session_id"] == session_id]
+            return json.loads(json.dumps(turns[-limit:]))
+
+    def export_jsonl(self, path: str) -> int:
+        """
+        Escribe un turno por línea en formato JSONL. Devuelve cuántos se escribieron.
+        """
+        with self._lock:
+            turns = list(self._turns.values())
+            lines = [json.dumps(turn, ensure_ascii=False) for turn in turns]
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + ("\n" if lines else ""))
+        return len(lines)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            turns = list(self._turns.values())
+        prompt_tokens = sum(turn["prompt_tokens"] for turn in turns)
+        completion_tokens = sum(turn["completion_tokens"] for turn in turns)
+        truncated_calls = sum(1 for turn in turns for call in turn["calls"] if call.get("truncated"))
+        coalesced_calls = sum(1 for turn in turns for call in turn["calls"] if call.get("coalesced"))
+        return {
+            "turns": len(turns),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "avg_prompt_tokens_per_turn": round(prompt_tokens / len(turns), 1) if turns else 0.0,
+            "truncated_calls": truncated_calls,
+            "coalesced_calls": coalesced_calls,
+        }
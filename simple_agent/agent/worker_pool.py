@@ -0,0 +1,430 @@
+import bisect
+import hashlib
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from .scheduler import Priority
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Estado de los mensajes de resultado que llevan un fragmento de una respuesta transmitida
+STREAM_CHUNK = "chunk"
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """
+    Anillo de hash consistente con nodos virtuales para asignar sesiones a workers.
+
+    Al añadir o quitar un worker solo se reasignan las sesiones de los tramos
+    del anillo afectados.
+    """
+
+    def __init__(self, virtual_nodes: int = 128):
+        self.virtual_nodes = virtual_nodes
+        self._keys: List[int] = []
+        self._owners: Dict[int, int] = {}
+
+    def add(self, worker_id: int) -> None:
+        for replica in range(self.virtual_nodes):
+            key = _hash(f"worker-{worker_id}#{replica}")
+            bisect.insort(self._keys, key)
+            self._owners[key] = worker_id
+
+    def remove(self, worker_id: int) -> None:
+        self._keys = [key for key in self._keys if self._owners[key] != worker_id]
+        self._owners = {key: owner for key, owner in self._owners.items() if owner != worker_id}
+
+    def get(self, session_id: str) -> int:
+        """
+        Devuelve el worker responsable de una sesión.
+        """
+        if not self._keys:
+            raise RuntimeError("El anillo no tiene workers")
+        index = bisect.bisect(self._keys, _hash(session_id)) % len(self._keys)
+        return self._owners[self._keys[index]]
+
+
+def build_default_agent(fake_llm: bool = False) -> Any:
+    """
+    Fábrica por defecto de agentes para los procesos worker.
+    """
+    from dotenv import load_dotenv
+    from agent.conversation import ConversationalAgent
+    from agent.profiling import RequestProfiler
+    from tools import CompanyRankingTool, DateTimeTool
+
+    load_dotenv()
+    model_factory = None
+    if fake_llm or os.getenv("USE_FAKE_LLM"):
+        from agent.fake_llm import FakeChatModel
+        model_factory = lambda name: FakeChatModel(model_name=name)
+    return ConversationalAgent(
+        project_id=os.getenv('PROJECT_ID'),
+        location=os.getenv('REGION'),
+        tools=[CompanyRankingTool(), DateTimeTool()],
+        model_factory=model_factory,
+        profiler=RequestProfiler.from_env()
+    )
+
+
+def _worker_main(worker_id: int, requests: mp.Queue, results: mp.Queue,
+                 agent_factory: Callable[..., Any], factory_kwargs: Dict[str, Any],
+                 turn_threads: int) -> None:
+    """
+    Bucle principal de un proceso worker: un agente propio con sus checkpoints locales.
+    Los turnos corren en hilos para solapar la espera de las llamadas al LLM.
+    """
+    from utils.logging_setup import configure_logging
+    configure_logging()
+    agent = agent_factory(**factory_kwargs)
+    executor = ThreadPoolExecutor(max_workers=turn_threads, thread_name_prefix=f"worker-{worker_id}")
+    stats_lock = threading.Lock()
+    stats = {"completed": 0, "busy_time": 0.0}
+
+    def run_turn(request_id: int, message: str, session_id: str, priority: int, profile: bool = False,
+                 stream: bool = False) -> None:
+        start = time.monotonic()
+        try:
+            if stream:
+                # Cada fragmento viaja como un resultado parcial; el final no lleva valor
+                for piece in agent.stream_message(message, session_id, Priority(priority), profile):
+                    results.put((request_id, STREAM_CHUNK, piece))
+                value = None
+            else:
+                value = agent.process_message(message, session_id, Priority(priority), profile=profile)
+            results.put((request_id, True, value))
+        except Exception as e:
+            results.put((request_id, False, f"{type(e).__name__}: {str(e)}"))
+        with stats_lock:
+            stats["completed"] += 1
+            stats["busy_time"] += time.monotonic() - start
+
+    while True:
+        command, request_id, args = requests.get()
+        if command == "stop":
+            executor.shutdown(wait=True)
+            results.put((request_id, True, None))
+            return
+        if command in ("process", "stream"):
+            executor.submit(run_turn, request_id, *args, stream=command == "stream")
+            continue
+        try:
+            if command == "export":
+                value = agent.export_session(args[0])
+            elif command == "import":
+                agent.import_session(args[0], args[1])
+                value = None
+            elif command == "drop":
+                agent.drop_session(args[0])
+                value = None
+            elif command == "stats":
+                with stats_lock:
+                    value = {
+                        "pid": os.getpid(),
+                        "sessions": len(agent.conversation_contexts),
+                        "completed": stats["completed"],
+                        "busy_time_s": round(stats["busy_time"], 3),
+                    }
+            else:
+                raise ValueError(f"Comando desconocido: {command}")
+            results.put((request_id, True, value))
+        except Exception as e:
+            results.put((request_id, False, f"{type(e).__name__}: {str(e)}"))
+
+
+class _Worker:
+    """
+    Proceso worker y sus contadores en el proceso principal.
+    """
+
+    def __init__(self, worker_id: int, process: mp.Process, requests: mp.Queue):
+        self.worker_id = worker_id
+        self.process = process
+        self.requests = requests
+        self.in_flight = 0
+        self.completed = 0
+        self.total_latency = 0.0
+
+
+class WorkerPool:
+    """
+    Pool de procesos que reparte sesiones por hash consistente de `session_id`.
+
+    Cada sesión vive siempre en el mismo worker, de modo que su historial
+    (`MessageLog`) permanece en memoria de un solo proceso. Al añadir o quitar
+    workers, las sesiones afectadas se migran exportando su historial al nuevo
+    dueño (los checkpoints opcionales del grafo no se migran). Antes de
+    exportar una sesión se espera a que terminen sus turnos en curso, y los
+    turnos nuevos de esa sesión esperan a que termine la migración.
+    """
+
+    def __init__(self,
+                 num_workers: Optional[int] = None,
+                 agent_factory: Callable[..., Any] = build_default_agent,
+                 factory_kwargs: Optional[Dict[str, Any]] = None,
+                 virtual_nodes: int = 128,
+                 turn_threads: int = 8,
+                 request_timeout: float = 120.0):
+        """
+        Inicializa el pool. `agent_factory` debe ser una función de módulo (serializable)
+        que construya un `ConversationalAgent` en cada proceso.
+        """
+        self.agent_factory = agent_factory
+        self.factory_kwargs = factory_kwargs or {}
+        self.turn_threads = turn_threads
+        self.request_timeout = request_timeout
+
+        self._ctx = mp.get_context("spawn")
+        self._results = self._ctx.Queue()
+        self._ring = ConsistentHashRing(virtual_nodes)
+        self._workers: Dict[int, _Worker] = {}
+        self._sessions: Dict[str, int] = {}
+        self._pending: Dict[int, Future] = {}
+        # Colas de fragmentos de las respuestas transmitidas en curso
+        self._streams: Dict[int, queue.Queue] = {}
+        self._ids = itertools.count()
+        self._worker_ids = itertools.count()
+        self._lock = threading.RLock()
+        # Turnos en curso por sesión y sesiones en migración; se esperan con `_turns`
+        self._turns = threading.Condition(self._lock)
+        self._session_turns: Dict[str, int] = {}
+        self._migrating: Set[str] = set()
+        # Serializa los cambios de workers: el rebalanceo suelta `_lock` mientras espera
+        self._membership_lock = threading.Lock()
+        # Candado propio para las respuestas pendientes: el rebalanceo espera
+        # respuestas de los workers mientras mantiene `_lock`
+        self._pending_lock = threading.Lock()
+        self._closed = False
+
+        # Hilo que entrega los resultados de los workers a quien los espera
+        self._collector = threading.Thread(target=self._collect_results, name="worker-pool-results", daemon=True)
+        self._collector.start()
+
+        for _ in range(num_workers or os.cpu_count() or 1):
+            self.add_worker()
+
+    def _collect_results(self) -> None:
+        while not self._closed:
+            try:
+                request_id, ok, value = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if ok == STREAM_CHUNK:
+                with self._pending_lock:
+                    chunks = self._streams.get(request_id)
+                if chunks is not None:
+                    chunks.put(value)
+                continue
+            with self._pending_lock:
+                future = self._pending.pop(request_id, None)
+                chunks = self._streams.pop(request_id, None)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+            if chunks is not None:
+                chunks.put(None)
+
+    def _send(self, worker: _Worker, command: str, *args, chunks: Optional[queue.Queue] = None) -> Future:
+        future: Future = Future()
+        request_id = next(self._ids)
+        with self._pending_lock:
+            self._pending[request_id] = future
+            if chunks is not None:
+                self._streams[request_id] = chunks
+        worker.requests.put((command, request_id, args))
+        return future
+
+    def _call(self, worker: _Worker, command: str, *args) -> Any:
+        return self._send(worker, command, *args).result(timeout=self.request_timeout)
+
+    def add_worker(self) -> int:
+        """
+        Inicia un nuevo worker y migra a él las sesiones que ahora le corresponden.
+        """
+        worker_id = next(self._worker_ids)
+        requests = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, requests, self._results, self.agent_factory, self.factory_kwargs, self.turn_threads),
+            name=f"agent-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        with self._membership_lock, self._lock:
+            self._workers[worker_id] = _Worker(worker_id, process, requests)
+            self._ring.add(worker_id)
+            self._rebalance()
+        logger.info("Worker %d iniciado (pid %d)", worker_id, process.pid)
+        return worker_id
+
+    def remove_worker(self, worker_id: int) -> None:
+        """
+        Retira un worker, migrando antes sus sesiones a los nuevos dueños.
+        """
+        with self._membership_lock, self._lock:
+            if worker_id not in self._workers or len(self._workers) == 1:
+                raise ValueError("No se puede retirar el worker indicado")
+            self._ring.remove(worker_id)
+            self._rebalance()
+            worker = self._workers.pop(worker_id)
+        self._call(worker, "stop")
+        worker.process.join(timeout=5)
+        logger.info("Worker %d retirado", worker_id)
+
+    def _rebalance(self) -> int:
+        """
+        Migra las sesiones cuyo dueño cambió en el anillo. Devuelve cuántas se movieron.
+
+        Se llama con `_lock` tomado. Cada sesión se exporta cuando ya no tiene
+        turnos en curso; mientras tanto sus turnos nuevos quedan en espera.
+        """
+        moves = [(session_id, owner, self._ring.get(session_id))
+                 for session_id, owner in self._sessions.items()
+                 if self._ring.get(session_id) != owner]
+        self._migrating.update(session_id for session_id, _, _ in moves)
+        moved = 0
+        try:
+            for session_id, owner, new_owner in moves:
+                # Esperar a que el dueño actual termine los turnos de la sesión
+                drained = self._turns.wait_for(lambda: not self._session_turns.get(session_id),
+                                               timeout=self.request_timeout)
+                if not drained:
+                    logger.warning("Sesión %s migrada con turnos aún en curso", session_id)
+                source, target = self._workers[owner], self._workers[new_owner]
+                history = self._call(source, "export", session_id)
+                self._call(target, "import", session_id, history)
+                self._call(source, "drop", session_id)
+                self._sessions[session_id] = new_owner
+                self._migrating.discard(session_id)
+                self._turns.notify_all()
+                moved += 1
+        finally:
+            self._migrating.difference_update(session_id for session_id, _, _ in moves)
+            self._turns.notify_all()
+        if moved:
+            logger.info("Rebalanceo: %d sesiones migradas", moved)
+        return moved
+
+    def process_message(self, message: str, session_id: str = "default",
+                        priority: Priority = Priority.INTERACTIVE, profile: bool = False) -> str:
+        """
+        Procesa un mensaje en el worker responsable de la sesión.
+        """
+        with self._lock:
+            worker = self._begin_turn(session_id)
+            future = self._send(worker, "process", message, session_id, int(priority), profile)
+        start = time.monotonic()
+        try:
+            return future.result(timeout=self.request_timeout)
+        finally:
+            self._end_turn(worker, session_id, start)
+
+    def stream_message(self, message: str, session_id: str = "default",
+                       priority: Priority = Priority.INTERACTIVE, profile: bool = False) -> Iterator[str]:
+        """
+        Transmite la respuesta desde el worker responsable de la sesión: cada
+        fragmento de `ConversationalAgent.stream_message` se entrega según llega.
+        """
+        chunks: queue.Queue = queue.Queue()
+        with self._lock:
+            worker = self._begin_turn(session_id)
+            future = self._send(worker, "stream", message, session_id, int(priority), profile, chunks=chunks)
+        start = time.monotonic()
+        try:
+            deadline = start + self.request_timeout
+            while True:
+                try:
+                    piece = chunks.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    raise TimeoutError(f"El worker {worker.worker_id} no respondió en {self.request_timeout:.0f}s")
+                if piece is None:
+                    break
+                yield piece
+            # Propagar el error del worker si la respuesta terminó con uno
+            future.result(timeout=0)
+        finally:
+            self._end_turn(worker, session_id, start)
+
+    def _begin_turn(self, session_id: str) -> _Worker:
+        """
+        Elige el worker de la sesión y anota el turno. Se llama con `_lock`
+        tomado; si la sesión se está migrando, espera a que termine.
+        """
+        self._turns.wait_for(lambda: session_id not in self._migrating)
+        worker = self._workers[self._ring.get(session_id)]
+        self._sessions[session_id] = worker.worker_id
+        self._session_turns[session_id] = self._session_turns.get(session_id, 0) + 1
+        worker.in_flight += 1
+        return worker
+
+    def _end_turn(self, worker: _Worker, session_id: str, start: float) -> None:
+        with self._lock:
+            worker.in_flight -= 1
+            worker.completed += 1
+            worker.total_latency += time.monotonic() - start
+            remaining = self._session_turns.pop(session_id) - 1
+            if remaining:
+                self._session_turns[session_id] = remaining
+            self._turns.notify_all()
+
+    def get_load(self) -> Dict[int, Dict[str, Any]]:
+        """
+        Devuelve la carga por worker: sesiones asignadas, solicitudes en curso y latencia media.
+        """
+        with self._lock:
+            workers = list(self._workers.values())
+            sessions_per_worker: Dict[int, int] = {}
+            for owner in self._sessions.values():
+                sessions_per_worker[owner] = sessions_per_worker.get(owner, 0) + 1
+
+        load = {}
+        for worker in workers:
+            stats = self._call(worker, "stats")
+            load[worker.worker_id] = {
+                **stats,
+                "assigned_sessions": sessions_per_worker.get(worker.worker_id, 0),
+                "in_flight": worker.in_flight,
+                "avg_latency_ms": round(worker.total_latency / worker.completed * 1000, 1) if worker.completed else 0.0,
+            }
+        return load
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {"workers": self.get_load()}
+
+    def close(self) -> None:
+        """
+        Detiene todos los workers.
+        """
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+        for worker in workers:
+            try:
+                self._call(worker, "stop")
+            except Exception:
+                worker.process.terminate()
+            worker.process.join(timeout=5)
+        self._closed = True
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,346 @@
+"""
+Generador de carga que reproduce trazas JSONL contra el agente.
+
+Cada línea de la traza puede ser:
+    {"session_id": "s1", "message": "¿qué hora es?"}
+    {"session_id": "s1", "messages": ["hola", "ranking por inversión"]}
+    {"request_id": "...", "title": "...", "body": "..."}   (formato de requests.jsonl)
+
+Las sesiones llegan en lazo abierto (proceso de Poisson con tasa `--rate`) y sus
+turnos se reproducen en orden. Por defecto se usa un agente en este proceso con
+`FakeChatModel` (latencia log-normal configurable); con `--endpoint` se envían
+los turnos a un servidor (`server.py`).
+
+Uso (desde simple_agent/):
+    python -m benchmarks.loadgen ../requests.jsonl --rate 20 --concurrency 16
+    python -m benchmarks.loadgen trazas.jsonl --endpoint http://127.0.0.1:8080
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from agent.conversation import ConversationalAgent
+from agent.fake_llm import FakeChatModel
+from agent.resilience import ResiliencePolicy
+from agent.scheduler import LLMScheduler, Priority
+from tools import CompanyRankingTool, DateTimeTool
+
+logger = logging.getLogger(__name__)
+
+ROUTE_KEYWORD = "keyword"
+ROUTE_LLM = "llm"
+ROUTE_MULTI = "multi"
+
+# Respuestas de error del agente (process_message captura las excepciones)
+ERROR_PREFIXES = ("Lo siento", "En este momento estoy atendiendo")
+
+
+def load_traces(path: str) -> List[Tuple[str, List[str]]]:
+    """
+    Lee una traza JSONL y la agrupa en conversaciones (session_id, mensajes).
+    """
+    sessions: "OrderedDict[str, List[str]]" = OrderedDict()
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            session_id = str(record.get("session_id") or record.get("request_id") or f"trace-{line_number}")
+            if "messages" in record:
+                messages = [str(m) for m in record["messages"]]
+            elif "message" in record:
+                messages = [str(record["message"])]
+            else:
+                text = " ".join(str(record[key]) for key in ("title", "body") if record.get(key))
+                messages = [text] if text else []
+            sessions.setdefault(session_id, []).extend(messages)
+    return [(session_id, messages) for session_id, messages in sessions.items() if messages]
+
+
+def build_fake_agent(latency_median: float, latency_sigma: float,
+                     failure_rate: float, seed: Optional[int]) -> ConversationalAgent:
+    """
+    Crea un agente local con un modelo simulado y límites del planificador holgados.
+    """
+    counter = iter(range(1_000_000))
+
+    def factory(name: str) -> FakeChatModel:
+        return FakeChatModel(
+            model_name=name,
+            latency_median=latency_median,
+            latency_sigma=latency_sigma,
+            failure_rate=failure_rate,
+            seed=None if seed is None else seed + next(counter)
+        )
+
+    return ConversationalAgent(
+        tools=[CompanyRankingTool(), DateTimeTool()],
+        model_factory=factory,
+        scheduler=LLMScheduler(max_concurrency=64, requests_per_minute=1_000_000,
+                               tokens_per_minute=1_000_000_000, max_queue_depth=10_000),
+        resilience=ResiliencePolicy(max_workers=128)
+    )
+
+
+class EndpointClient:
+    """
+    Cliente HTTP con conexiones keep-alive (una por hilo) hacia `POST /chat`.
+    """
+
+    def __init__(self, endpoint: str, timeout: float = 120.0):
+        parsed = urlparse(endpoint)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def process_message(self, message: str, session_id: str, priority: Priority) -> str:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        body = json.dumps({
+            "message": message,
+            "session_id": session_id,
+            "priority": "batch" if priority == Priority.BATCH else "interactive"
+        })
+        try:
+            conn.request("POST", "/chat", body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            payload = json.loads(response.read())
+        except (ConnectionError, http.client.HTTPException, OSError):
+            self._local.conn = None
+            raise
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status}: {payload.get('error')}")
+        return payload["response"]
+
+
+class LoadReport:
+    """
+    Acumula latencias por ruta, errores y muestras de memoria.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {ROUTE_KEYWORD: [], ROUTE_LLM: [], ROUTE_MULTI: []}
+        self.errors: Dict[str, int] = {ROUTE_KEYWORD: 0, ROUTE_LLM: 0, ROUTE_MULTI: 0}
+        self.memory: List[Dict[str, float]] = []
+        self.started = time.monotonic()
+        self.finished = self.started
+
+    def record(self, route: str, latency: float, error: bool) -> None:
+        with self._lock:
+            self.latencies[route].append(latency)
+            if error:
+                self.errors[route] += 1
+
+    def sample_memory(self) -> None:
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        with self._lock:
+            self.memory.append({
+                "t_s": round(time.monotonic() - self.started, 2),
+                "rss_mb": round(_rss_bytes() / 2 ** 20, 1),
+                "traced_mb": round(current / 2 ** 20, 2),
+                "traced_peak_mb": round(peak / 2 ** 20, 2),
+            })
+
+    def summary(self) -> Dict[str, Any]:
+        duration = max(1e-9, self.finished - self.started)
+        total = sum(len(values) for values in self.latencies.values())
+        errors = sum(self.errors.values())
+        routes = {}
+        for route, values in self.latencies.items():
+            values = sorted(values)
+            routes[route] = {
+                "turns": len(values),
+                "errors": self.errors[route],
+                "p50_ms": _percentile(values, 0.50) * 1000,
+                "p90_ms": _percentile(values, 0.90) * 1000,
+                "p99_ms": _percentile(values, 0.99) * 1000,
+                "max_ms": (values[-1] if values else 0.0) * 1000,
+            }
+        return {
+            "duration_s": round(duration, 2),
+            "turns": total,
+            "throughput_tps": round(total / duration, 2),
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "routes": routes,
+            "memory": self.memory,
+        }
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def _rss_bytes() -> int:
+    """
+    Memoria residente del proceso (Linux: /proc; otros sistemas: máximo de getrusage).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def classify_route(classifier: ConversationalAgent, message: str) -> str:
+    """
+    Clasifica un turno según la ruta que seguirá en el agente.
+    """
+    if classifier._detect_multiple_requests(message):
+        return ROUTE_MULTI
+    if classifier._pre_check_tools(message):
+        return ROUTE_KEYWORD
+    return ROUTE_LLM
+
+
+def run_load(traces: List[Tuple[str, List[str]]],
+             target: Any,
+             classifier: ConversationalAgent,
+             rate: float,
+             concurrency: int,
+             max_sessions: Optional[int] = None,
+             think_time: float = 0.0,
+             memory_interval: float = 1.0,
+             priority: Priority = Priority.INTERACTIVE,
+             seed: Optional[int] = None) -> LoadReport:
+    """
+    Reproduce las trazas en lazo abierto y devuelve el reporte.
+
+    Las llegadas de sesiones siguen un proceso de Poisson de tasa `rate` (sesiones/s)
+    independientemente de cuánto tarden las respuestas; si hay más sesiones activas
+    que `concurrency`, esperan y esa espera se cuenta en la latencia del primer turno.
+    """
+    rng = random.Random(seed)
+    report = LoadReport()
+    total_sessions = max_sessions or len(traces)
+    stop_sampling = threading.Event()
+
+    def sampler() -> None:
+        while not stop_sampling.wait(memory_interval):
+            report.sample_memory()
+
+    def run_session(index: int, scheduled_at: float) -> None:
+        base_id, messages = traces[index % len(traces)]
+        session_id = f"{base_id}-{index}"
+        turn_start = scheduled_at
+        for message in messages:
+            route = classify_route(classifier, message)
+            error = False
+            try:
+                response = target.process_message(message, session_id, priority)
+                error = response.startswith(ERROR_PREFIXES)
+            except Exception as e:
+                logger.debug("Error en sesión %s: %s", session_id, e)
+                error = True
+            report.record(route, time.monotonic() - turn_start, error)
+            if think_time:
+                time.sleep(rng.expovariate(1.0 / think_time))
+            turn_start = time.monotonic()
+
+    report.sample_memory()
+    sampler_thread = threading.Thread(target=sampler, daemon=True)
+    sampler_thread.start()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        next_arrival = time.monotonic()
+        for index in range(total_sessions):
+            delay = next_arrival - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(run_session, index, next_arrival)
+            next_arrival += rng.expovariate(rate) if rate > 0 else 0.0
+
+    report.finished = time.monotonic()
+    stop_sampling.set()
+    sampler_thread.join()
+    report.sample_memory()
+    return report
+
+
+def format_report(summary: Dict[str, Any]) -> str:
+    """
+    Formatea el resumen como tabla legible.
+    """
+    lines = [
+        f"Duración: {summary['duration_s']} s  Turnos: {summary['turns']}  "
+        f"Throughput: {summary['throughput_tps']} turnos/s  Errores: {summary['error_rate']:.2%}",
+        "",
+        f"{'ruta':<10}{'turnos':>8}{'errores':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}",
+    ]
+    for route, stats in summary["routes"].items():
+        lines.append(
+            f"{route:<10}{stats['turns']:>8}{stats['errors']:>9}{stats['p50_ms']:>10.1f}"
+            f"{stats['p90_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}"
+        )
+    if summary["memory"]:
+        first, last = summary["memory"][0], summary["memory"][-1]
+        peak = max(sample["rss_mb"] for sample in summary["memory"])
+        lines += ["", f"Memoria RSS: {first['rss_mb']} MB -> {last['rss_mb']} MB (máx. {peak} MB)"]
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reproduce trazas JSONL contra el agente")
+    parser.add_argument("trace", help="Archivo JSONL con la traza")
+    parser.add_argument("--rate", type=float, default=10.0, help="Llegadas de sesiones por segundo")
+    parser.add_argument("--concurrency", type=int, default=16, help="Sesiones simultáneas")
+    parser.add_argument("--sessions", type=int, default=None, help="Total de sesiones (repite la traza si es mayor)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Pausa media entre turnos de una sesión (s)")
+    parser.add_argument("--endpoint", default=None, help="URL del servidor (p. ej. http://127.0.0.1:8080)")
+    parser.add_argument("--latency-median", type=float, default=0.4, help="Latencia mediana del modelo simulado (s)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Dispersión log-normal de la latencia")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fracción de llamadas simuladas que fallan")
+    parser.add_argument("--batch", action="store_true", help="Enviar los turnos con prioridad BATCH")
+    parser.add_argument("--trace-memory", action="store_true", help="Activar tracemalloc (más preciso, más lento)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="Imprimir el resumen en JSON")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    traces = load_traces(args.trace)
+    if not traces:
+        parser.error("La traza no contiene mensajes")
+
+    # El clasificador de rutas no llama al LLM, solo usa la detección local
+    classifier = build_fake_agent(0.0, 0.0, 0.0, None)
+    if args.endpoint:
+        target: Any = EndpointClient(args.endpoint)
+    else:
+        target = build_fake_agent(args.latency_median, args.latency_sigma, args.failure_rate, args.seed)
+
+    if args.trace_memory:
+        tracemalloc.start()
+
+    report = run_load(
+        traces,
+        target,
+        classifier,
+        rate=args.rate,
+        concurrency=args.concurrency,
+        max_sessions=args.sessions,
+        think_time=args.think_time,
+        priority=Priority.BATCH if args.batch else Priority.INTERACTIVE,
+        seed=args.seed
+    )
+    summary = report.summary()
+    print(json.dumps(summary, indent=2, ensure_ascii=False) if args.json else format_report(summary))
+
+
+if __name__ == "__main__":
+    main()
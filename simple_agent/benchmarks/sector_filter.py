@@ -0,0 +1,110 @@
+"""
+Benchmark de los rankings filtrados por sector.
+
+Genera rankings sintéticos con decenas de miles de empresas y compara el filtro
+con conjuntos de bits por sector (`SectorBitmapIndex`) con un recorrido de las
+entradas que clasifica el sector de cada una. Mide la construcción del índice
+y el tiempo por consulta de varios filtros AND/OR/NOT.
+
+Uso (desde simple_agent/):
+    python -m benchmarks.sector_filter
+    python -m benchmarks.sector_filter --companies 50000 --repeat 200
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+from tools.ranking_data import RankingDataset
+from tools.sector_index import SectorBitmapIndex, SectorTaxonomy, SectorTerm
+
+SECTORS = ["Minería", "Energía", "Banca", "Retail", "Alimentos", "Bebidas", "Diversificado",
+           "Minería/Banca", "Retail/Banca", "Consumo masivo"]
+
+QUERIES = [
+    "top 5 de ingresos en minería o energía",
+    "top 10 de ingresos en recursos naturales sin minería",
+    "top 5 de ingresos de banca y retail",
+    "top 5 de ingresos excepto consumo",
+    "top 5 de ingresos de bebidas",
+]
+
+
+def build_dataset(companies: int, seed: int = 0) -> RankingDataset:
+    """
+    Rankings sintéticos de ingresos con `companies` empresas.
+    """
+    rng = random.Random(seed)
+    return RankingDataset({"ingresos": [
+        {"name": f"Empresa {i}", "value": rng.randint(1, 10_000_000), "sector": rng.choice(SECTORS)}
+        for i in range(companies)
+    ]})
+
+
+def scan_top(entries: Any, taxonomy: SectorTaxonomy, terms: List[SectorTerm], limit: int) -> List[str]:
+    """
+    Filtro de referencia: clasifica el sector de cada entrada en orden de ranking.
+    """
+    result = []
+    for entry in entries:
+        sectors = set(taxonomy.classify(entry.sector))
+        keep = None
+        for term in terms:
+            match = (term.sector in sectors) != term.negate
+            keep = match if keep is None else (keep or match) if term.op == "or" else (keep and match)
+        if keep:
+            result.append(entry.name)
+            if len(result) == limit:
+                break
+    return result
+
+
+def run_benchmark(companies: int, repeat: int) -> Dict[str, Any]:
+    dataset = build_dataset(companies)
+    snapshot = dataset.snapshot
+    taxonomy = SectorTaxonomy()
+
+    started = time.perf_counter()
+    index = SectorBitmapIndex(snapshot, taxonomy)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    results: Dict[str, Any] = {"companies": companies, "index_build_ms": round(build_ms, 2), "queries": []}
+    for query in QUERIES:
+        terms = taxonomy.parse_filter(query)
+        limit = int(query.split()[1])
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            bitmap = [entry.name for _, entry in index.top("ingresos", index.evaluate("ingresos", terms), limit)]
+        bitmap_us = (time.perf_counter() - started) / repeat * 1e6
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            scanned = scan_top(snapshot.rankings["ingresos"], taxonomy, terms, limit)
+        scan_us = (time.perf_counter() - started) / repeat * 1e6
+
+        results["queries"].append({
+            "query": query,
+            "matches": index.count(index.evaluate("ingresos", terms)),
+            "bitmap_us": round(bitmap_us, 1),
+            "scan_us": round(scan_us, 1),
+            "same_result": bitmap == scanned,
+        })
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de rankings filtrados por sector")
+    parser.add_argument("--companies", type=int, default=20000, help="Empresas en el ranking sintético")
+    parser.add_argument("--repeat", type=int, default=100, help="Repeticiones por consulta")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.companies, args.repeat)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Benchmark de memoria por turno de las sesiones del SimpleAgent.
+
+Compara los bytes retenidos por turno con distintas representaciones del historial:
+listas de `HumanMessage`/`AIMessage` (representación anterior), `MessageLog` sin
+comprimir y `MessageLog` con los turnos antiguos comprimidos con zlib. También mide
+el agente completo con y sin checkpoints de LangGraph, usando `FakeChatModel`.
+
+Uso (desde simple_agent/):
+    python -m benchmarks.session_memory
+    python -m benchmarks.session_memory --sessions 50 --turns 100
+"""
+import argparse
+import gc
+import json
+import logging
+import random
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+USER_MESSAGES = [
+    "Hola, ¿qué hora es en Lima?",
+    "Dame el ranking de empresas por inversión",
+    "¿Cuáles son los próximos feriados en Perú?",
+    "¿Qué empresa tiene más empleados?",
+    "Gracias, ¿y qué hora es en Madrid ahora mismo?",
+    "Explícame por qué Credicorp lidera el ranking por valor de mercado",
+]
+
+
+def build_turns(turns: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """
+    Genera turnos sintéticos (usuario, asistente) con respuestas de tamaño realista.
+    """
+    from tools import CompanyRankingTool, DateTimeTool
+
+    tools = [CompanyRankingTool(), DateTimeTool()]
+    rng = random.Random(seed)
+    result = []
+    for i in range(turns):
+        message = rng.choice(USER_MESSAGES)
+        tool = tools[0] if "ranking" in message or "empresa" in message else tools[1]
+        answer = f"Turno {i}: " + tool.run(message)
+        result.append((message, answer))
+    return result
+
+
+def measure(build: Callable[[], Any], total_turns: int) -> Dict[str, float]:
+    """
+    Mide con tracemalloc la memoria retenida por la estructura que construye `build`.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    retained = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del retained
+    used = after - before
+    return {"total_kb": round(used / 1024, 1), "bytes_per_turn": round(used / total_turns, 1)}
+
+
+def run_benchmark(sessions: int, turns: int) -> Dict[str, Any]:
+    from langchain_core.messages import AIMessage, HumanMessage
+    from agent.message_log import MessageLog
+
+    conversation = build_turns(turns)
+    total_turns = sessions * turns
+
+    def session_texts(session: int) -> List[Tuple[str, str]]:
+        # Cadenas propias por sesión, como ocurre con conversaciones reales
+        return [(f"{user_text} ({session})", f"{answer} ({session})") for user_text, answer in conversation]
+
+    def langchain_messages() -> Dict[str, List[Any]]:
+        contexts: Dict[str, List[Any]] = {}
+        for s in range(sessions):
+            history = contexts.setdefault(f"s{s}", [])
+            for user_text, answer in session_texts(s):
+                history.append(HumanMessage(content=user_text))
+                history.append(AIMessage(content=answer))
+        return contexts
+
+    def message_log(compress_after: Any) -> Callable[[], Dict[str, MessageLog]]:
+        def build() -> Dict[str, MessageLog]:
+            contexts: Dict[str, MessageLog] = {}
+            for s in range(sessions):
+                log = contexts.setdefault(f"s{s}", MessageLog(compress_after=compress_after))
+                for user_text, answer in session_texts(s):
+                    log.add_turn(user_text, answer)
+            return contexts
+        return build
+
+    return {
+        "sessions": sessions,
+        "turns_per_session": turns,
+        "history": {
+            "langchain_messages": measure(langchain_messages, total_turns),
+            "message_log": measure(message_log(None), total_turns),
+            "message_log_zlib": measure(message_log(20), total_turns),
+        },
+        "agent": measure_agent(min(sessions, 5), min(turns, 30)),
+    }
+
+
+def measure_agent(sessions: int, turns: int) -> Dict[str, Dict[str, float]]:
+    """
+    Mide el agente completo con checkpoints de LangGraph (representación anterior)
+    y solo con el historial compacto.
+    """
+    from agent.conversation import ConversationalAgent
+    from agent.fake_llm import FakeChatModel
+    from tools import CompanyRankingTool, DateTimeTool
+
+    rng = random.Random(1)
+    messages = [rng.choice(USER_MESSAGES) for _ in range(turns)]
+    results = {}
+    for label, checkpointing in (("with_checkpoints", True), ("message_log_only", False)):
+        agent = ConversationalAgent(
+            tools=[CompanyRankingTool(), DateTimeTool()],
+            model_factory=lambda name: FakeChatModel(model_name=name),
+            checkpointing=checkpointing
+        )
+        # Construir grafo y modelos fuera de la medición
+        agent.process_message("hola", "warm-up")
+        agent.drop_session("warm-up")
+
+        def run_turns() -> ConversationalAgent:
+            for s in range(sessions):
+                for message in messages:
+                    agent.process_message(message, f"s{s}")
+            return agent
+
+        results[label] = measure(run_turns, sessions * turns)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de memoria por turno de las sesiones")
+    parser.add_argument("--sessions", type=int, default=20, help="Sesiones simultáneas")
+    parser.add_argument("--turns", type=int, default=60, help="Turnos por sesión")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    results = run_benchmark(args.sessions, args.turns)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Benchmark de arranque del SimpleAgent.
+
+Mide el tiempo de importación de los módulos del agente (con `python -X importtime`),
+el tiempo de construcción de `ConversationalAgent` y el tiempo por re-ejecución del
+script de Streamlit. Con `--check` compara los resultados con el presupuesto
+que se deriva de la línea base de `startup_baseline.json` (línea base ×
+`tolerance`) y termina con error si se supera. Con `--record` se vuelve a medir
+la línea base en la máquina actual.
+
+Uso (desde simple_agent/):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --check
+    python -m benchmarks.startup --record
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+
+IMPORT_TARGETS = ["agent.conversation", "tools", "agent.conversation, tools"]
+
+# Margen sobre la línea base: relativo y, para las métricas de pocos ms, absoluto
+DEFAULT_TOLERANCE = 1.5
+DEFAULT_MIN_SLACK_MS = 2.0
+
+AGENT_INIT_SNIPPET = """
+import json, time
+start = time.perf_counter()
+from agent.conversation import ConversationalAgent
+from agent.fake_llm import FakeChatModel
+from tools import CompanyRankingTool, DateTimeTool
+imported = time.perf_counter()
+agent = ConversationalAgent(
+    tools=[CompanyRankingTool(), DateTimeTool()],
+    model_factory=lambda name: FakeChatModel(model_name=name)
+)
+built = time.perf_counter()
+agent.process_message("hola")
+first_turn = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "init_ms": (built - imported) * 1000,
+    "first_turn_ms": (first_turn - built) * 1000
+}))
+"""
+
+APP_RERUN_SNIPPET = """
+import json, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("app.py", default_timeout=60)
+start = time.perf_counter()
+app.run()
+first = time.perf_counter() - start
+reruns = []
+for _ in range(%d):
+    start = time.perf_counter()
+    app.run()
+    reruns.append(time.perf_counter() - start)
+print(json.dumps({"first_run_ms": first * 1000, "rerun_ms": sorted(reruns)[len(reruns) // 2] * 1000}))
+"""
+
+
+def _run_python(args: List[str], env: Dict[str, str] = None) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable] + args,
+        cwd=AGENT_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, **(env or {})}
+    )
+
+
+def measure_import(target: str, runs: int) -> Dict[str, Any]:
+    """
+    Mide el tiempo acumulado de importación de `target` y sus dependencias directas más costosas.
+    """
+    best_total = None
+    best_top: List[Dict[str, Any]] = []
+    for _ in range(runs):
+        proc = _run_python(["-X", "importtime", "-c", f"import {target}"])
+        total = 0
+        top = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            try:
+                cumulative_us = int(cumulative.strip())
+            except ValueError:
+                continue
+            # La sangría de importtime indica la profundidad (1 espacio + 2 por nivel)
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            if depth == 0:
+                total += cumulative_us
+            elif depth == 1:
+                top.append({"module": name.strip(), "ms": cumulative_us / 1000})
+        if best_total is None or total < best_total:
+            best_total = total
+            best_top = sorted(top, key=lambda item: item["ms"], reverse=True)[:8]
+    return {"total_ms": (best_total or 0) / 1000, "top": best_top}
+
+
+def measure_agent_init(runs: int) -> Dict[str, float]:
+    """
+    Mide importación, construcción del agente y primer turno con un modelo simulado.
+    """
+    samples = []
+    for _ in range(runs):
+        proc = _run_python(["-c", AGENT_INIT_SNIPPET])
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr[-2000:])
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {key: min(sample[key] for sample in samples) for key in samples[0]}
+
+
+def measure_app_rerun(reruns: int) -> Dict[str, float]:
+    """
+    Mide la primera ejecución y la mediana de las re-ejecuciones del script de Streamlit.
+    """
+    proc = _run_python(["-c", APP_RERUN_SNIPPET % reruns], env={"USE_FAKE_LLM": "1"})
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(runs: int = 3, include_app: bool = True) -> Dict[str, Any]:
+    """
+    Ejecuta todas las mediciones de arranque.
+    """
+    results: Dict[str, Any] = {
+        "imports": {target: measure_import(target, runs) for target in IMPORT_TARGETS},
+        "agent": measure_agent_init(runs),
+    }
+    if include_app:
+        results["app"] = measure_app_rerun(reruns=10)
+    return results
+
+
+def budget_metrics(results: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Extrae de los resultados las métricas sujetas a presupuesto.
+    """
+    current = {
+        "import_agent_conversation_ms": results["imports"]["agent.conversation"]["total_ms"],
+        "agent_init_ms": results["agent"]["init_ms"],
+    }
+    if "app" in results:
+        current["app_rerun_ms"] = results["app"]["rerun_ms"]
+    return current
+
+
+def derive_budget(reference: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Presupuesto por métrica: la línea base multiplicada por `tolerance`, con
+    al menos `min_slack_ms` de margen absoluto.
+    """
+    tolerance = reference.get("tolerance", DEFAULT_TOLERANCE)
+    min_slack = reference.get("min_slack_ms", DEFAULT_MIN_SLACK_MS)
+    return {
+        key: max(value * tolerance, value + min_slack)
+        for key, value in reference["baseline"].items()
+        if isinstance(value, (int, float))
+    }
+
+
+def check_budget(results: Dict[str, Any], budget: Dict[str, float]) -> List[str]:
+    """
+    Devuelve la lista de métricas que superan el presupuesto.
+    """
+    return [
+        f"{key}: {value:.1f} ms > {budget[key]:.1f} ms"
+        for key, value in budget_metrics(results).items()
+        if key in budget and value > budget[key]
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de arranque del SimpleAgent")
+    parser.add_argument("--runs", type=int, default=3, help="Repeticiones por medición (se toma el mínimo)")
+    parser.add_argument("--no-app", action="store_true", help="No medir la app de Streamlit")
+    parser.add_argument("--check", action="store_true", help="Comparar con el presupuesto de startup_baseline.json")
+    parser.add_argument("--record", action="store_true", help="Guardar los resultados como línea base")
+    args = parser.parse_args()
+
+    results = run_benchmark(runs=args.runs, include_app=not args.no_app)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+    with open(BASELINE_PATH, encoding="utf-8") as f:
+        reference = json.load(f)
+
+    if args.record:
+        reference["baseline"] = {
+            "description": f"Medición con --runs {args.runs} en la máquina de referencia",
+            **{key: round(value, 1) for key, value in budget_metrics(results).items()},
+        }
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(reference, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"Línea base guardada en {BASELINE_PATH}", file=sys.stderr)
+
+    if args.check:
+        budget = derive_budget(reference)
+        failures = check_budget(results, budget)
+        if failures:
+            print("Presupuesto de arranque superado:\n" + "\n".join(failures), file=sys.stderr)
+            return 1
+        print("Arranque dentro del presupuesto.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
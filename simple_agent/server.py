@@ -0,0 +1,496 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import struct
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from agent.conversation import ConversationalAgent
+from agent.profiling import RequestProfiler
+from agent.scheduler import Priority
+from agent.worker_pool import WorkerPool
+from tools.company_ranking import CompanyRankingTool
+from tools.datetime_tool import DateTimeTool
+from utils.logging_setup import configure_logging, get_logging_metrics
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# GUID definido por RFC 6455 para el handshake de WebSocket
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+HTTP_REASONS = {
+    200: "OK", 101: "Switching Protocols", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 503: "Service Unavailable"
+}
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+class HttpError(Exception):
+    """
+    Error HTTP con código de estado para responder al cliente.
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ServerMetrics:
+    """
+    Contadores y latencias del servidor.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.requests: Dict[str, int] = {}
+        self.rejected = 0
+        self.errors = 0
+        self.active_connections = 0
+        self.in_flight = 0
+        self.latencies: Deque[float] = deque(maxlen=2000)
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+        return {
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "requests": dict(self.requests),
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "active_connections": self.active_connections,
+            "in_flight": self.in_flight,
+            "latency_ms_p50": percentile(0.50),
+            "latency_ms_p95": percentile(0.95),
+            "latency_ms_p99": percentile(0.99),
+        }
+
+
+class AgentServer:
+    """
+    Servidor HTTP/WebSocket asíncrono alrededor de `ConversationalAgent`
+    (o de un `WorkerPool` de agentes en varios procesos).
+
+    Endpoints:
+    - POST /chat: JSON {"message", "session_id", "priority", "profile"} -> {"response", ...}
+    - GET /ws: WebSocket; cada mensaje JSON recibe fragmentos {"type": "token"} y un {"type": "done"}
+    - GET /health: estado del servidor
+    - GET /metrics: métricas del servidor y del agente
+    """
+
+    def __init__(self,
+                 agent: Any,
+                 max_concurrency: int = 8,
+                 max_pending: int = 64,
+                 keep_alive_timeout: float = 15.0):
+        self.agent = agent
+        self.max_pending = max_pending
+        self.keep_alive_timeout = keep_alive_timeout
+        self.metrics = ServerMetrics()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # El agente es síncrono: cada turno corre en un hilo del pool
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="agent-turn")
+
+    async def serve(self, host: str, port: int) -> None:
+        """
+        Inicia el servidor y atiende conexiones indefinidamente.
+        """
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        logger.info("Servidor del agente escuchando en http://%s:%d", host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Atiende una conexión HTTP/1.1 con keep-alive (varias solicitudes por conexión).
+        """
+        self.metrics.active_connections += 1
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), timeout=self.keep_alive_timeout)
+                except asyncio.TimeoutError:
+                    break
+                except HttpError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "keep-alive").lower() != "close"
+
+                if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                    await self._handle_websocket(reader, writer, headers)
+                    break
+
+                status, payload = await self._dispatch(method, path, body)
+                await self._send_json(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.metrics.active_connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """
+        Lee una solicitud HTTP; devuelve None si el cliente cerró la conexión.
+        """
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "Línea de solicitud inválida")
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise HttpError(400, "Content-Length inválido")
+        if length < 0:
+            raise HttpError(400, "Content-Length inválido")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "Cuerpo demasiado grande")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], headers, body
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        """
+        Enruta una solicitud HTTP al endpoint correspondiente.
+        """
+        self.metrics.requests[path] = self.metrics.requests.get(path, 0) + 1
+
+        if path == "/health":
+            return 200, {"status": "ok", "in_flight": self.metrics.in_flight}
+        if path == "/metrics":
+            loop = asyncio.get_running_loop()
+            return 200, await loop.run_in_executor(self._executor, self._collect_metrics)
+        if path != "/chat":
+            return 404, {"error": f"Ruta no encontrada: {path}"}
+        if method != "POST":
+            return 405, {"error": "Usa POST para /chat"}
+
+        try:
+            payload, message = _parse_chat_payload(body or b"{}")
+        except ValueError:
+            return 400, {"error": "Se espera un JSON con el campo 'message'"}
+
+        session_id = str(payload.get("session_id", "default"))
+        priority = Priority.BATCH if payload.get("priority") == "batch" else Priority.INTERACTIVE
+        profile = bool(payload.get("profile", False))
+        try:
+            response, latency = await self._run_turn(message, session_id, priority, profile)
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        return 200, {"response": response, "session_id": session_id, "latency_ms": round(latency * 1000, 1)}
+
+    async def _run_turn(self, message: str, session_id: str, priority: Priority,
+                        profile: bool = False) -> Tuple[str, float]:
+        """
+        Ejecuta un turno del agente respetando el límite de concurrencia.
+        """
+        async with self._admission():
+            loop = asyncio.get_running_loop()
+            start = time.monotonic()
+            response = await loop.run_in_executor(
+                self._executor, self.agent.process_message, message, session_id, priority, profile
+            )
+            latency = time.monotonic() - start
+            self.metrics.latencies.append(latency)
+            return response, latency
+
+    def _admission(self) -> "_Admission":
+        """
+        Control de admisión: rechaza con 503 si hay demasiadas solicitudes pendientes.
+        """
+        if self.metrics.in_flight >= self.max_pending:
+            self.metrics.rejected += 1
+            raise HttpError(503, "Servidor saturado, intenta nuevamente")
+        return _Admission(self)
+
+    def _collect_metrics(self) -> Dict[str, Any]:
+        """
+        Reúne métricas del servidor y de los componentes del agente.
+        """
+        if isinstance(self.agent, WorkerPool):
+            return {"server": self.metrics.to_dict(), "logging": get_logging_metrics(), **self.agent.get_metrics()}
+        return {
+            "server": self.metrics.to_dict(),
+            "scheduler": self.agent.scheduler.get_metrics(),
+            "resilience": self.agent.resilience.get_metrics(),
+            "models": self.agent.model_router.get_metrics(),
+            "speculation": self.agent.speculator.get_metrics() if self.agent.speculator else {},
+            "tokens": self.agent.token_usage.get_metrics(),
+            "datasets": {
+                tool.name: tool.dataset.get_metrics()
+                for tool in self.agent.tools if getattr(tool, "dataset", None) is not None
+            },
+            "coalescing": {
+                "llm": self.agent.llm_flight.get_metrics() if self.agent.llm_flight else {},
+                "tools": self.agent.tool_flight.get_metrics() if self.agent.tool_flight else {},
+            },
+            "profiling": self.agent.profiler.get_metrics() if self.agent.profiler else {},
+            "logging": get_logging_metrics(),
+        }
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int,
+                         payload: Dict[str, Any], keep_alive: bool) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        if status >= 500:
+            self.metrics.errors += 1
+        headers = [
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, 'OK')}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if keep_alive:
+            headers.append(f"Keep-Alive: timeout={int(self.keep_alive_timeout)}")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    # --- WebSocket (RFC 6455, solo lo necesario: texto, ping/pong y cierre) ---
+
+    async def _handle_websocket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                                headers: Dict[str, str]) -> None:
+        """
+        Completa el handshake y atiende mensajes JSON transmitiendo la respuesta por fragmentos.
+        """
+        key = headers.get("sec-websocket-key")
+        if not key:
+            await self._send_json(writer, 400, {"error": "Falta Sec-WebSocket-Key"}, keep_alive=False)
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode("latin-1"))
+        await writer.drain()
+        self.metrics.requests["/ws"] = self.metrics.requests.get("/ws", 0) + 1
+
+        while True:
+            opcode, data = await _read_frame(reader)
+            if opcode == 0x8:
+                writer.write(_encode_frame(0x8, data[:2]))
+                await writer.drain()
+                return
+            if opcode == 0x9:
+                writer.write(_encode_frame(0xA, data))
+                await writer.drain()
+                continue
+            if opcode != 0x1:
+                continue
+
+            try:
+                payload, message = _parse_chat_payload(data)
+            except ValueError:
+                await self._send_ws_json(writer, {"type": "error", "error": "Se espera un JSON con el campo 'message'"})
+                continue
+
+            session_id = str(payload.get("session_id", "default"))
+            priority = Priority.BATCH if payload.get("priority") == "batch" else Priority.INTERACTIVE
+            profile = bool(payload.get("profile", False))
+            try:
+                await self._stream_turn(writer, message, session_id, priority, profile)
+            except HttpError as e:
+                await self._send_ws_json(writer, {"type": "error", "error": str(e)})
+
+    async def _stream_turn(self, writer: asyncio.StreamWriter, message: str,
+                           session_id: str, priority: Priority, profile: bool = False) -> None:
+        """
+        Ejecuta un turno y envía cada fragmento de la respuesta en cuanto está disponible.
+        """
+        async with self._admission():
+            loop = asyncio.get_running_loop()
+            queue: asyncio.Queue = asyncio.Queue()
+            start = time.monotonic()
+
+            def produce() -> None:
+                try:
+                    for chunk in self.agent.stream_message(message, session_id, priority, profile):
+                        loop.call_soon_threadsafe(queue.put_nowait, chunk)
+                finally:
+                    loop.call_soon_threadsafe(queue.put_nowait, None)
+
+            producer = loop.run_in_executor(self._executor, produce)
+            parts = []
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                parts.append(chunk)
+                await self._send_ws_json(writer, {"type": "token", "content": chunk})
+            await producer
+
+            latency = time.monotonic() - start
+            self.metrics.latencies.append(latency)
+            await self._send_ws_json(writer, {
+                "type": "done",
+                "response": "".join(parts),
+                "session_id": session_id,
+                "latency_ms": round(latency * 1000, 1)
+            })
+
+    async def _send_ws_json(self, writer: asyncio.StreamWriter, payload: Dict[str, Any]) -> None:
+        writer.write(_encode_frame(0x1, json.dumps(payload, ensure_ascii=False).encode("utf-8")))
+        await writer.drain()
+
+
+class _Admission:
+    """
+    Contexto asíncrono que ocupa un cupo de concurrencia del servidor.
+    """
+
+    def __init__(self, server: AgentServer):
+        self.server = server
+
+    async def __aenter__(self) -> None:
+        self.server.metrics.in_flight += 1
+        await self.server._semaphore.acquire()
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.server._semaphore.release()
+        self.server.metrics.in_flight -= 1
+
+
+def _parse_chat_payload(data: bytes) -> Tuple[Dict[str, Any], str]:
+    """
+    Decodifica el JSON de un turno; lanza ValueError si no es un objeto con un
+    campo 'message' de texto.
+    """
+    payload = json.loads(data)
+    if not isinstance(payload, dict) or not isinstance(payload.get("message"), str):
+        raise ValueError("Se espera un objeto JSON con el campo 'message'")
+    return payload, payload["message"]
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    """
+    Lee un frame WebSocket del cliente (siempre enmascarado) y reensambla fragmentos.
+    """
+    payload = b""
+    first_opcode = None
+    while True:
+        header = await reader.readexactly(2)
+        fin = header[0] & 0x80
+        opcode = header[0] & 0x0F
+        masked = header[1] & 0x80
+        length = header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await reader.readexactly(8))[0]
+        if length > MAX_BODY_BYTES:
+            raise ConnectionError("Frame WebSocket demasiado grande")
+        mask = await reader.readexactly(4) if masked else b"\x00\x00\x00\x00"
+        data = await reader.readexactly(length)
+        data = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+
+        # Los frames de control pueden intercalarse y no se fragmentan
+        if opcode >= 0x8:
+            return opcode, data
+        if first_opcode is None:
+            first_opcode = opcode
+        payload += data
+        if fin:
+            return first_opcode, payload
+
+
+def _encode_frame(opcode: int, data: bytes) -> bytes:
+    """
+    Codifica un frame WebSocket del servidor (sin máscara).
+    """
+    header = bytes([0x80 | opcode])
+    length = len(data)
+    if length < 126:
+        header += bytes([length])
+    elif length < 2 ** 16:
+        header += bytes([126]) + struct.pack("!H", length)
+    else:
+        header += bytes([127]) + struct.pack("!Q", length)
+    return header + data
+
+
+def create_agent(fake_llm: bool = False) -> ConversationalAgent:
+    """
+    Crea el agente con las herramientas por defecto.
+    """
+    load_dotenv()
+    model_factory = None
+    if fake_llm or os.getenv("USE_FAKE_LLM"):
+        from agent.fake_llm import FakeChatModel
+        model_factory = lambda name: FakeChatModel(model_name=name)
+
+    agent = ConversationalAgent(
+        project_id=os.getenv('PROJECT_ID'),
+        location=os.getenv('REGION'),
+        tools=[CompanyRankingTool(), DateTimeTool()],
+        model_factory=model_factory,
+        profiler=RequestProfiler.from_env()
+    )
+    agent.warm_up()
+    return agent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Servidor HTTP/WebSocket del SimpleAgent")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-concurrency", type=int, default=8, help="Turnos simultáneos del agente")
+    parser.add_argument("--max-pending", type=int, default=64, help="Solicitudes admitidas antes de responder 503")
+    parser.add_argument("--fake-llm", action="store_true", help="Usar el modelo simulado local")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Procesos worker con afinidad de sesión (0 = agente en este proceso)")
+    args = parser.parse_args()
+
+    # Registros JSON escritos por un hilo aparte: el bucle de eventos no hace E/S de logging
+    configure_logging()
+
+    if args.workers > 0:
+        agent = WorkerPool(num_workers=args.workers, factory_kwargs={"fake_llm": args.fake_llm})
+    else:
+        agent = create_agent(fake_llm=args.fake_llm)
+
+    server = AgentServer(
+        agent,
+        max_concurrency=args.max_concurrency,
+        max_pending=args.max_pending
+    )
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        logger.info("Servidor detenido")
+
+
+if __name__ == "__main__":
+    main()
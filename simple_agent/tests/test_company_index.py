@@ -0,0 +1,56 @@
+import pytest
+
+from tools.company_index import CompanyDirectory, NameIndex
+from tools.company_ranking import CompanyRankingTool
+
+
+@pytest.fixture(scope="module")
+def tool():
+    return CompanyRankingTool()
+
+
+@pytest.fixture(scope="module")
+def directory(tool):
+    return CompanyDirectory(tool.dataset.snapshot, tool.COMPANY_ALIASES)
+
+
+@pytest.mark.parametrize("text, name", [
+    ("¿en qué puesto está Alicorp?", "Alicorp"),
+    ("dónde está PETROPERU", "Petroperú"),
+    ("cuántos empleados tiene intercorp", "Grupo Intercorp"),
+    ("datos de spcc", "Southern Peru Copper"),
+    ("puesto de Alicrop", "Alicorp"),
+])
+def test_single_name_alias_and_fuzzy_lookup(directory, text, name):
+    assert [profile.name for profile in directory.lookup_all(text)] == [name]
+    assert directory.lookup(text).name == name
+
+
+def test_lookup_finds_every_company_in_order(directory):
+    profiles = directory.lookup_all("ingresos de credicorp y southern peru")
+    assert [profile.name for profile in profiles] == ["Credicorp", "Southern Peru Copper"]
+    assert directory.lookup_all("ranking de ingresos") == []
+
+
+def test_shared_words_do_not_match_a_company():
+    names = NameIndex(["Grupo Romero", "Grupo Gloria", "Glencore Perú"])
+    assert names.find_all("empresas del grupo en perú") == []
+    assert names.find_all("gloria, romero y glencore") == ["Grupo Gloria", "Grupo Romero", "Glencore Perú"]
+
+
+def test_single_company_query_returns_its_profile(tool):
+    result = tool.run_structured("cuántos empleados tiene intercorp")
+    assert result.kind == "company_profile"
+    assert result.meta["company"] == "Grupo Intercorp"
+    assert [row[0] for row in result.rows] == ["empleados"]
+
+
+def test_multi_company_query_returns_one_profile_each(tool):
+    result = tool.run_structured("ingresos de credicorp y southern peru")
+    assert result.kind == "group"
+    credicorp, southern = result.parts
+    assert credicorp.meta["company"] == "Credicorp"
+    assert credicorp.meta["absent"] == "ingresos"
+    assert southern.meta["company"] == "Southern Peru Copper"
+    assert southern.rows[0][:2] == ("ingresos", 2)
+    assert "SOUTHERN PERU COPPER" in result.render()
@@ -0,0 +1,104 @@
+import datetime
+
+import pytest
+
+from tools.date_expressions import (
+    OP_BETWEEN, OP_COUNT, OP_DATE, OP_SINCE, OP_UNTIL, CalendarTable, DateCalculator, easter_sunday
+)
+from tools.datetime_tool import DateTimeTool
+
+# Martes 20 de julio de 2027
+TODAY = datetime.date(2027, 7, 20)
+
+
+@pytest.fixture(scope="module")
+def holidays():
+    return DateTimeTool().PERU_HOLIDAYS
+
+
+@pytest.fixture
+def calculator(holidays):
+    return DateCalculator(holidays)
+
+
+@pytest.mark.parametrize("text, op, specs", [
+    ("¿Cuántos días faltan para el 28 de julio?", OP_UNTIL, (("date", None, 7, 28),)),
+    ("¿Qué día cae Navidad en 2027?", OP_DATE, (("holiday", "Navidad", 2027),)),
+    ("¿cuantos dias HABILES hay en agosto?", OP_COUNT, (("month", None, 8),)),
+    ("días entre el 1 de enero y el 31 de marzo", OP_BETWEEN, (("date", None, 1, 1), ("date", None, 3, 31))),
+    ("¿Cuántos días han pasado desde el 2027-01-01?", OP_SINCE, (("date", 2027, 1, 1),)),
+    ("¿qué día es el próximo lunes?", OP_DATE, (("weekday", 0, "next"),)),
+    ("¿qué fecha será dentro de tres semanas?", OP_DATE, (("shift", 3, "semanas", False),)),
+    ("¿Cuándo es Fiestas Patrias?", OP_DATE, (("holiday", "Día de la Independencia", None),)),
+])
+def test_parses_spanish_expressions(calculator, text, op, specs):
+    query = calculator.parse(text)
+    assert query.op == op
+    assert query.specs == specs
+
+
+@pytest.mark.parametrize("text", ["hola, ¿cómo estás?", "ranking de ingresos", "¿qué hora es en Madrid?"])
+def test_non_date_questions_are_ignored(calculator, text):
+    assert calculator.parse(text) is None
+
+
+def test_days_until_counts_business_days_after_today(calculator):
+    result = calculator.evaluate("¿Cuántos días faltan para el 28 de julio?", TODAY)
+    assert result["date"] == "2027-07-28"
+    assert result["days"] == 8
+    # 21, 22, 23, 26 y 27; el 28 es feriado
+    assert result["business_days"] == 5
+    assert result["holiday"] == "Día de la Independencia"
+    assert not result["past"]
+
+
+def test_dates_without_year_resolve_to_next_or_last_occurrence(calculator):
+    assert calculator.evaluate("¿cuántos días faltan para el 1 de enero?", TODAY)["date"] == "2028-01-01"
+    since = calculator.evaluate("¿cuántos días han pasado desde el 1 de enero?", TODAY)
+    assert since["date"] == "2027-01-01"
+    assert since["days"] == 200
+    assert since["past"]
+
+
+def test_business_days_in_month_skip_holidays(calculator):
+    result = calculator.evaluate("¿cuántos días hábiles hay en agosto?", TODAY)
+    assert (result["start"], result["end"], result["days"]) == ("2027-08-01", "2027-08-31", 31)
+    assert result["business_days"] == 21
+    assert result["holidays"] == [("2027-08-30", "Día de Santa Rosa de Lima")]
+
+
+def test_business_day_offset_skips_weekends_and_holidays(calculator):
+    result = calculator.evaluate("¿qué fecha es 10 días hábiles después del 23 de julio?", TODAY)
+    assert result["date"] == "2027-08-10"
+    # 29 y 28 son feriados: 27, 26 y el viernes 23
+    before = calculator.evaluate("¿qué fecha es 3 días hábiles antes del 30 de julio?", TODAY)
+    assert before["date"] == "2027-07-23"
+
+
+def test_movable_holidays_follow_easter(calculator):
+    assert easter_sunday(2024) == datetime.date(2024, 3, 31)
+    assert easter_sunday(2027) == datetime.date(2027, 3, 28)
+    result = calculator.evaluate("¿qué día cae Semana Santa en 2027?", TODAY)
+    assert result["date"] == "2027-03-25"
+    assert not result["business_day"]
+    # La clave fija de la tabla de feriados no se usa para los feriados móviles
+    assert calculator.evaluate("¿qué día cae el 6 de abril de 2027?", TODAY)["business_day"]
+
+
+def test_calendar_table_matches_day_by_day_count(holidays):
+    table = CalendarTable(2026, 2028, holidays)
+    start, end = datetime.date(2026, 12, 20), datetime.date(2027, 4, 10)
+    assert [name for _, name in table.holidays_between(start, end)] == [
+        "Navidad", "Año Nuevo", "Día de la Integración Nacional", "Jueves Santo", "Viernes Santo"
+    ]
+    days = [start + datetime.timedelta(days=n) for n in range((end - start).days + 1)]
+    expected = sum(1 for day in days if day.weekday() < 5 and day.toordinal() not in table.holidays)
+    assert table.business_days(start, end) == expected
+    assert table.business_days(end, start) == -expected
+    assert table.add_business_days(start, expected) == datetime.date(2027, 4, 9)
+
+
+def test_invalid_date_gets_a_friendly_message():
+    result = DateTimeTool().run_structured("¿qué día es el 31/02?")
+    assert result.kind == "message"
+    assert "No reconozco esa fecha" in result.meta["text"]
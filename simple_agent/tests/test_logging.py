@@ -0,0 +1,17 @@
+import logging
+
+from agent.conversation import ConversationalAgent
+from agent.fake_llm import FakeChatModel
+from tools import CompanyRankingTool, DateTimeTool
+
+
+def test_turn_logs_do_not_include_user_content(caplog):
+    agent = ConversationalAgent(tools=[CompanyRankingTool(), DateTimeTool()],
+                                model_factory=lambda name: FakeChatModel(model_name=name))
+    secret = "ranking de inversión de zzsecretozz"
+    with caplog.at_level(logging.DEBUG):
+        agent.process_message(secret, session_id="s1")
+        agent.process_message("qué hora es y ranking de empresas de zzsecretozz", session_id="s1")
+
+    assert caplog.records
+    assert not [record for record in caplog.records if "zzsecretozz" in record.getMessage()]
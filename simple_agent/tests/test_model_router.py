@@ -0,0 +1,70 @@
+import pytest
+
+from agent.conversation import ConversationalAgent
+from agent.fake_llm import FakeChatModel
+from agent.model_router import (
+    STAGE_CLOSING, STAGE_COMBINED_RESPONSE, STAGE_RESPONSE, STAGE_TOOL_SELECTION,
+    TIER_FLASH, TIER_PRO, ModelRouter
+)
+from tools import CompanyRankingTool, DateTimeTool
+
+KEYWORD_TOOL = {"selected_tool": "company_ranking", "routing": "keyword"}
+
+
+@pytest.fixture
+def router():
+    return ModelRouter(tier_models={TIER_FLASH: "flash-model", TIER_PRO: "pro-model"}, model_factory=FakeChatModel)
+
+
+@pytest.mark.parametrize("stage, context, tier", [
+    (STAGE_TOOL_SELECTION, {}, TIER_FLASH),
+    (STAGE_CLOSING, {}, TIER_FLASH),
+    (STAGE_RESPONSE, KEYWORD_TOOL, TIER_FLASH),
+    (STAGE_RESPONSE, {"selected_tool": "company_ranking", "routing": "llm"}, TIER_PRO),
+    (STAGE_RESPONSE, {}, TIER_PRO),
+    (STAGE_RESPONSE, {**KEYWORD_TOOL, "user_message_chars": 400}, TIER_PRO),
+    (STAGE_COMBINED_RESPONSE, {"result_count": 2}, TIER_FLASH),
+    (STAGE_COMBINED_RESPONSE, {"result_count": 3}, TIER_PRO),
+])
+def test_stage_tiers(router, stage, context, tier):
+    assert router.select_tier(stage, "prompt corto", context) == tier
+
+
+def test_long_prompt_escalates_to_pro(router):
+    assert router.select_tier(STAGE_RESPONSE, "x" * 4 * 2000, KEYWORD_TOOL) == TIER_PRO
+
+
+def test_stage_override_and_missing_flash_tier():
+    router = ModelRouter({TIER_FLASH: "flash-model", TIER_PRO: "pro-model"}, FakeChatModel,
+                         stage_tiers={STAGE_TOOL_SELECTION: TIER_PRO})
+    assert router.select_tier(STAGE_TOOL_SELECTION, "prompt", {}) == TIER_PRO
+
+    pro_only = ModelRouter({TIER_PRO: "pro-model"}, FakeChatModel)
+    assert pro_only.select_tier(STAGE_TOOL_SELECTION, "prompt", {}) == TIER_PRO
+    assert pro_only.select_tier(STAGE_RESPONSE, "prompt", KEYWORD_TOOL) == TIER_PRO
+
+
+def test_records_cost_per_tier(router):
+    router.record(TIER_PRO, 0.5, 1000, 1000)
+    router.record(TIER_FLASH, 0.1, 1000, 1000)
+    router.record(TIER_FLASH, 0.1, 0, 0, error=True)
+    metrics = router.get_metrics()
+    assert metrics[TIER_PRO]["cost_usd"] == pytest.approx(0.00625)
+    assert metrics[TIER_FLASH]["cost_usd"] == pytest.approx(0.000375)
+    assert metrics[TIER_FLASH]["calls"] == 2
+    assert metrics[TIER_FLASH]["errors"] == 1
+
+
+def test_agent_routes_ambiguous_turn_through_both_tiers():
+    models = {}
+
+    def factory(name):
+        models[name] = FakeChatModel(model_name=name)
+        return models[name]
+
+    agent = ConversationalAgent(tools=[CompanyRankingTool(), DateTimeTool()], model_factory=factory,
+                                model_name="pro-model", fast_model_name="flash-model", fallback_model_name=None)
+    agent.process_message("hola, cuéntame algo")
+    # La selección de herramienta va al modelo rápido; sin herramienta, la respuesta al grande
+    assert models["flash-model"].calls == 1
+    assert models["pro-model"].calls == 1
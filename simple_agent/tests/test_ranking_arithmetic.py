@@ -0,0 +1,84 @@
+import pytest
+
+from tools.company_ranking import CompanyRankingTool
+from tools.ranking_arithmetic import (
+    INTENT_COMPARE, INTENT_DIFFERENCE, INTENT_RATIO, INTENT_SHARE, CompanyFigure, compare_figures, detect_intent, share_pct
+)
+
+
+@pytest.fixture(scope="module")
+def tool():
+    return CompanyRankingTool()
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("¿Cuánto más factura Petroperú que Alicorp?", INTENT_DIFFERENCE),
+    ("¿cuántas veces más empleados tiene Intercorp que Gloria?", INTENT_RATIO),
+    ("¿qué porcentaje del top 5 de ingresos es minería?", INTENT_SHARE),
+    ("compara Petroperú vs Southern", INTENT_COMPARE),
+    ("ranking de ingresos", None),
+])
+def test_detects_arithmetic_intent(text, intent):
+    assert detect_intent(text) == intent
+
+
+def test_figures_are_computed_locally():
+    result = compare_figures(CompanyFigure("A", 1, 4800, "ranking"), CompanyFigure("B", 2, 2450, "ranking"))
+    assert result == {"difference": 2350, "ratio": 1.96, "pct_diff": 95.9}
+    assert "ratio" not in compare_figures(CompanyFigure("A", 1, 10, "ranking"), CompanyFigure("B", 2, 0, "ranking"))
+    assert share_pct(6600, 17550) == 37.6
+    assert share_pct(1, 0) is None
+
+
+def test_difference_between_companies(tool):
+    result = tool.run_structured("¿Cuánto más factura Petroperú que Alicorp?")
+    assert result.kind == "company_comparison"
+    assert result.meta["metric"] == "ingresos"
+    first, second = result.rows
+    assert result.meta["difference"] == first[2] - second[2]
+    assert first[1] == 1
+
+
+def test_ratio_between_companies(tool):
+    result = tool.run_structured("¿cuántas veces más empleados tiene Intercorp que Gloria?")
+    assert result.kind == "company_comparison"
+    assert result.meta["intent"] == INTENT_RATIO
+    first, second = result.rows
+    assert result.meta["ratio"] == round(first[2] / second[2], 2)
+
+
+def test_comparison_with_company_missing_from_metric(tool):
+    result = tool.run_structured("compara los ingresos de Credicorp y Petroperú")
+    assert result.kind == "message"
+    assert result.meta["text"] == "No tengo datos de Credicorp en el ranking por ingresos."
+
+
+def test_sector_share_of_top(tool):
+    result = tool.run_structured("¿qué porcentaje del top 5 de ingresos es minería?")
+    assert result.kind == "metric_share"
+    top = tool.dataset.snapshot.top("ingresos", 5)
+    mining = sum(value for _, _, value, sector in top if "Minería" in sector)
+    assert result.meta["scope_value"] == sum(row[2] for row in top)
+    assert result.meta["part_value"] == mining
+    assert result.meta["share_pct"] == share_pct(mining, result.meta["scope_value"])
+
+
+def test_company_share_of_top(tool):
+    result = tool.run_structured("¿qué porcentaje del top 5 de ingresos representa Petroperú?")
+    assert result.kind == "metric_share"
+    assert [row[1] for row in result.rows] == ["Petroperú"]
+    assert result.meta["share_pct"] > 0
+
+
+def test_share_of_company_missing_from_metric(tool):
+    result = tool.run_structured("¿qué porcentaje de los ingresos representa Credicorp?")
+    assert result.kind == "message"
+    assert result.meta["text"] == "No tengo datos de Credicorp en el ranking por ingresos."
+
+
+def test_share_of_company_outside_the_top(tool):
+    rank = next(rank for rank, name, _, _ in tool.dataset.snapshot.top("ingresos") if name == "Grupo Romero")
+    assert rank > 2
+    result = tool.run_structured("¿qué porcentaje del top 2 de ingresos representa Grupo Romero?")
+    assert result.kind == "message"
+    assert result.meta["text"] == f"Grupo Romero (puesto {rank}) no está en el top 2 por ingresos."
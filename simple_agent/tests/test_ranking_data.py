@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from tools.company_ranking import CompanyRankingTool
+from tools.ranking_data import RankingDataset
+
+BASE = {
+    "ingresos": [{"name": "A", "value": 30, "sector": "Banca"}, {"name": "B", "value": 20, "sector": "Retail"}],
+    "empleados": [{"name": "A", "value": 100, "sector": "Banca"}],
+}
+
+
+def append(path, *lines):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(lines))
+
+
+def change(**fields):
+    return json.dumps({"metric": "ingresos", **fields}) + "\n"
+
+
+@pytest.fixture
+def changes_path(tmp_path):
+    path = tmp_path / "changes.jsonl"
+    path.write_text("", encoding="utf-8")
+    return str(path)
+
+
+def test_readers_keep_their_snapshot_across_reloads():
+    dataset = RankingDataset(BASE)
+    before = dataset.snapshot
+    after = dataset.apply([{"op": "upsert", "metric": "ingresos", "name": "C", "value": 50}])
+
+    assert after.version == before.version + 1
+    assert [row[1] for row in before.top("ingresos")] == ["A", "B"]
+    assert [row[1] for row in after.top("ingresos")] == ["C", "A", "B"]
+    assert dataset.snapshot is after
+    # Las métricas no afectadas se comparten entre versiones
+    assert after.rankings["empleados"] is before.rankings["empleados"]
+
+
+def test_refresh_applies_only_new_lines(changes_path):
+    dataset = RankingDataset(BASE, changes_path=changes_path)
+    version = dataset.version
+    assert not dataset.refresh()
+
+    append(changes_path, change(name="C", value=50))
+    assert dataset.refresh()
+    append(changes_path, change(op="delete", name="A"), change(name="B", value=5))
+    assert dataset.refresh()
+
+    assert dataset.version == version + 2
+    assert [row[1:3] for row in dataset.snapshot.top("ingresos")] == [("C", 50), ("B", 5)]
+    # B conserva su sector al actualizar solo el valor
+    assert dataset.snapshot.top("ingresos")[1][3] == "Retail"
+    assert dataset.get_metrics()["changes_applied"] == 3
+
+
+def test_partial_line_waits_for_next_refresh(changes_path):
+    dataset = RankingDataset(BASE, changes_path=changes_path)
+    line = change(name="C", value=50)
+    append(changes_path, line[:10])
+    assert not dataset.refresh()
+
+    append(changes_path, line[10:])
+    assert dataset.refresh()
+    assert dataset.snapshot.top("ingresos", 1)[0][1] == "C"
+
+
+def test_invalid_changes_are_skipped(changes_path):
+    dataset = RankingDataset(BASE, changes_path=changes_path)
+    append(changes_path, "no es json\n", change(name="X"), change(op="rename", name="A", value=1),
+           json.dumps({"metric": "desconocida", "name": "Y", "value": 1}) + "\n", change(name="C", value=50))
+    assert dataset.refresh()
+    assert [row[1] for row in dataset.snapshot.top("ingresos")] == ["C", "A", "B"]
+
+
+def test_truncated_log_rebuilds_from_base(changes_path):
+    dataset = RankingDataset(BASE, changes_path=changes_path)
+    append(changes_path, change(name="C", value=50), change(name="D", value=40))
+    dataset.refresh()
+    reloads = dataset.get_metrics()["reloads"]
+
+    with open(changes_path, "w", encoding="utf-8") as f:
+        f.write(change(name="E", value=1))
+    assert dataset.refresh()
+    assert [row[1] for row in dataset.snapshot.top("ingresos")] == ["A", "B", "E"]
+    assert dataset.get_metrics()["reloads"] == reloads + 1
+
+
+def test_base_file_change_triggers_full_reload(tmp_path):
+    data_path = tmp_path / "rankings.json"
+    data_path.write_text(json.dumps(BASE), encoding="utf-8")
+    dataset = RankingDataset(data_path=str(data_path))
+    assert dataset.snapshot.top("ingresos", 1)[0][1] == "A"
+
+    data_path.write_text(json.dumps({"ingresos": [{"name": "Z", "value": 99}]}), encoding="utf-8")
+    assert dataset.refresh()
+    assert [row[1] for row in dataset.snapshot.top("ingresos")] == ["Z"]
+
+
+def test_invalid_base_file_keeps_current_data(tmp_path):
+    data_path = tmp_path / "rankings.json"
+    data_path.write_text(json.dumps(BASE), encoding="utf-8")
+    dataset = RankingDataset(data_path=str(data_path))
+    snapshot = dataset.snapshot
+
+    data_path.write_text("{roto", encoding="utf-8")
+    assert not dataset.refresh()
+    assert dataset.snapshot is snapshot
+
+
+def test_new_version_notifies_subscribers_and_invalidates_tool_cache():
+    dataset = RankingDataset(BASE)
+    tool = CompanyRankingTool(dataset=dataset)
+    published = []
+    dataset.subscribe(published.append)
+
+    first = tool.run_structured("ranking de ingresos")
+    assert tool.run_structured("ranking de ingresos") is first
+
+    dataset.apply([{"op": "upsert", "metric": "ingresos", "name": "Nueva", "value": 99}])
+    assert [snapshot.version for snapshot in published] == [dataset.version]
+    second = tool.run_structured("ranking de ingresos")
+    assert second is not first
+    assert "Nueva" in second.rows[0]
@@ -0,0 +1,25 @@
+import pytest
+
+from tools.ranking_history import DeltaSeries, RankingHistory
+
+YEARS = (2021, 2022, 2023)
+
+
+def test_delta_series_round_trips_integers():
+    assert DeltaSeries(0, [820, 610, 900]).decode().tolist() == [820, 610, 900]
+
+
+@pytest.mark.parametrize("values", [[1.5, 2, 3], [1, float("nan"), 3]])
+def test_delta_series_rejects_non_integer_values(values):
+    with pytest.raises(ValueError):
+        DeltaSeries(0, values)
+
+
+def test_history_skips_non_integer_series_and_keeps_no_dense_matrix():
+    history = RankingHistory(YEARS, {"ingresos": {"A": (10, 20, 30), "B": (10.4, 12, 15), "C": (None, 5, 40)}})
+
+    assert history.companies("ingresos") == ("A", "C")
+    assert history.rank_at("ingresos", 2023) == [(1, "C", 40), (2, "A", 30)]
+    assert history.series("ingresos", "C") == [(2022, 5, 2), (2023, 40, 1)]
+    # Las consultas no dejan matrices decodificadas en el objeto
+    assert set(vars(history)) == {"years", "_series"}
@@ -0,0 +1,118 @@
+import itertools
+import time
+
+import pytest
+
+from agent.resilience import Deadline, DeadlineExceededError, ResiliencePolicy
+from agent.scheduler import SchedulerOverloadedError
+
+
+def policy(**kwargs):
+    options = {"turn_timeout": 5.0, "attempt_timeout": 1.0, "base_delay": 0.01, "max_delay": 0.02}
+    return ResiliencePolicy(**{**options, **kwargs})
+
+
+def flaky(errors, result="ok"):
+    """
+    Función que lanza los errores indicados en orden y luego devuelve `result`.
+    """
+    calls = itertools.count()
+
+    def fn(max_wait):
+        index = next(calls)
+        if index < len(errors):
+            raise errors[index]
+        return result
+    return fn
+
+
+def test_transient_errors_are_retried():
+    resilience = policy()
+    assert resilience.call(flaky([RuntimeError("503 unavailable"), ConnectionError()])) == "ok"
+    metrics = resilience.get_metrics()
+    assert metrics["retries"] == 2
+    assert metrics["failures"] == 0
+
+
+@pytest.mark.parametrize("error", [ValueError("prompt inválido"), SchedulerOverloadedError("cola llena")])
+def test_permanent_errors_are_not_retried(error):
+    resilience = policy()
+    with pytest.raises(type(error)):
+        resilience.call(flaky([error]))
+    assert resilience.get_metrics()["retries"] == 0
+    assert resilience.get_metrics()["failures"] == 1
+
+
+def test_slow_attempt_times_out():
+    resilience = policy(attempt_timeout=0.05, max_attempts=1)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        resilience.call(lambda max_wait: time.sleep(0.5))
+    assert time.monotonic() - started < 0.4
+    assert resilience.get_metrics()["timeouts"] == 1
+
+
+def test_expired_deadline_never_calls_the_model():
+    resilience = policy()
+    calls = []
+    with pytest.raises(DeadlineExceededError):
+        resilience.call(lambda max_wait: calls.append(max_wait), Deadline.after(0))
+    assert not calls
+
+
+def test_near_deadline_uses_fallback():
+    # Sin muestras, la p95 estimada es attempt_timeout / 3; 0.2 s < 1/3 x 1.5
+    resilience = policy()
+    result = resilience.call(lambda max_wait: "principal", Deadline.after(0.2), lambda max_wait: "respaldo")
+    assert result == "respaldo"
+    assert resilience.get_metrics()["fallbacks"] == 1
+
+
+def test_hedge_request_wins_over_slow_primary():
+    resilience = policy(hedge=True, default_hedge_delay=0.05)
+    calls = itertools.count()
+
+    def fn(max_wait):
+        if next(calls) == 0:
+            time.sleep(0.5)
+            return "lenta"
+        return "cobertura"
+
+    assert resilience.call(fn) == "cobertura"
+    metrics = resilience.get_metrics()
+    assert metrics["hedges"] == 1
+    assert metrics["hedge_wins"] == 1
+
+
+def test_stream_retries_until_first_chunk():
+    resilience = policy()
+    attempts = itertools.count()
+
+    def fn(max_wait):
+        attempt = next(attempts)
+
+        def chunks():
+            if attempt == 0:
+                raise RuntimeError("503 unavailable")
+            yield from ("a", "b", "c")
+        return chunks()
+
+    assert list(resilience.stream(fn)) == ["a", "b", "c"]
+    assert resilience.get_metrics()["retries"] == 1
+
+
+def test_stream_stops_when_deadline_expires_mid_response():
+    resilience = policy()
+
+    def fn(max_wait):
+        def chunks():
+            yield "a"
+            time.sleep(0.2)
+            yield "b"
+        return chunks()
+
+    received = []
+    with pytest.raises(DeadlineExceededError):
+        for chunk in resilience.stream(fn, Deadline.after(0.1)):
+            received.append(chunk)
+    assert received == ["a"]
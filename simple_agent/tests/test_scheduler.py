@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from agent.scheduler import LLMScheduler, Priority, SchedulerOverloadedError
+
+
+class BlockingModel:
+    """
+    Modelo que registra el orden de las llamadas y espera a que se le libere.
+    """
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.order = []
+
+    def invoke(self, prompt):
+        self.order.append(prompt)
+        self.release.wait(5)
+        return prompt
+
+
+def wait_for_queue(scheduler, depth):
+    deadline = time.monotonic() + 5
+    while scheduler.get_metrics()["queue_depth"] < depth:
+        assert time.monotonic() < deadline, "la cola no alcanzó la profundidad esperada"
+        time.sleep(0.005)
+
+
+def start(scheduler, model, prompt, priority):
+    thread = threading.Thread(target=scheduler.invoke, args=(model, prompt), kwargs={"priority": priority})
+    thread.start()
+    return thread
+
+
+@pytest.fixture
+def scheduler():
+    return LLMScheduler(max_concurrency=1, max_queue_depth=4, batch_shed_ratio=0.5, max_queue_wait=5)
+
+
+def test_interactive_requests_overtake_queued_batch(scheduler):
+    model = BlockingModel()
+    threads = [start(scheduler, model, "ocupa", Priority.BATCH)]
+    while not model.order:
+        time.sleep(0.005)
+    threads.append(start(scheduler, model, "lote", Priority.BATCH))
+    wait_for_queue(scheduler, 1)
+    threads.append(start(scheduler, model, "interactiva", Priority.INTERACTIVE))
+    wait_for_queue(scheduler, 2)
+
+    model.release.set()
+    for thread in threads:
+        thread.join()
+    assert model.order == ["ocupa", "interactiva", "lote"]
+
+
+def test_batch_is_shed_before_interactive(scheduler):
+    model = BlockingModel()
+    threads = [start(scheduler, model, "ocupa", Priority.INTERACTIVE)]
+    while not model.order:
+        time.sleep(0.005)
+    threads += [start(scheduler, model, f"espera-{i}", Priority.INTERACTIVE) for i in range(2)]
+    wait_for_queue(scheduler, 2)
+
+    # Con 2 en espera la cola de lotes (4 x 0.5) ya está llena; la interactiva aún cabe
+    with pytest.raises(SchedulerOverloadedError):
+        scheduler.invoke(model, "lote", priority=Priority.BATCH)
+    threads.append(start(scheduler, model, "espera-2", Priority.INTERACTIVE))
+    wait_for_queue(scheduler, 3)
+    threads.append(start(scheduler, model, "espera-3", Priority.INTERACTIVE))
+    wait_for_queue(scheduler, 4)
+    with pytest.raises(SchedulerOverloadedError):
+        scheduler.invoke(model, "sobra", priority=Priority.INTERACTIVE)
+
+    model.release.set()
+    for thread in threads:
+        thread.join()
+    metrics = scheduler.get_metrics()
+    assert metrics["shed"] == {"INTERACTIVE": 1, "BATCH": 1}
+    assert metrics["completed"] == 5
+    assert "lote" not in model.order
+
+
+def test_request_is_shed_after_max_wait(scheduler):
+    model = BlockingModel()
+    thread = start(scheduler, model, "ocupa", Priority.INTERACTIVE)
+    while not model.order:
+        time.sleep(0.005)
+
+    started = time.monotonic()
+    with pytest.raises(SchedulerOverloadedError):
+        scheduler.invoke(model, "tarde", max_wait=0.1)
+    assert time.monotonic() - started < 1.0
+
+    model.release.set()
+    thread.join()
+    assert scheduler.get_metrics()["queue_depth"] == 0
+
+
+def test_stream_holds_the_slot_until_consumed(scheduler):
+    class StreamModel:
+        def stream(self, prompt):
+            yield from ("a", "b")
+
+    chunks = scheduler.stream(StreamModel(), "hola")
+    assert next(chunks) == "a"
+    assert scheduler.get_metrics()["in_flight"] == 1
+    chunks.close()
+    assert scheduler.get_metrics()["in_flight"] == 0
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from tools.company_ranking import CompanyRankingTool
+from tools.ranking_data import RankingDataset
+from tools.sector_index import OP_AND, OP_OR, SectorBitmapIndex, SectorTaxonomy, SectorTerm
+
+
+def test_taxonomy_is_not_mutated_by_unknown_sectors():
+    dataset = RankingDataset({"ingresos": [{"name": "A", "value": 10, "sector": "Pesca/Banca"}]})
+    taxonomy = SectorTaxonomy()
+
+    assert taxonomy.classify("Pesca/Banca") == ("Pesca", "Banca", "Servicios financieros")
+    assert taxonomy.find("empresas de pesca") == []
+
+    extended = taxonomy.for_snapshot(dataset.snapshot)
+    assert extended is not taxonomy
+    assert extended.find("empresas de pesca") == ["Pesca"]
+    assert "Pesca" not in taxonomy.parents
+    assert taxonomy.for_snapshot(RankingDataset({"ingresos": [{"name": "B", "value": 1, "sector": "Banca"}]}).snapshot) is taxonomy
+
+
+def test_new_sector_is_queryable_after_reload():
+    tool = CompanyRankingTool()
+    tool.dataset.apply([{"op": "upsert", "metric": "ingresos", "name": "Pesquera Uno", "value": 99999, "sector": "Pesca"}])
+    result = tool.run_structured("top 3 de ingresos en pesca")
+    assert any("Pesquera Uno" in row for row in result.rows)
+
+
+def test_taxonomy_shared_between_reload_and_query_threads():
+    taxonomy = SectorTaxonomy()
+    dataset = RankingDataset({"ingresos": [{"name": "A", "value": 10, "sector": "Banca"}]})
+    errors = []
+    stop = threading.Event()
+
+    def query() -> None:
+        try:
+            while not stop.is_set():
+                assert taxonomy.parse_filter("ingresos en minería o banca sin retail")
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=query) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(200):
+        snapshot = dataset.apply([{"metric": "ingresos", "name": f"E{i}", "value": i, "sector": f"Sector {i}"}])
+        SectorBitmapIndex(snapshot, taxonomy.for_snapshot(snapshot))
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert not errors
+    assert len(taxonomy.parents) == len(SectorTaxonomy().parents)
+
+
+@pytest.mark.parametrize("text, terms", [
+    ("ingresos en minería o banca sin retail",
+     [SectorTerm(OP_AND, False, "Minería"), SectorTerm(OP_OR, False, "Banca"), SectorTerm(OP_AND, True, "Retail")]),
+    ("top 5 de ingresos excepto las empresas de banca", [SectorTerm(OP_AND, True, "Banca")]),
+    ("ingresos de empresas que no son mineras", [SectorTerm(OP_AND, True, "Minería")]),
+    ("top de ingresos sin minería ni banca", [SectorTerm(OP_AND, True, "Minería"), SectorTerm(OP_AND, True, "Banca")]),
+    # La negación lejos del sector no lo excluye; "menos" es comparativo
+    ("ranking de empleados de las empresas con menos empleados en banca", [SectorTerm(OP_AND, False, "Banca")]),
+    ("no sé, dame el top de ingresos de empresas mineras", [SectorTerm(OP_AND, False, "Minería")]),
+])
+def test_negation_applies_only_directly_before_a_sector(text, terms):
+    assert SectorTaxonomy().parse_filter(text) == terms
+
+
+def test_distant_negation_keeps_sector_filter():
+    tool = CompanyRankingTool()
+    result = tool.run_structured("ranking de empleados de las empresas con menos empleados en banca")
+    assert result.meta["filter"] == "Banca"
+    assert result.rows and all("Banca" in row[3] for row in result.rows)
+
+    result = tool.run_structured("no sé, dame el top de ingresos de empresas mineras")
+    assert result.meta["filter"] == "Minería"
+    assert result.rows and all("Minería" in row[3] for row in result.rows)
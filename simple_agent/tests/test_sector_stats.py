@@ -0,0 +1,43 @@
+import pytest
+
+from tools.company_ranking import CompanyRankingTool
+from tools.ranking_data import RankingDataset
+from tools.sector_index import SectorBitmapIndex, SectorTaxonomy, SectorTerm, OP_AND
+from tools.sector_stats import CompanyTable, SectorAggregator
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    return CompanyRankingTool().dataset.snapshot
+
+
+def test_sector_totals_match_bitmap_filter(snapshot):
+    taxonomy = SectorTaxonomy()
+    aggregator = SectorAggregator(CompanyTable(snapshot, taxonomy))
+    index = SectorBitmapIndex(snapshot, taxonomy)
+    for metric, entries in snapshot.rankings.items():
+        stats = aggregator.stats(metric)
+        for i, sector in enumerate(aggregator.table.sector_names):
+            mask = index.evaluate(metric, [SectorTerm(OP_AND, False, sector)])
+            matched = index.top(metric, mask, len(entries))
+            assert int(stats["companies"][i]) == len(matched), (metric, sector)
+            assert stats["sum"][i] == pytest.approx(sum(entry.value for _, entry in matched)), (metric, sector)
+
+
+def test_sector_label_of_one_metric_does_not_leak_into_another():
+    dataset = RankingDataset({
+        "ingresos": [{"name": "A", "value": 10, "sector": "Banca"}, {"name": "B", "value": 5, "sector": "Minería"}],
+        "empleados": [{"name": "A", "value": 100, "sector": "Retail"}, {"name": "B", "value": 50, "sector": "Banca"}],
+    })
+    aggregator = SectorAggregator(CompanyTable(dataset.snapshot))
+    columns, rows = aggregator.rows("empleados", ["Banca"])
+    assert rows[0][columns.index("companies")] == 1
+    assert rows[0][columns.index("sum")] == 50
+
+
+def test_sector_stats_answer_agrees_with_filtered_ranking():
+    tool = CompanyRankingTool()
+    stats = tool.run_structured("empleados totales del sector banca")
+    ranking = tool.run_structured("top 10 empresas de banca por empleados")
+    total = stats.rows[0][stats.columns.index("sum")]
+    assert total == sum(row[ranking.columns.index("value")] for row in ranking.rows)
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+from agent.conversation import ConversationalAgent
+from agent.fake_llm import FakeChatModel
+from agent.profiling import RequestProfiler
+from server import AgentServer, HttpError
+from tools import CompanyRankingTool, DateTimeTool
+from utils.logging_setup import ContextFilter
+
+
+@pytest.fixture
+def agent():
+    def factory(name):
+        return FakeChatModel(model_name=name, chunk_words=1, chunk_delay=0.15)
+    return ConversationalAgent(tools=[CompanyRankingTool(), DateTimeTool()], model_factory=factory)
+
+
+def test_stream_delivers_model_chunks_before_turn_ends(agent):
+    start = time.monotonic()
+    arrivals, chunks = [], []
+    for chunk in agent.stream_message("hola, cuéntame algo", session_id="s1"):
+        arrivals.append(time.monotonic() - start)
+        chunks.append(chunk)
+
+    response = "".join(chunks)
+    assert response.endswith("Respuesta simulada.")
+    assert len(chunks) >= 3
+    # El primer fragmento llega mientras el modelo sigue generando el resto
+    assert arrivals[-1] - arrivals[0] >= 0.25
+    assert agent.export_session("s1")[-1] == {"role": "assistant", "content": response}
+
+
+def test_stream_template_answer_is_sent_whole(agent):
+    chunks = list(agent.stream_message("feriados de este año", session_id="s2"))
+    assert len(chunks) == 1
+    assert chunks[0] == agent.export_session("s2")[-1]["content"]
+
+
+@pytest.mark.parametrize("body", [b"[]", b'"x"', b"{}", b'{"message": 3}', b"no es json"])
+def test_dispatch_rejects_invalid_payloads(agent, body):
+    server = AgentServer(agent)
+    status, payload = asyncio.run(server._dispatch("POST", "/chat", body))
+    assert status == 400
+    assert "error" in payload
+
+
+@pytest.mark.parametrize("length", ["abc", "-1"])
+def test_read_request_rejects_invalid_content_length(agent, length):
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(f"POST /chat HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode("latin-1"))
+        reader.feed_eof()
+        return await AgentServer(agent)._read_request(reader)
+
+    with pytest.raises(HttpError) as error:
+        asyncio.run(read())
+    assert error.value.status == 400
+
+
+def test_pipelined_multi_request_stream_is_logged_and_profiled(caplog, tmp_path):
+    profiler = RequestProfiler(output_dir=str(tmp_path))
+    agent = ConversationalAgent(tools=[CompanyRankingTool(), DateTimeTool()],
+                                model_factory=lambda name: FakeChatModel(model_name=name), profiler=profiler)
+    caplog.handler.addFilter(ContextFilter())
+    with caplog.at_level(logging.INFO, logger="agent"):
+        chunks = list(agent.stream_message("dame información de el ranking de ingresos y la fecha de hoy",
+                                           session_id="s3", profile=True))
+
+    # Introducción, una sección por solicitud y el cierre, cada una por separado
+    assert len(chunks) == 4
+    assert agent.export_session("s3")[-1]["content"] == "".join(chunks)
+    records = [record for record in caplog.records if record.name.startswith("agent.conversation")]
+    assert records
+    assert {record.session_id for record in records} == {"s3"}
+    assert all(record.turn_id for record in records)
+    assert profiler.get_metrics()["profiled_turns"] == 1
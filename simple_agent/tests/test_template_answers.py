@@ -0,0 +1,57 @@
+import pytest
+
+from agent.conversation import ConversationalAgent
+from agent.fake_llm import FakeChatModel
+from tools import CompanyRankingTool, DateTimeTool
+
+
+@pytest.fixture
+def models():
+    return {}
+
+
+@pytest.fixture
+def agent(models):
+    def factory(name):
+        models[name] = FakeChatModel(model_name=name)
+        return models[name]
+    return ConversationalAgent(tools=[CompanyRankingTool(), DateTimeTool()], model_factory=factory)
+
+
+def llm_calls(models):
+    return sum(model.calls for model in models.values())
+
+
+@pytest.mark.parametrize("query", [
+    "qué hora es",
+    "¿cuántos días faltan para navidad?",
+    "feriados de este año",
+    "qué hora es en Tokio",
+    "mejor hora para una reunión entre Lima y Madrid",
+])
+def test_recognized_datetime_lookups_are_final(query):
+    assert DateTimeTool().is_final_answer(query)
+
+
+@pytest.mark.parametrize("query", ["qué tiempo hace hoy en Lima", "13/45", "hoy"])
+def test_datetime_fallback_is_not_final(query):
+    tool = DateTimeTool()
+    assert tool.run_structured(query).kind == "datetime"
+    assert not tool.is_final_answer(query)
+
+
+def test_ranking_lookup_is_final_but_analysis_is_not():
+    tool = CompanyRankingTool()
+    assert tool.is_final_answer("ranking por inversión")
+    assert not tool.is_final_answer("explica por qué lideran el ranking por inversión")
+
+
+def test_template_answer_skips_the_llm(agent, models):
+    response = agent.process_message("feriados de este año", "s1")
+    assert "Navidad" in response
+    assert llm_calls(models) == 0
+
+
+def test_unrecognized_query_goes_through_the_llm(agent, models):
+    agent.process_message("qué tiempo hace hoy en Lima", "s1")
+    assert llm_calls(models) >= 1
@@ -0,0 +1,108 @@
+import pytest
+
+from agent.tokens import (
+    SHRINK_KEEP_HEAD, SHRINK_KEEP_TAIL, SHRINK_NONE, PromptBudget, PromptSection, TokenCounter
+)
+
+
+def lines(prefix, count):
+    return "\n".join(f"{prefix} línea {i} con algunas palabras" for i in range(count))
+
+
+def sections():
+    return [
+        PromptSection("system", "Eres un asistente.", priority=100),
+        PromptSection("history", lines("historial", 40), priority=10, shrink=SHRINK_KEEP_TAIL, header="Historial:\n"),
+        PromptSection("tool_results", lines("resultado", 40), priority=50, shrink=SHRINK_KEEP_HEAD,
+                      header="Resultados:\n", min_tokens=64),
+        PromptSection("user_message", lines("pregunta", 5), priority=90),
+    ]
+
+
+@pytest.fixture
+def counter():
+    return TokenCounter()
+
+
+def test_counts_words_and_punctuation(counter):
+    assert counter.count("") == 0
+    assert counter.count("hola, sol") == 3
+    # Palabras largas: ceil(len / 4) tokens
+    assert counter.count("internacionalización") == 5
+    assert TokenCounter(tokenizer=lambda text: 42).count("x") == 42
+
+
+def test_truncate_keeps_head_or_tail(counter):
+    text = lines("fila", 20)
+    head = counter.truncate(text, 30, keep=SHRINK_KEEP_HEAD)
+    assert counter.count(head) <= 30
+    assert head.startswith("fila línea 0 ")
+    assert head.endswith("líneas omitidas por límite de tokens]")
+    tail = counter.truncate(text, 30, keep=SHRINK_KEEP_TAIL)
+    assert tail.startswith("[... ")
+    assert tail.endswith("fila línea 19 con algunas palabras")
+    assert counter.truncate(text, 10_000) == text
+
+
+def test_truncate_single_long_line_by_characters(counter):
+    text = "palabra " * 200
+    head = counter.truncate(text, 30, keep=SHRINK_KEEP_HEAD)
+    kept = head.split("\n")[0]
+    assert kept and text.startswith(kept)
+    tail = counter.truncate(text, 30, keep=SHRINK_KEEP_TAIL)
+    assert text.endswith(tail.split("\n")[-1])
+    assert counter.count(head) <= 30
+    assert counter.count(tail) <= 30
+
+
+def test_prompt_within_budget_is_untouched():
+    prompt, usage = PromptBudget(max_prompt_tokens=10_000).fit(sections())
+    assert usage["truncated"] == []
+    assert not usage["over_budget"]
+    assert usage["prompt_tokens"] == usage["original_tokens"]
+    assert prompt.startswith("Eres un asistente.\n\nHistorial:\n")
+
+
+def test_lowest_priority_section_is_cut_first():
+    budget = PromptBudget()
+    original = budget.fit(sections())[1]
+    # Sobra un poco: basta con recortar el historial
+    budget.max_prompt_tokens = original["original_tokens"] - 20
+    prompt, usage = budget.fit(sections())
+    assert usage["truncated"] == ["history"]
+    assert usage["sections"]["tool_results"] == original["sections"]["tool_results"]
+    assert usage["prompt_tokens"] <= budget.max_prompt_tokens
+    assert "historial línea 39" in prompt
+    assert "historial línea 0 " not in prompt
+
+
+def test_shrinks_in_priority_order_and_fits_budget():
+    budget = PromptBudget()
+    original = budget.fit(sections())[1]
+    fixed = original["sections"]["system"] + original["sections"]["user_message"]
+    budget.max_prompt_tokens = fixed + 150
+    prompt, usage = budget.fit(sections())
+
+    assert usage["truncated"] == ["history", "tool_results"]
+    assert usage["prompt_tokens"] <= budget.max_prompt_tokens
+    assert not usage["over_budget"]
+    # Las secciones SHRINK_NONE quedan intactas
+    assert usage["sections"]["system"] == original["sections"]["system"]
+    assert usage["sections"]["user_message"] == original["sections"]["user_message"]
+    assert lines("pregunta", 5) in prompt
+    assert "resultado línea 0 " in prompt
+
+
+def test_unfittable_prompt_is_flagged_over_budget():
+    parts = sections()
+    budget = PromptBudget(max_prompt_tokens=50)
+    prompt, usage = budget.fit(parts)
+    assert usage["over_budget"]
+    assert usage["prompt_tokens"] > 50
+    assert usage["truncated"] == ["history", "tool_results"]
+    # Ninguna sección recortable baja de su min_tokens; las SHRINK_NONE quedan intactas
+    results = next(section for section in parts if section.name == "tool_results")
+    assert results.text == budget.counter.truncate(lines("resultado", 40), 64, keep=SHRINK_KEEP_HEAD)
+    assert [section.text for section in parts if section.shrink == SHRINK_NONE] == [
+        "Eres un asistente.", lines("pregunta", 5)
+    ]
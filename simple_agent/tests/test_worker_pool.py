@@ -0,0 +1,45 @@
+import threading
+import time
+
+from agent.worker_pool import ConsistentHashRing, WorkerPool
+
+
+def build_slow_agent():
+    # Fábrica de módulo: los workers se crean con "spawn" y deben poder importarla
+    from agent.conversation import ConversationalAgent
+    from agent.fake_llm import FakeChatModel
+    from tools import CompanyRankingTool, DateTimeTool
+
+    return ConversationalAgent(
+        tools=[CompanyRankingTool(), DateTimeTool()],
+        model_factory=lambda name: FakeChatModel(model_name=name, latency_median=0.5)
+    )
+
+
+def session_moved_to(worker_id, existing):
+    ring = ConsistentHashRing()
+    for owner in existing:
+        ring.add(owner)
+    before = {f"s{i}": ring.get(f"s{i}") for i in range(100)}
+    ring.add(worker_id)
+    return next(session for session, owner in before.items() if ring.get(session) == worker_id)
+
+
+def test_rebalance_waits_for_in_flight_turns():
+    session_id = session_moved_to(1, existing=[0])
+    with WorkerPool(num_workers=1, agent_factory=build_slow_agent, request_timeout=60) as pool:
+        turn = threading.Thread(target=pool.process_message, args=("hola, cuéntame algo", session_id))
+        turn.start()
+        time.sleep(0.3)
+
+        new_worker = pool.add_worker()
+        # La sesión solo se exporta cuando su turno ya terminó en el worker anterior
+        assert not turn.is_alive()
+        assert pool._sessions[session_id] == new_worker
+        history = pool._call(pool._workers[new_worker], "export", session_id)
+        assert [record["role"] for record in history] == ["user", "assistant"]
+
+        # Los turnos siguientes continúan la conversación en el nuevo worker
+        pool.process_message("¿y algo más?", session_id)
+        history = pool._call(pool._workers[new_worker], "export", session_id)
+        assert len(history) == 4
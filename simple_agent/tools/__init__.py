@@ -1,6 +1,17 @@
 # Este archivo permite importar módulos desde este directorio
-from .company_ranking import CompanyRankingTool
-from .datetime_tool import DateTimeTool
+from importlib import import_module
+
+# Las herramientas dependen de LangChain; se importan bajo demanda para que
+# `tools.results` pueda usarse sin cargar esas dependencias
+_LAZY_EXPORTS = {
+    'CompanyRankingTool': '.company_ranking',
+    'DateTimeTool': '.datetime_tool',
+}
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        return getattr(import_module(_LAZY_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Exportar clases para facilitar la importación
-__all__ = ['CompanyRankingTool', 'DateTimeTool']
\ No newline at end of file
+__all__ = ['CompanyRankingTool', 'DateTimeTool']
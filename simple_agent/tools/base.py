@@ -1,11 +1,20 @@
 from langchain.tools import BaseTool
 import logging
-from typing import Optional, Type, Dict, Any
+from typing import Optional, Type, Dict, Any, ClassVar
 from pydantic import BaseModel, Field
 
+from .results import ToolResult
+
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Expresiones que indican que el usuario pide algo más que el dato en sí
+ANALYSIS_MARKERS = [
+    "por qué", "porque", "explica", "explícame", "compara", "comparación", "analiza",
+    "recomienda", "opinas", "crees", "diferencia entre", "mejor opción", "conviene",
+    "resume", "además", "y también"
+]
+
 class SimpleTool(BaseTool):
     """
     Clase base simple para herramientas.
@@ -14,17 +23,21 @@ class SimpleTool(BaseTool):
     description: str = Field(default="Descripción base de la herramienta", description="Descripción de la herramienta")
     args_schema: Optional[Type[BaseModel]] = None
     
+    # Las herramientas baratas y sin efectos secundarios pueden ejecutarse
+    # especulativamente mientras el LLM decide cuál usar
+    speculative: ClassVar[bool] = False
+    
     def _run(self, input_value: str) -> str:
         """
         Método que implementa BaseTool.
         """
         try:
-            logger.info(f"Ejecutando herramienta {self.name}")
+            logger.info("Ejecutando herramienta %s", self.name)
             result = self.run(input_value)
-            logger.info(f"Herramienta {self.name} ejecutada con éxito")
+            logger.info("Herramienta %s ejecutada con éxito", self.name)
             return result
         except Exception as e:
-            logger.error(f"Error ejecutando herramienta {self.name}: {str(e)}")
+            logger.error("Error ejecutando herramienta %s: %s", self.name, e)
             return f"Error ejecutando {self.name}: {str(e)}"
             
     async def _arun(self, input_value: str) -> str:
@@ -35,6 +48,31 @@ class SimpleTool(BaseTool):
         
     def run(self, input_str: str) -> str:
         """
-        Método que deben implementar las clases derivadas.
+        Devuelve el resultado de la herramienta como texto legible.
+        """
+        return self.run_structured(input_str).render()
+    
+    def run_structured(self, input_str: str) -> ToolResult:
+        """
+        Método que deben implementar las clases derivadas: devuelve el resultado
+        estructurado, que el agente serializa de forma compacta para el LLM.
+        """
+        raise NotImplementedError("Las subclases deben implementar este método")
+    
+    def is_final_answer(self, input_str: str) -> bool:
+        """
+        Indica si la salida de `run` para esta consulta ya es la respuesta completa
+        y puede enviarse al usuario con una plantilla local, sin pasar por el LLM.
+        Por defecto las herramientas no marcan su salida como respuesta final.
+        """
+        return False
+    
+    def _is_pure_lookup(self, input_str: str, max_words: int = 12) -> bool:
+        """
+        Determina si la consulta es una búsqueda directa (corta y sin pedir
+        análisis, comparaciones o explicaciones adicionales).
         """
-        raise NotImplementedError("Las subclases deben implementar este método")
\ No newline at end of file
+        text_lower = input_str.lower()
+        if len(text_lower.split()) > max_words:
+            return False
+        return not any(marker in text_lower for marker in ANALYSIS_MARKERS)
\ No newline at end of file
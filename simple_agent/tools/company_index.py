@@ -0,0 +1,169 @@
+from collections import defaultdict
+from difflib import SequenceMatcher
+import re
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
+
+from .ranking_data import RankingSnapshot, fold_text
+
+# Palabras que no distinguen a una empresa de otra ("Grupo Romero", "Glencore Perú")
+NAME_STOPWORDS = frozenset({"grupo", "peru", "de", "del", "la", "el", "los", "las", "y", "sa", "saa", "sac"})
+
+# Búsqueda aproximada: trigramas compartidos para proponer candidatos y similitud
+# mínima para aceptarlos (los errores de escritura rara vez cambian la primera letra)
+FUZZY_MIN_SHARED = 2
+FUZZY_MAX_CANDIDATES = 5
+FUZZY_MIN_RATIO = 0.8
+FUZZY_MIN_LENGTH = 4
+
+_WORD = re.compile(r"\w+")
+
+
+def _trigrams(word: str) -> Set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    Índice de nombres de empresas insensible a tildes y mayúsculas.
+
+    Cada nombre se registra con sus alias (el nombre completo, el nombre sin
+    "Grupo", las palabras que solo aparecen en esa empresa y los alias
+    explícitos). La búsqueda recorre la consulta probando secuencias de palabras
+    en un diccionario; las palabras que no coinciden se comparan por trigramas
+    para tolerar errores de escritura ("Alicrop").
+    """
+
+    def __init__(self, names: Iterable[str], aliases: Optional[Mapping[str, Sequence[str]]] = None):
+        self.names: Tuple[str, ...] = tuple(dict.fromkeys(names))
+        self._aliases: Dict[Tuple[str, ...], str] = {}
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self._words: Dict[str, str] = {}
+
+        word_owners: Dict[str, Set[str]] = defaultdict(set)
+        for name in self.names:
+            tokens = tuple(_WORD.findall(fold_text(name)))
+            self._aliases[tokens] = name
+            if tokens and tokens[0] == "grupo" and len(tokens) > 1:
+                self._aliases[tokens[1:]] = name
+            for token in tokens:
+                if token not in NAME_STOPWORDS:
+                    word_owners[token].add(name)
+            for alias in (aliases or {}).get(name, ()):
+                self._aliases[tuple(_WORD.findall(fold_text(alias)))] = name
+
+        # Las palabras de un solo nombre sirven como alias y para la búsqueda aproximada
+        for word, owners in word_owners.items():
+            if len(owners) == 1:
+                name = next(iter(owners))
+                self._aliases.setdefault((word,), name)
+                if len(word) >= FUZZY_MIN_LENGTH:
+                    self._words[word] = name
+                    for trigram in _trigrams(word):
+                        self._trigrams[trigram].add(word)
+        self._max_alias_words = max((len(alias) for alias in self._aliases), default=0)
+
+    def find_all(self, text: str) -> List[str]:
+        """
+        Devuelve las empresas mencionadas en el texto, en orden de aparición y sin repetir.
+        """
+        tokens = _WORD.findall(fold_text(text))
+        found: List[str] = []
+        position = 0
+        while position < len(tokens):
+            name, length = self._match_at(tokens, position)
+            if name is None:
+                name, length = self._fuzzy_match(tokens[position]), 1
+            if name is not None and name not in found:
+                found.append(name)
+            position += length
+        return found
+
+    def find(self, text: str) -> Optional[str]:
+        """
+        Devuelve la primera empresa mencionada en el texto (o None).
+        """
+        found = self.find_all(text)
+        return found[0] if found else None
+
+    def _match_at(self, tokens: List[str], position: int) -> Tuple[Optional[str], int]:
+        # Coincidencia exacta más larga que empieza en `position`
+        for length in range(min(self._max_alias_words, len(tokens) - position), 0, -1):
+            name = self._aliases.get(tuple(tokens[position:position + length]))
+            if name is not None:
+                return name, length
+        return None, 1
+
+    def _fuzzy_match(self, token: str) -> Optional[str]:
+        if len(token) < FUZZY_MIN_LENGTH or token in NAME_STOPWORDS:
+            return None
+        shared: Dict[str, int] = defaultdict(int)
+        for trigram in _trigrams(token):
+            for word in self._trigrams.get(trigram, ()):
+                shared[word] += 1
+        candidates = sorted(
+            (word for word, count in shared.items() if count >= FUZZY_MIN_SHARED and word[0] == token[0]),
+            key=lambda word: shared[word], reverse=True
+        )[:FUZZY_MAX_CANDIDATES]
+        best, best_ratio = None, FUZZY_MIN_RATIO
+        for word in candidates:
+            ratio = SequenceMatcher(None, token, word).ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = word, ratio
+        return self._words[best] if best else None
+
+
+class MetricPosition(NamedTuple):
+    """
+    Puesto de una empresa en una métrica.
+    """
+    metric: str
+    rank: int
+    total: int
+    value: float
+
+
+class CompanyProfile(NamedTuple):
+    """
+    Puesto y valor de una empresa en cada métrica en la que figura.
+    """
+    name: str
+    sector: str
+    positions: Tuple[MetricPosition, ...]
+
+    def position(self, metric: str) -> Optional[MetricPosition]:
+        return next((position for position in self.positions if position.metric == metric), None)
+
+
+class CompanyDirectory:
+    """
+    Índice de nombres y perfiles de todas las empresas de una versión de los
+    datos. Se construye una vez por versión; cada búsqueda es un acceso a diccionario.
+    """
+
+    def __init__(self, snapshot: RankingSnapshot, aliases: Optional[Mapping[str, Sequence[str]]] = None):
+        self.version = snapshot.version
+        positions: Dict[str, List[MetricPosition]] = defaultdict(list)
+        sectors: Dict[str, str] = {}
+        for metric, entries in snapshot.rankings.items():
+            for rank, entry in enumerate(entries, 1):
+                positions[entry.name].append(MetricPosition(metric, rank, len(entries), entry.value))
+                sectors.setdefault(entry.name, entry.sector)
+        self.profiles: Dict[str, CompanyProfile] = {
+            name: CompanyProfile(name, sectors[name], tuple(company_positions))
+            for name, company_positions in positions.items()
+        }
+        self.names = NameIndex(self.profiles, aliases)
+
+    def lookup(self, text: str) -> Optional[CompanyProfile]:
+        """
+        Perfil de la primera empresa mencionada en el texto.
+        """
+        name = self.names.find(text)
+        return self.profiles[name] if name else None
+
+    def lookup_all(self, text: str) -> List[CompanyProfile]:
+        """
+        Perfiles de todas las empresas mencionadas en el texto, en orden de aparición.
+        """
+        return [self.profiles[name] for name in self.names.find_all(text)]
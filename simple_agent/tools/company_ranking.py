@@ -1,13 +1,48 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 import re
 import logging
 from typing import Dict, List, Optional, Any, ClassVar
 
 from .base import SimpleTool
+from .results import ToolResult, register_renderer
+from .ranking_data import RANKING_METRICS, RANKING_TOP_N, RankingDataset, RankingSnapshot
+from .company_index import CompanyDirectory, CompanyProfile, NameIndex
+from .sector_index import SectorBitmapIndex, SectorTaxonomy, describe_filter
+from .ranking_arithmetic import (
+    INTENT_COMPARE, INTENT_DIFFERENCE, INTENT_RATIO, INTENT_SHARE, CompanyFigure,
+    compare_figures, detect_intent, number, share_pct
+)
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Columnas de los resultados de ranking
+RANKING_COLUMNS = ("rank", "name", "value", "sector")
+RANKING_CHANGE_COLUMNS = ("name", "rank_from", "rank_to", "value_from", "value_to", "change_pct", "cagr_pct")
+RANKING_SERIES_COLUMNS = ("year", "value", "rank")
+PROFILE_COLUMNS = ("metric", "rank", "of", "value")
+COMPARISON_COLUMNS = ("name", "rank", "value", "source")
+
+# Consultas de estadísticas por sector
+SECTOR_QUERY_PATTERN = re.compile(r"(sector|total|suma|promedio|media|mediana|percentil|porcentaje|participaci|cuota|proporci)")
+SECTOR_STAT_PATTERNS = {
+    "sum": re.compile(r"\b(total|totales|suma|sumad[oa]s?|en conjunto)\b"),
+    "mean": re.compile(r"\b(promedio|media)\b"),
+    "median": re.compile(r"\bmediana\b"),
+    "share": re.compile(r"(porcentaje|participaci[oó]n|cuota|proporci[oó]n)"),
+}
+PERCENTILE_PATTERN = re.compile(r"percentil\s*(\d{1,2})")
+BY_SECTOR_PATTERN = re.compile(r"(por sector(es)?|cada sector|los sectores)")
+
+# Rankings filtrados por sector ("top 3 de ingresos en minería o energía")
+FILTER_RANKING_PATTERN = re.compile(r"\b(top|ranking|empresas|compañías|mayores|principales|l[ií]deres|m[aá]s)\b")
+TOP_N_PATTERN = re.compile(r"\btop\s*(\d{1,2})\b|\b(\d{1,2})\s+(primeras|mayores|principales|empresas)\b")
+
+# Consultas históricas: años mencionados e intención (quién subió más, crecimiento anual)
+YEAR_PATTERN = re.compile(r"\b(?:19|20)\d{2}\b")
+MOVERS_PATTERN = re.compile(r"(subi[oó]|subieron|escal|puestos|m[aá]s (creci|subi)|movimiento|cay[oó]|cayeron|baj[oó]|bajaron)")
+SINCE_PATTERN = re.compile(r"\b(desde|a partir de)\b")
+
 class CompanyRankingInput(BaseModel):
     """
     Modelo para la entrada de la herramienta de ranking de empresas.
@@ -27,45 +62,172 @@ class CompanyRankingTool(SimpleTool):
         description="Descripción de la herramienta"
     )
     args_schema: ClassVar[type] = CompanyRankingInput
+    speculative: ClassVar[bool] = True
     
-    # Datos simulados de rankings empresariales (para demostración)
-    COMPANY_RANKINGS: Dict[str, List[Dict[str, str]]] = {
+    # Datos simulados de rankings empresariales (para demostración). Son los datos
+    # base del `RankingDataset` cuando no se indica RANKING_DATA_PATH
+    COMPANY_RANKINGS: Dict[str, List[Dict[str, Any]]] = {
         "inversión": [
-            {"rank": 1, "name": "Grupo Romero", "investment": "USD 1,250 millones", "sector": "Diversificado"},
-            {"rank": 2, "name": "Grupo Breca", "investment": "USD 980 millones", "sector": "Minería/Banca"},
-            {"rank": 3, "name": "Grupo Intercorp", "investment": "USD 830 millones", "sector": "Retail/Banca"},
-            {"rank": 4, "name": "Southern Peru Copper", "investment": "USD 750 millones", "sector": "Minería"},
-            {"rank": 5, "name": "Alicorp", "investment": "USD 620 millones", "sector": "Consumo masivo"}
+            {"rank": 1, "name": "Grupo Romero", "investment": 1250, "sector": "Diversificado"},
+            {"rank": 2, "name": "Grupo Breca", "investment": 980, "sector": "Minería/Banca"},
+            {"rank": 3, "name": "Grupo Intercorp", "investment": 830, "sector": "Retail/Banca"},
+            {"rank": 4, "name": "Southern Peru Copper", "investment": 750, "sector": "Minería"},
+            {"rank": 5, "name": "Alicorp", "investment": 620, "sector": "Consumo masivo"}
         ],
         "ingresos": [
-            {"rank": 1, "name": "Petroperú", "revenue": "USD 4,800 millones", "sector": "Energía"},
-            {"rank": 2, "name": "Southern Peru Copper", "revenue": "USD 3,900 millones", "sector": "Minería"},
-            {"rank": 3, "name": "Grupo Romero", "revenue": "USD 3,200 millones", "sector": "Diversificado"},
-            {"rank": 4, "name": "Grupo Intercorp", "revenue": "USD 2,950 millones", "sector": "Retail/Banca"},
-            {"rank": 5, "name": "Glencore Perú", "revenue": "USD 2,700 millones", "sector": "Minería"}
+            {"rank": 1, "name": "Petroperú", "revenue": 4800, "sector": "Energía"},
+            {"rank": 2, "name": "Southern Peru Copper", "revenue": 3900, "sector": "Minería"},
+            {"rank": 3, "name": "Grupo Romero", "revenue": 3200, "sector": "Diversificado"},
+            {"rank": 4, "name": "Grupo Intercorp", "revenue": 2950, "sector": "Retail/Banca"},
+            {"rank": 5, "name": "Glencore Perú", "revenue": 2700, "sector": "Minería"}
         ],
         "valor de mercado": [
-            {"rank": 1, "name": "Credicorp", "market_value": "USD 12,500 millones", "sector": "Banca"},
-            {"rank": 2, "name": "Southern Peru Copper", "market_value": "USD 9,800 millones", "sector": "Minería"},
-            {"rank": 3, "name": "Grupo Intercorp", "market_value": "USD 5,200 millones", "sector": "Retail/Banca"},
-            {"rank": 4, "name": "Buenaventura", "market_value": "USD 2,800 millones", "sector": "Minería"},
-            {"rank": 5, "name": "InRetail", "market_value": "USD 2,300 millones", "sector": "Retail"}
+            {"rank": 1, "name": "Credicorp", "market_value": 12500, "sector": "Banca"},
+            {"rank": 2, "name": "Southern Peru Copper", "market_value": 9800, "sector": "Minería"},
+            {"rank": 3, "name": "Grupo Intercorp", "market_value": 5200, "sector": "Retail/Banca"},
+            {"rank": 4, "name": "Buenaventura", "market_value": 2800, "sector": "Minería"},
+            {"rank": 5, "name": "InRetail", "market_value": 2300, "sector": "Retail"}
         ],
         "empleados": [
-            {"rank": 1, "name": "Grupo Intercorp", "employees": "90,000+", "sector": "Retail/Banca"},
-            {"rank": 2, "name": "Grupo Romero", "employees": "75,000+", "sector": "Diversificado"},
-            {"rank": 3, "name": "Grupo Breca", "employees": "45,000+", "sector": "Diversificado"},
-            {"rank": 4, "name": "Grupo Gloria", "employees": "35,000+", "sector": "Alimentos"},
-            {"rank": 5, "name": "Grupo AJE", "employees": "20,000+", "sector": "Bebidas"}
+            {"rank": 1, "name": "Grupo Intercorp", "employees": 90000, "sector": "Retail/Banca"},
+            {"rank": 2, "name": "Grupo Romero", "employees": 75000, "sector": "Diversificado"},
+            {"rank": 3, "name": "Grupo Breca", "employees": 45000, "sector": "Diversificado"},
+            {"rank": 4, "name": "Grupo Gloria", "employees": 35000, "sector": "Alimentos"},
+            {"rank": 5, "name": "Grupo AJE", "employees": 20000, "sector": "Bebidas"}
         ]
     }
     
-    def run(self, input_str: str) -> str:
+    # Series históricas simuladas por métrica y empresa (valor por año de HISTORY_YEARS);
+    # el último año coincide con COMPANY_RANKINGS
+    HISTORY_YEARS: ClassVar[tuple] = (2019, 2020, 2021, 2022, 2023, 2024)
+    COMPANY_HISTORY: ClassVar[Dict[str, Dict[str, tuple]]] = {
+        "inversión": {
+            "Grupo Romero": (820, 610, 900, 1050, 1180, 1250),
+            "Grupo Breca": (700, 540, 760, 850, 920, 980),
+            "Grupo Intercorp": (560, 430, 640, 720, 790, 830),
+            "Southern Peru Copper": (900, 650, 700, 680, 720, 750),
+            "Alicorp": (380, 300, 450, 520, 580, 620),
+            "Grupo Gloria": (420, 330, 410, 470, 520, 560),
+        },
+        "ingresos": {
+            "Petroperú": (4300, 2900, 3700, 5600, 5100, 4800),
+            "Southern Peru Copper": (2800, 2600, 3800, 3600, 3700, 3900),
+            "Grupo Romero": (2500, 2300, 2700, 2900, 3050, 3200),
+            "Grupo Intercorp": (2400, 1900, 2300, 2600, 2800, 2950),
+            "Glencore Perú": (1900, 1700, 2300, 2500, 2550, 2700),
+            "Alicorp": (2100, 2050, 2400, 2600, 2500, 2450),
+        },
+        "valor de mercado": {
+            "Credicorp": (16900, 11200, 10100, 11400, 11800, 12500),
+            "Southern Peru Copper": (6900, 7400, 9100, 8300, 9200, 9800),
+            "Grupo Intercorp": (4300, 3100, 3500, 4200, 4700, 5200),
+            "Buenaventura": (3900, 3500, 2600, 2100, 2400, 2800),
+            "InRetail": (4100, 3600, 3000, 2500, 2200, 2300),
+            "Alicorp": (2000, 1900, 1500, 1300, 1400, 1550),
+        },
+        "empleados": {
+            "Grupo Intercorp": (70000, 68000, 74000, 80000, 86000, 90000),
+            "Grupo Romero": (62000, 60000, 65000, 70000, 72000, 75000),
+            "Grupo Breca": (38000, 36000, 39000, 41000, 43000, 45000),
+            "Grupo Gloria": (30000, 29000, 31000, 33000, 34000, 35000),
+            "Grupo AJE": (15000, 14000, 16000, 18000, 19000, 20000),
+            "Alicorp": (9000, 8800, 9300, 9500, 9700, 10000),
+        },
+    }
+    
+    # Alias de empresas además de su nombre, el nombre sin "Grupo" y sus palabras distintivas
+    COMPANY_ALIASES: ClassVar[Dict[str, tuple]] = {
+        "Southern Peru Copper": ("southern copper", "spcc"),
+        "Petroperú": ("petroleos del peru",),
+        "Grupo AJE": ("ajegroup",),
+    }
+    
+    # Datos con recarga en caliente; por defecto se configuran desde el entorno
+    dataset: Optional[RankingDataset] = Field(default=None, exclude=True, description="Datos de rankings")
+    
+    # Resultados ya construidos por versión de los datos y métrica
+    _result_cache: Dict[str, ToolResult] = PrivateAttr(default_factory=dict)
+    
+    # Índice de nombres y perfiles por empresa de la versión vigente
+    _directory: Optional[CompanyDirectory] = PrivateAttr(default=None)
+    
+    # Tabla numérica y estadísticas por sector (NumPy) de la versión vigente
+    _sector_stats: Optional[Any] = PrivateAttr(default=None)
+    
+    # Taxonomía base de sectores (inmutable) e índice de bits por sector de la
+    # versión vigente, con su propia taxonomía ampliada con los sectores de esa versión
+    _taxonomy: SectorTaxonomy = PrivateAttr(default_factory=SectorTaxonomy)
+    _sector_index: Optional[SectorBitmapIndex] = PrivateAttr(default=None)
+    
+    # Series históricas (NumPy), construidas en la primera consulta por años
+    _history: Optional[Any] = PrivateAttr(default=None)
+    _history_names: Optional[NameIndex] = PrivateAttr(default=None)
+    
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        if self.dataset is None:
+            self.dataset = RankingDataset.from_env(self.COMPANY_RANKINGS)
+        self.dataset.subscribe(self._on_new_version)
+    
+    def _on_new_version(self, snapshot: RankingSnapshot) -> None:
+        """
+        Invalida los resultados cacheados y el índice de empresas de versiones anteriores.
+        """
+        self._result_cache = {}
+        self._directory = None
+        self._sector_stats = None
+        self._sector_index = None
+    
+    def _get_directory(self) -> CompanyDirectory:
+        """
+        Índice de empresas de la versión vigente (se construye una vez por versión).
+        """
+        snapshot = self.dataset.snapshot
+        directory = self._directory
+        if directory is None or directory.version != snapshot.version:
+            directory = CompanyDirectory(snapshot, self.COMPANY_ALIASES)
+            self._directory = directory
+        return directory
+    
+    def run_structured(self, input_str: str) -> ToolResult:
         """
         Proporciona información sobre rankings de empresas.
         """
         try:
-            logger.info(f"Recibida consulta: {input_str}")
+            logger.info("Recibida consulta (%d caracteres)", len(input_str))
+            
+            # Consultas históricas: mencionan uno o más años
+            years = sorted({int(year) for year in YEAR_PATTERN.findall(input_str)})
+            if years:
+                logger.info("Detectada consulta histórica (%s)", years)
+                return self._history_result(input_str, years)
+            
+            # Cálculos sobre las cifras: diferencias, razones y porcentajes
+            result = self._arithmetic_result(input_str)
+            if result is not None:
+                logger.info("Detectada consulta aritmética sobre las métricas")
+                return result
+            
+            # Estadísticas por sector (totales, promedios, medianas, participación)
+            if SECTOR_QUERY_PATTERN.search(input_str.lower()):
+                result = self._sector_result(input_str)
+                if result is not None:
+                    logger.info("Detectada consulta de estadísticas por sector")
+                    return result
+            
+            # Consultas sobre empresas concretas: su puesto en cada ranking
+            profiles = self._get_directory().lookup_all(input_str)
+            if profiles:
+                logger.info("Detectada consulta sobre %d empresa(s)", len(profiles))
+                metric = self._detect_metric(input_str)
+                parts = [self._profile_result(profile, metric) for profile in profiles]
+                return parts[0] if len(parts) == 1 else ToolResult.group(self.name, parts)
+            
+            # Rankings filtrados por sector ("empresas de minería o energía con más ingresos")
+            result = self._filtered_ranking_result(input_str)
+            if result is not None:
+                logger.info("Detectada consulta de ranking filtrado por sector")
+                return result
             
             # Detectar solicitudes múltiples
             if self._contains_multiple_rankings(input_str):
@@ -75,22 +237,22 @@ class CompanyRankingTool(SimpleTool):
             # Verificación directa para inversión (alta prioridad)
             if self._is_investment_query(input_str):
                 logger.info("Detectada consulta específica sobre ranking por inversión")
-                return self._format_ranking_data("inversión", self.COMPANY_RANKINGS["inversión"])
+                return self._ranking_result("inversión")
             
             # Verificación directa para empleados
             if self._is_employees_query(input_str):
                 logger.info("Detectada consulta sobre ranking por empleados")
-                return self._format_ranking_data("empleados", self.COMPANY_RANKINGS["empleados"])
+                return self._ranking_result("empleados")
             
             # Verificación directa para ingresos
             if self._is_revenue_query(input_str):
                 logger.info("Detectada consulta sobre ranking por ingresos")
-                return self._format_ranking_data("ingresos", self.COMPANY_RANKINGS["ingresos"])
+                return self._ranking_result("ingresos")
             
             # Verificación directa para valor de mercado
             if self._is_market_value_query(input_str):
                 logger.info("Detectada consulta sobre ranking por valor de mercado")
-                return self._format_ranking_data("valor de mercado", self.COMPANY_RANKINGS["valor de mercado"])
+                return self._ranking_result("valor de mercado")
             
             # Continuar con el proceso normal para otros tipos de rankings
             ranking_type = self._extract_ranking_type(input_str)
@@ -100,20 +262,32 @@ class CompanyRankingTool(SimpleTool):
                 return self._get_general_ranking_info()
                 
             # Obtener datos del ranking específico
-            if ranking_type in self.COMPANY_RANKINGS:
-                return self._format_ranking_data(ranking_type, self.COMPANY_RANKINGS[ranking_type])
+            if ranking_type in self.dataset.snapshot.rankings:
+                return self._ranking_result(ranking_type)
             else:
                 similar_types = self._find_similar_ranking_types(ranking_type)
                 if similar_types:
-                    result = f"No encontré información específica sobre '{ranking_type}', pero puedo ofrecerte ranking por {', '.join(similar_types)}.\n\n"
+                    notice = f"No encontré información específica sobre '{ranking_type}', pero puedo ofrecerte ranking por {', '.join(similar_types)}."
                     # Mostrar el primer ranking similar
-                    return result + self._format_ranking_data(similar_types[0], self.COMPANY_RANKINGS[similar_types[0]])
+                    return self._ranking_result(similar_types[0], notice=notice)
                 else:
-                    return f"No encontré información sobre rankings de empresas por '{ranking_type}'. Puedo ofrecerte información sobre empresas por inversión, ingresos, valor de mercado o número de empleados."
+                    return ToolResult.message(self.name, f"No encontré información sobre rankings de empresas por '{ranking_type}'. Puedo ofrecerte información sobre empresas por inversión, ingresos, valor de mercado o número de empleados.")
                 
         except Exception as e:
-            logger.error(f"Error en herramienta de ranking: {str(e)}")
-            return "No pude obtener la información de rankings empresariales solicitada."
+            logger.error("Error en herramienta de ranking: %s", e)
+            return ToolResult.message(self.name, "No pude obtener la información de rankings empresariales solicitada.")
+    
+    def is_final_answer(self, input_str: str) -> bool:
+        """
+        Una consulta directa por un ranking (p. ej. "ranking por inversión") se
+        responde con la tabla formateada sin reformularla.
+        """
+        if not self._is_pure_lookup(input_str):
+            return False
+        if self._get_directory().names.find(input_str):
+            return True
+        return (self._is_investment_query(input_str) or self._is_employees_query(input_str)
+                or self._is_revenue_query(input_str) or self._is_market_value_query(input_str))
     
     def _is_investment_query(self, text: str) -> bool:
         """
@@ -123,7 +297,7 @@ class CompanyRankingTool(SimpleTool):
         
         # Patrones específicos para inversión
         investment_patterns = [
-            r'(inversion|inversión|inverten|invierten|inversi)',
+            r'(inversion|inversión|inverten|invierte|inversi)',
             r'(ranking|clasificación|top|mejor).*?(inver)',
             r'empresa.*?(inver)',
             r'(inver).*?(empresa)',
@@ -227,38 +401,31 @@ class CompanyRankingTool(SimpleTool):
         
         return mentions > 1
     
-    def _process_multiple_rankings(self, text: str) -> str:
+    def _process_multiple_rankings(self, text: str) -> ToolResult:
         """
         Procesa y devuelve información para múltiples rankings.
         """
-        result = "Aquí te presento la información de múltiples rankings que solicitaste:\n\n"
+        metrics = []
         
         # Verificar cada tipo de ranking
         if self._is_investment_query(text):
-            result += "--- RANKING POR INVERSIÓN ---\n"
-            result += self._format_ranking_data("inversión", self.COMPANY_RANKINGS["inversión"]) + "\n\n"
-            
+            metrics.append("inversión")
         if self._is_revenue_query(text):
-            result += "--- RANKING POR INGRESOS ---\n"
-            result += self._format_ranking_data("ingresos", self.COMPANY_RANKINGS["ingresos"]) + "\n\n"
-            
+            metrics.append("ingresos")
         if self._is_market_value_query(text):
-            result += "--- RANKING POR VALOR DE MERCADO ---\n"
-            result += self._format_ranking_data("valor de mercado", self.COMPANY_RANKINGS["valor de mercado"]) + "\n\n"
-            
+            metrics.append("valor de mercado")
         if self._is_employees_query(text):
-            result += "--- RANKING POR NÚMERO DE EMPLEADOS ---\n"
-            result += self._format_ranking_data("empleados", self.COMPANY_RANKINGS["empleados"])
+            metrics.append("empleados")
         
         # Si no se detectó ningún ranking específico, mostrar los dos más comunes
-        if result == "Aquí te presento la información de múltiples rankings que solicitaste:\n\n":
-            result += "--- RANKING POR INVERSIÓN ---\n"
-            result += self._format_ranking_data("inversión", self.COMPANY_RANKINGS["inversión"]) + "\n\n"
-            
-            result += "--- RANKING POR INGRESOS ---\n"
-            result += self._format_ranking_data("ingresos", self.COMPANY_RANKINGS["ingresos"])
+        if not metrics:
+            metrics = ["inversión", "ingresos"]
         
-        return result
+        return ToolResult.group(
+            self.name,
+            [self._ranking_result(metric) for metric in metrics],
+            title="Aquí te presento la información de múltiples rankings que solicitaste:"
+        )
     
     def _extract_ranking_type(self, text: str) -> str:
         """
@@ -337,7 +504,7 @@ class CompanyRankingTool(SimpleTool):
             
         return similar_types
     
-    def _get_general_ranking_info(self) -> str:
+    def _get_general_ranking_info(self) -> ToolResult:
         """
         Proporciona información general sobre los rankings disponibles.
         """
@@ -350,29 +517,566 @@ class CompanyRankingTool(SimpleTool):
         
         result += "¿Sobre cuál te gustaría obtener más información?"
         
+        return ToolResult.message(self.name, result)
+    
+    def _ranking_result(self, ranking_type: str, notice: Optional[str] = None) -> ToolResult:
+        """
+        Construye (y cachea) el resultado estructurado de un ranking: filas
+        (posición, nombre, valor numérico, sector) con la métrica y su unidad,
+        tomadas de la versión vigente de los datos.
+        """
+        snapshot = self.dataset.snapshot
+        cache = self._result_cache
+        # La versión forma parte de la clave: una consulta que empezó con la
+        # versión anterior nunca deja su resultado como si fuera de la nueva
+        cache_key = f"{snapshot.version}|{ranking_type}|{notice or ''}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        metric = RANKING_METRICS[ranking_type]
+        meta = {"metric": ranking_type, "unit": metric["unit"]}
+        if notice:
+            meta["notice"] = notice
+        result = ToolResult(
+            tool=self.name, kind="ranking", meta=meta, columns=RANKING_COLUMNS, rows=snapshot.top(ranking_type)
+        )
+        cache[cache_key] = result
         return result
     
-    def _format_ranking_data(self, ranking_type: str, data: list) -> str:
+    def _get_history(self) -> Any:
+        """
+        Series históricas de RANKING_HISTORY_PATH o, si no se indica, las incluidas.
+        """
+        if self._history is None:
+            from .ranking_history import RankingHistory
+            self._history = RankingHistory.from_env(self.HISTORY_YEARS, self.COMPANY_HISTORY)
+        return self._history
+    
+    def _detect_metric(self, text: str) -> Optional[str]:
+        """
+        Devuelve la métrica mencionada en la consulta (o None).
+        """
+        if self._is_investment_query(text):
+            return "inversión"
+        if self._is_employees_query(text):
+            return "empleados"
+        if self._is_revenue_query(text):
+            return "ingresos"
+        if self._is_market_value_query(text):
+            return "valor de mercado"
+        return None
+    
+    def _get_sector_stats(self) -> Any:
+        """
+        Estadísticas por sector de la versión vigente (se construyen una vez por versión).
+        """
+        from .sector_stats import CompanyTable, SectorAggregator
+        snapshot = self.dataset.snapshot
+        aggregator = self._sector_stats
+        if aggregator is None or aggregator.version != snapshot.version:
+            aggregator = SectorAggregator(CompanyTable(snapshot, self._taxonomy.for_snapshot(snapshot)))
+            self._sector_stats = aggregator
+        return aggregator
+    
+    def _sector_result(self, text: str) -> Optional[ToolResult]:
         """
-        Formatea los datos de ranking en un texto legible.
+        Responde consultas de estadísticas por sector ("ingresos totales del
+        sector minería", "promedio de empleados en banca", "mediana de inversión
+        por sector"). Devuelve None si la consulta no es de este tipo.
         """
-        result = f"TOP 5 EMPRESAS PERUANAS POR {ranking_type.upper()}:\n\n"
+        text_lower = text.lower()
+        aggregator = self._get_sector_stats()
+        sectors = aggregator.table.find_sectors(text)
+        by_sector = bool(BY_SECTOR_PATTERN.search(text_lower))
+        stat = next((name for name, pattern in SECTOR_STAT_PATTERNS.items() if pattern.search(text_lower)), None)
+        percentile = PERCENTILE_PATTERN.search(text_lower)
+        if percentile:
+            stat = f"p{int(percentile.group(1))}"
+        if not (sectors or by_sector) or not (stat or "sector" in text_lower):
+            return None
+        if not (stat or by_sector) and FILTER_RANKING_PATTERN.search(text_lower):
+            # "empresas del sector minería": ranking filtrado, no estadísticas
+            return None
         
-        for company in data:
-            result += f"{company['rank']}. {company['name']}\n"
-            
-            # Añadir la métrica correspondiente según el tipo de ranking
-            if ranking_type == "inversión":
-                result += f"   Inversión estimada: {company['investment']}\n"
-            elif ranking_type == "ingresos":
-                result += f"   Ingresos anuales: {company['revenue']}\n"
-            elif ranking_type == "valor de mercado":
-                result += f"   Valor de mercado: {company['market_value']}\n"
-            elif ranking_type == "empleados":
-                result += f"   Número de empleados: {company['employees']}\n"
-                
-            result += f"   Sector: {company['sector']}\n\n"
-            
-        result += "Nota: Datos simulados con fines demostrativos. Las cifras reales pueden variar."
+        metric = self._detect_metric(text)
+        if not metric:
+            return ToolResult.message(
+                self.name,
+                "Puedo calcular totales, promedios, medianas, percentiles y participación por sector "
+                f"({', '.join(aggregator.table.sector_names)}) para inversión, ingresos, valor de mercado "
+                "o empleados. ¿Qué métrica te interesa?"
+            )
         
-        return result
\ No newline at end of file
+        cache = self._result_cache
+        cache_key = f"{aggregator.version}|sector|{metric}|{stat or ''}|{','.join(sectors) if not by_sector else ''}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        percentiles = [int(percentile.group(1))] if percentile else []
+        columns, rows = aggregator.rows(
+            metric, None if by_sector else sectors, percentiles=sorted({25, 75, *percentiles})
+        )
+        meta = {"metric": metric, "unit": RANKING_METRICS[metric]["unit"]}
+        if stat:
+            meta["stat"] = stat
+        absent = [sector for sector in sectors if sector not in {row[0] for row in rows}]
+        if absent and not by_sector:
+            meta["absent"] = ", ".join(absent)
+        result = ToolResult(tool=self.name, kind="sector_stats", meta=meta, columns=columns, rows=tuple(rows))
+        cache[cache_key] = result
+        return result
+    
+    def _get_sector_index(self) -> SectorBitmapIndex:
+        """
+        Índice de bits por sector de la versión vigente (se construye una vez por versión).
+        """
+        snapshot = self.dataset.snapshot
+        index = self._sector_index
+        if index is None or index.version != snapshot.version:
+            index = SectorBitmapIndex(snapshot, self._taxonomy.for_snapshot(snapshot))
+            self._sector_index = index
+        return index
+    
+    def _filtered_ranking_result(self, text: str) -> Optional[ToolResult]:
+        """
+        Responde rankings filtrados por sectores combinados con "y", "o" y
+        "sin"/"excepto" ("top 3 de ingresos en minería o energía", "empresas
+        con más empleados excepto retail"). Devuelve None si la consulta no
+        menciona sectores.
+        """
+        index = self._get_sector_index()
+        terms = index.taxonomy.parse_filter(text)
+        if not terms:
+            return None
+        top_n = TOP_N_PATTERN.search(text.lower())
+        limit = min(int(top_n.group(1) or top_n.group(2)), 50) if top_n else RANKING_TOP_N
+        metric = self._detect_metric(text)
+        metrics = [metric] if metric else list(index.rankings)
+        
+        parts = []
+        for name in metrics:
+            cache_key = f"{index.version}|filter|{name}|{limit}|{terms}"
+            result = self._result_cache.get(cache_key)
+            if result is None:
+                mask = index.evaluate(name, terms)
+                rows = tuple((rank, entry.name, entry.value, entry.sector) for rank, entry in index.top(name, mask, limit))
+                meta = {
+                    "metric": name, "unit": RANKING_METRICS[name]["unit"],
+                    "filter": describe_filter(terms), "matches": index.count(mask),
+                }
+                result = ToolResult(tool=self.name, kind="ranking", meta=meta, columns=RANKING_COLUMNS, rows=rows)
+                self._result_cache[cache_key] = result
+            if result.rows or metric:
+                parts.append(result)
+        
+        if not any(part.rows for part in parts):
+            return ToolResult.message(
+                self.name, f"Ninguna empresa de los rankings cumple el filtro de sectores: {describe_filter(terms)}."
+            )
+        if len(parts) == 1:
+            return parts[0]
+        return ToolResult.group(
+            self.name, parts, title=f"Rankings de empresas filtrados por sector ({describe_filter(terms)}):"
+        )
+    
+    def _arithmetic_result(self, text: str) -> Optional[ToolResult]:
+        """
+        Responde comparaciones entre empresas ("¿cuánto más factura Petroperú que
+        Alicorp?", "¿cuántas veces más empleados tiene Intercorp que Gloria?") y
+        porcentajes sobre un top o sobre el total ("¿qué porcentaje del top 5 de
+        ingresos es minería?"). Las cifras se calculan aquí; el resultado solo
+        lleva los valores usados y los calculados. Devuelve None si la consulta
+        no es de este tipo.
+        """
+        intent = detect_intent(text)
+        if intent is None:
+            return None
+        companies = self._get_directory().names.find_all(text)
+        metric = self._detect_metric(text)
+        
+        if intent == INTENT_SHARE:
+            top_n = TOP_N_PATTERN.search(text.lower())
+            if not top_n and not companies:
+                # Participación de un sector sobre el total: estadísticas por sector
+                return None
+            if not metric:
+                return ToolResult.message(
+                    self.name, "¿Sobre qué métrica calculo el porcentaje: inversión, ingresos, valor de mercado o empleados?"
+                )
+            limit = int(top_n.group(1) or top_n.group(2)) if top_n else None
+            return self._share_result(text, metric, companies, limit)
+        
+        if len(companies) < 2:
+            return None
+        metrics = [metric] if metric else list(RANKING_METRICS)
+        parts = []
+        for name in metrics:
+            figures = [self._company_figure(company, name) for company in companies]
+            if metric or all(figures):
+                parts.append(self._comparison_result(name, intent, companies, figures))
+        if not parts:
+            return ToolResult.message(
+                self.name, f"No tengo una misma métrica con datos de {' y '.join(companies)} para compararlas."
+            )
+        return parts[0] if len(parts) == 1 else ToolResult.group(self.name, parts)
+    
+    def _company_figure(self, company: str, metric: str) -> Optional[CompanyFigure]:
+        """
+        Valor de una empresa en el ranking vigente o, si no figura en él, en el
+        último año de la serie histórica.
+        """
+        for rank, entry in enumerate(self.dataset.snapshot.rankings.get(metric, ()), 1):
+            if entry.name == company:
+                return CompanyFigure(company, rank, entry.value, "ranking")
+        history = self._get_history()
+        if metric in history.metrics and company in history.companies(metric):
+            points = history.series(metric, company, history.last_year, history.last_year)
+            if points:
+                return CompanyFigure(company, 0, points[0][1], str(history.last_year))
+        return None
+    
+    def _comparison_result(self, metric: str, intent: str, companies: List[str],
+                           figures: List[Optional[CompanyFigure]]) -> ToolResult:
+        missing = [company for company, figure in zip(companies, figures) if figure is None]
+        if missing:
+            return ToolResult.message(self.name, f"No tengo datos de {', '.join(missing)} en el ranking por {metric}.")
+        meta = {"metric": metric, "unit": RANKING_METRICS[metric]["unit"], "intent": intent}
+        # Las cifras calculadas comparan la primera empresa mencionada con la segunda
+        meta.update(compare_figures(figures[0], figures[1]))
+        return ToolResult(
+            tool=self.name, kind="company_comparison", meta=meta, columns=COMPARISON_COLUMNS,
+            rows=tuple(tuple(figure) for figure in figures)
+        )
+    
+    def _share_result(self, text: str, metric: str, companies: List[str], limit: Optional[int]) -> ToolResult:
+        """
+        Porcentaje que representan unas empresas o un filtro de sectores sobre
+        el top `limit` de una métrica (o sobre todo el ranking).
+        """
+        index = self._get_sector_index()
+        entries = index.rankings.get(metric, ())
+        scope = entries[:limit] if limit else entries
+        if companies:
+            # Una empresa fuera del ranking o del top no aporta un 0 %: se avisa
+            ranks = {entry.name: rank for rank, entry in enumerate(entries, 1)}
+            missing = [company for company in companies if company not in ranks]
+            if missing:
+                return ToolResult.message(self.name, f"No tengo datos de {', '.join(missing)} en el ranking por {metric}.")
+            outside = [company for company in companies if limit and ranks[company] > limit]
+            if outside:
+                positions = " y ".join(f"{company} (puesto {ranks[company]})" for company in outside)
+                verb = "está" if len(outside) == 1 else "están"
+                return ToolResult.message(self.name, f"{positions} no {verb} en el top {limit} por {metric}.")
+            part_label = " y ".join(companies)
+            members = [(rank, entry) for rank, entry in enumerate(scope, 1) if entry.name in companies]
+        else:
+            terms = index.taxonomy.parse_filter(text)
+            if not terms:
+                return ToolResult.message(self.name, "¿De qué empresas o sectores quieres conocer el porcentaje?")
+            part_label = describe_filter(terms)
+            mask = index.evaluate(metric, terms) & ((1 << len(scope)) - 1)
+            members = index.top(metric, mask, len(scope))
+        
+        scope_total = sum(entry.value for entry in scope)
+        part_total = sum(entry.value for _, entry in members)
+        meta = {
+            "metric": metric, "unit": RANKING_METRICS[metric]["unit"],
+            "scope": f"top {len(scope)}" if limit else "total", "part": part_label,
+            "part_value": number(part_total), "scope_value": number(scope_total),
+            "share_pct": share_pct(part_total, scope_total),
+        }
+        return ToolResult(
+            tool=self.name, kind="metric_share", meta=meta, columns=RANKING_COLUMNS,
+            rows=tuple((rank, entry.name, entry.value, entry.sector) for rank, entry in members)
+        )
+    
+    def _profile_result(self, profile: CompanyProfile, metric: Optional[str] = None) -> ToolResult:
+        """
+        Resultado mínimo con el puesto y el valor de una empresa en cada ranking
+        (o solo en `metric`).
+        """
+        version = self._get_directory().version
+        cache = self._result_cache
+        cache_key = f"{version}|profile|{profile.name}|{metric or ''}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        positions = [p for p in profile.positions if metric is None or p.metric == metric]
+        meta = {"company": profile.name, "sector": profile.sector}
+        if metric:
+            meta["metric"] = metric
+        missing = [m for m in ([metric] if metric else RANKING_METRICS) if profile.position(m) is None]
+        if missing:
+            meta["absent"] = ", ".join(missing)
+        result = ToolResult(
+            tool=self.name, kind="company_profile", meta=meta, columns=PROFILE_COLUMNS,
+            rows=tuple((p.metric, p.rank, p.total, p.value) for p in positions)
+        )
+        cache[cache_key] = result
+        return result
+    
+    def _sector_of(self, company: str, metric: str) -> str:
+        snapshot = self.dataset.snapshot
+        for ranking_type in (metric, *snapshot.rankings):
+            for entry in snapshot.rankings.get(ranking_type, ()):
+                if entry.name == company:
+                    return entry.sector
+        return ""
+    
+    def _history_result(self, text: str, years: List[int]) -> ToolResult:
+        """
+        Responde consultas por años: ranking de un año, cambios entre dos años
+        (puestos, variación y CAGR), quién subió más o la serie de una empresa.
+        """
+        history = self._get_history()
+        out_of_range = [year for year in years if not history.first_year <= year <= history.last_year]
+        if out_of_range:
+            return ToolResult.message(
+                self.name,
+                f"Solo tengo datos históricos de rankings entre {history.first_year} y {history.last_year}."
+            )
+        
+        text_lower = text.lower()
+        start_year, end_year = years[0], years[-1]
+        if len(years) == 1 and SINCE_PATTERN.search(text_lower):
+            end_year = history.last_year
+        
+        metric = self._detect_metric(text)
+        if self._history_names is None:
+            self._history_names = NameIndex(
+                (company for metric_name in history.metrics for company in history.companies(metric_name)),
+                self.COMPANY_ALIASES
+            )
+        company = self._history_names.find(text)
+        
+        if company:
+            metrics = [metric] if metric else [m for m in history.metrics if company in history.companies(m)]
+            parts = [
+                self._series_result(history, m, company, start_year, end_year)
+                for m in metrics if company in history.companies(m)
+            ]
+            if not parts:
+                return ToolResult.message(self.name, f"No tengo datos históricos de {company} por {metric}.")
+            return parts[0] if len(parts) == 1 else ToolResult.group(self.name, parts)
+        
+        if not metric:
+            return ToolResult.message(
+                self.name,
+                f"Tengo rankings históricos ({history.first_year}-{history.last_year}) por inversión, "
+                "ingresos, valor de mercado y empleados. ¿Cuál te interesa?"
+            )
+        
+        unit = RANKING_METRICS[metric]["unit"]
+        if start_year == end_year:
+            rows = tuple(
+                (rank, name, value, self._sector_of(name, metric))
+                for rank, name, value in history.rank_at(metric, start_year)
+            )
+            return ToolResult(
+                tool=self.name, kind="ranking", meta={"metric": metric, "unit": unit, "year": start_year},
+                columns=RANKING_COLUMNS, rows=rows
+            )
+        
+        movers = bool(MOVERS_PATTERN.search(text_lower))
+        changes = history.movers(metric, start_year, end_year) if movers else history.compare(metric, start_year, end_year)
+        meta = {"metric": metric, "unit": unit, "from": start_year, "to": end_year}
+        if movers:
+            meta["sort"] = "movers"
+        return ToolResult(
+            tool=self.name, kind="ranking_change", meta=meta, columns=RANKING_CHANGE_COLUMNS,
+            rows=tuple(tuple(change[column] for column in RANKING_CHANGE_COLUMNS) for change in changes)
+        )
+    
+    def _series_result(self, history: Any, metric: str, company: str, start_year: int, end_year: int) -> ToolResult:
+        points = history.series(metric, company, start_year, end_year)
+        meta = {"metric": metric, "unit": RANKING_METRICS[metric]["unit"], "company": company}
+        if len(points) > 1:
+            cagr = history.cagr(points[0][1], points[-1][1], points[-1][0] - points[0][0])
+            if cagr == cagr:
+                meta["cagr_pct"] = round(float(cagr) * 100, 1)
+        return ToolResult(tool=self.name, kind="ranking_series", meta=meta, columns=RANKING_SERIES_COLUMNS, rows=tuple(points))
+
+
+@register_renderer("ranking")
+def render_ranking(result: ToolResult) -> str:
+    """
+    Formatea un resultado de ranking en un texto legible.
+    """
+    ranking_type = result.meta["metric"]
+    metric = RANKING_METRICS[ranking_type]
+    
+    text = f"{result.meta['notice']}\n\n" if result.meta.get("notice") else ""
+    year = f" ({result.meta['year']})" if result.meta.get("year") else ""
+    text += f"TOP {len(result.rows)} EMPRESAS PERUANAS POR {ranking_type.upper()}{year}"
+    if result.meta.get("filter"):
+        # Ranking filtrado: los puestos son los del ranking completo
+        text += f" - {result.meta['filter']} ({result.meta['matches']} en el ranking)"
+    text += ":\n\n"
+    
+    for rank, name, value, sector in result.rows:
+        text += f"{rank}. {name}\n"
+        text += f"   {metric['label']}: {metric['display'].format(value)}\n"
+        if sector:
+            text += f"   Sector: {sector}\n"
+        text += "\n"
+        
+    text += "Nota: Datos simulados con fines demostrativos. Las cifras reales pueden variar."
+    
+    return text
+
+
+@register_renderer("company_profile")
+def render_company_profile(result: ToolResult) -> str:
+    """
+    Formatea el puesto de una empresa en los rankings.
+    """
+    sector = f" ({result.meta['sector']})" if result.meta.get("sector") else ""
+    text = f"{result.meta['company'].upper()}{sector}:\n\n"
+    for ranking_type, rank, total, value in result.rows:
+        metric = RANKING_METRICS[ranking_type]
+        text += f"- Ranking por {ranking_type}: puesto {rank} de {total} ({metric['label']}: {metric['display'].format(value)})\n"
+    if result.meta.get("absent"):
+        text += f"- No figura en el ranking por: {result.meta['absent']}\n"
+    
+    text += "\nNota: Datos simulados con fines demostrativos. Las cifras reales pueden variar."
+    return text
+
+
+@register_renderer("company_comparison")
+def render_company_comparison(result: ToolResult) -> str:
+    """
+    Formatea la comparación entre empresas con las cifras ya calculadas.
+    """
+    ranking_type = result.meta["metric"]
+    metric = RANKING_METRICS[ranking_type]
+    text = f"COMPARACIÓN POR {ranking_type.upper()}:\n\n"
+    for name, rank, value, source in result.rows:
+        origin = f"puesto {rank}" if rank else f"dato de {source}"
+        text += f"- {name}: {metric['display'].format(value)} ({origin})\n"
+    
+    first, second = result.rows[0][0], result.rows[1][0]
+    difference = result.meta["difference"]
+    amount = metric["display"].format(abs(difference))
+    if amount.endswith("+"):
+        # Cifras mínimas ("90,000+"): la diferencia se expresa en la unidad de la métrica
+        amount = f"{amount[:-1]} {ranking_type}"
+    text += f"\n{first} tiene {amount} {'más' if difference >= 0 else 'menos'} que {second}"
+    if result.meta.get("ratio") is not None:
+        text += f" ({result.meta['ratio']} veces; {result.meta['pct_diff']:+}%)"
+    text += ".\n\nNota: Datos simulados con fines demostrativos. Las cifras reales pueden variar."
+    return text
+
+
+@register_renderer("metric_share")
+def render_metric_share(result: ToolResult) -> str:
+    """
+    Formatea el porcentaje de unas empresas o sectores sobre un top o el total.
+    """
+    ranking_type = result.meta["metric"]
+    metric = RANKING_METRICS[ranking_type]
+    scope = result.meta["scope"]
+    scope_text = f"del {scope} por {ranking_type}" if scope != "total" else f"del total del ranking por {ranking_type}"
+    share = result.meta.get("share_pct")
+    text = (
+        f"{result.meta['part']} representa el {share if share is not None else 0}% {scope_text} "
+        f"({metric['display'].format(result.meta['part_value'])} de {metric['display'].format(result.meta['scope_value'])}).\n"
+    )
+    if result.rows:
+        text += "\n"
+        for rank, name, value, sector in result.rows:
+            sector_text = f" - {sector}" if sector else ""
+            text += f"{rank}. {name}: {metric['display'].format(value)}{sector_text}\n"
+    text += "\nNota: Datos simulados con fines demostrativos. Las cifras reales pueden variar."
+    return text
+
+
+# Nombre de cada estadística al presentarla
+SECTOR_STAT_LABELS = {"sum": "total", "mean": "promedio", "median": "mediana"}
+
+
+@register_renderer("sector_stats")
+def render_sector_stats(result: ToolResult) -> str:
+    """
+    Formatea las estadísticas por sector de una métrica.
+    """
+    ranking_type = result.meta["metric"]
+    metric = RANKING_METRICS[ranking_type]
+    stat = result.meta.get("stat")
+    
+    text = ""
+    if stat and len(result.rows) == 1:
+        record = result.records()[0]
+        if stat == "share":
+            answer = f"{record['share_pct']}% del total"
+        else:
+            label = SECTOR_STAT_LABELS.get(stat, f"percentil {stat[1:]}")
+            answer = f"{label} {metric['display'].format(record[stat])}"
+        text += f"{metric['label']} del sector {record['sector']}: {answer}.\n\n"
+    
+    text += f"ESTADÍSTICAS POR SECTOR ({ranking_type.upper()}):\n\n"
+    for record in result.records():
+        plural = "s" if record["companies"] != 1 else ""
+        text += f"- {record['sector']} ({record['companies']} empresa{plural}): "
+        text += f"total {metric['display'].format(record['sum'])}; "
+        text += f"promedio {metric['display'].format(record['mean'])}; "
+        text += f"mediana {metric['display'].format(record['median'])}"
+        for column in result.columns:
+            if column.startswith("p") and column[1:].isdigit():
+                text += f"; percentil {column[1:]} {metric['display'].format(record[column])}"
+        text += f"; {record['share_pct']}% del total\n"
+    if result.meta.get("absent"):
+        text += f"- Sin empresas en el ranking por {ranking_type}: {result.meta['absent']}\n"
+    
+    text += "\nLas empresas con varios sectores cuentan en cada uno de ellos."
+    text += "\nNota: Datos simulados con fines demostrativos. Las cifras reales pueden variar."
+    return text
+
+
+def _format_pct(value: Optional[float]) -> str:
+    return "s/d" if value is None else f"{value:+.1f}%"
+
+
+@register_renderer("ranking_change")
+def render_ranking_change(result: ToolResult) -> str:
+    """
+    Formatea la comparación de un ranking entre dos años.
+    """
+    ranking_type = result.meta["metric"]
+    metric = RANKING_METRICS[ranking_type]
+    start_year, end_year = result.meta["from"], result.meta["to"]
+    
+    if result.meta.get("sort") == "movers":
+        text = f"EMPRESAS QUE MÁS AVANZARON EN EL RANKING POR {ranking_type.upper()} ({start_year}-{end_year}):\n\n"
+    else:
+        text = f"CAMBIOS EN EL RANKING POR {ranking_type.upper()} ENTRE {start_year} Y {end_year}:\n\n"
+    
+    for name, rank_from, rank_to, value_from, value_to, change_pct, cagr_pct in result.rows:
+        places = rank_from - rank_to
+        movement = f"subió {places}" if places > 0 else f"bajó {-places}" if places < 0 else "sin cambios"
+        text += f"{rank_to}. {name} (puesto {rank_from} en {start_year}, {movement})\n"
+        text += f"   {metric['label']}: {metric['display'].format(value_from)} → {metric['display'].format(value_to)}"
+        text += f" ({_format_pct(change_pct)}; crecimiento anual compuesto {_format_pct(cagr_pct)})\n\n"
+    
+    text += "Nota: Datos simulados con fines demostrativos. Las cifras reales pueden variar."
+    return text
+
+
+@register_renderer("ranking_series")
+def render_ranking_series(result: ToolResult) -> str:
+    """
+    Formatea la evolución de una empresa en una métrica.
+    """
+    ranking_type = result.meta["metric"]
+    metric = RANKING_METRICS[ranking_type]
+    
+    text = f"EVOLUCIÓN DE {result.meta['company'].upper()} EN {ranking_type.upper()}:\n\n"
+    for year, value, rank in result.rows:
+        text += f"- {year}: {metric['display'].format(value)} (puesto {rank})\n"
+    if "cagr_pct" in result.meta:
+        text += f"\nCrecimiento anual compuesto: {_format_pct(result.meta['cagr_pct'])}\n"
+    
+    text += "\nNota: Datos simulados con fines demostrativos. Las cifras reales pueden variar."
+    return text
@@ -0,0 +1,455 @@
+from array import array
+from bisect import bisect_left, bisect_right
+import calendar
+import datetime
+from functools import lru_cache
+import re
+import unicodedata
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+# Operaciones de las consultas de fechas
+OP_UNTIL = "until"
+OP_SINCE = "since"
+OP_BETWEEN = "between"
+OP_COUNT = "count"
+OP_DATE = "date"
+
+# Feriados móviles: días respecto al Domingo de Pascua
+MOVABLE_HOLIDAYS: Dict[str, int] = {"Jueves Santo": -3, "Viernes Santo": -2}
+
+# Otros nombres de los feriados en las consultas
+HOLIDAY_ALIASES: Dict[str, str] = {
+    "fiestas patrias": "Día de la Independencia",
+    "independencia": "Día de la Independencia",
+    "santa rosa": "Día de Santa Rosa de Lima",
+    "todos los santos": "Día de Todos los Santos",
+    "inmaculada concepcion": "Día de la Inmaculada Concepción",
+    "dia del trabajador": "Día del Trabajo",
+    "san pedro y san pablo": "Día de San Pedro y San Pablo",
+    "angamos": "Combate de Angamos",
+    "semana santa": "Jueves Santo",
+}
+
+# Años cubiertos por la tabla alrededor del año en curso (se amplía si hace falta)
+CALENDAR_YEARS_AROUND = 30
+
+MONTHS = ("enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto",
+          "septiembre", "octubre", "noviembre", "diciembre")
+WEEKDAYS = ("lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo")
+NUMBER_WORDS = {
+    "un": 1, "una": 1, "uno": 1, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5, "seis": 6,
+    "siete": 7, "ocho": 8, "nueve": 9, "diez": 10, "quince": 15, "veinte": 20, "treinta": 30, "cien": 100,
+}
+_MONTH_NUMBERS = {**{name: i for i, name in enumerate(MONTHS, 1)}, "setiembre": 9}
+
+_NUM = r"(?:\d{1,4}|" + "|".join(NUMBER_WORDS) + r")"
+_MONTH = r"(?:" + "|".join(_MONTH_NUMBERS) + r")"
+_WEEKDAY = r"(?:" + "|".join(WEEKDAYS) + r")"
+_UNIT = r"(?:dias?|semanas?|mes(?:es)?|anos?)"
+_BUSINESS = r"(?:habiles|laborables|utiles)"
+
+# Expresiones que designan un periodo y no un día
+PERIOD_KINDS = ("month", "relperiod", "year")
+
+
+def fold(text: str) -> str:
+    """
+    Texto sin tildes, en minúsculas y con los espacios normalizados.
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.casefold().split())
+
+
+def easter_sunday(year: int) -> datetime.date:
+    """
+    Domingo de Pascua (algoritmo gregoriano anónimo).
+    """
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+class CalendarTable:
+    """
+    Tabla precalculada de días de un rango de años.
+
+    Guarda los feriados por ordinal y la suma acumulada de días hábiles
+    (lunes a viernes que no son feriado): contar los días hábiles de un
+    periodo son dos accesos a la tabla y sumar N días hábiles a una fecha es
+    una búsqueda binaria.
+    """
+
+    def __init__(self, first_year: int, last_year: int, holidays: Mapping[str, str]):
+        self.first_year = first_year
+        self.last_year = last_year
+        self.base = datetime.date(first_year, 1, 1).toordinal()
+        size = datetime.date(last_year, 12, 31).toordinal() - self.base + 1
+
+        # Feriados fijos ("MM-DD") y móviles (respecto a Pascua) de cada año
+        self.holidays: Dict[int, str] = {}
+        names = set(holidays.values())
+        for year in range(first_year, last_year + 1):
+            for key, name in holidays.items():
+                if name not in MOVABLE_HOLIDAYS:
+                    month, day = (int(part) for part in key.split("-"))
+                    self.holidays[datetime.date(year, month, day).toordinal()] = name
+            easter = easter_sunday(year).toordinal()
+            for name, offset in MOVABLE_HOLIDAYS.items():
+                if name in names:
+                    self.holidays[easter + offset] = name
+        self.holiday_ordinals = sorted(self.holidays)
+
+        # business[i] = días hábiles en [base, base + i)
+        self.business = array("l", [0]) * (size + 1)
+        weekday = datetime.date(first_year, 1, 1).weekday()
+        count = 0
+        for i in range(size):
+            if (weekday + i) % 7 < 5 and self.base + i not in self.holidays:
+                count += 1
+            self.business[i + 1] = count
+
+    def covers(self, *dates: datetime.date) -> bool:
+        return all(self.first_year <= value.year <= self.last_year for value in dates)
+
+    def _index(self, value: datetime.date) -> int:
+        return value.toordinal() - self.base
+
+    def is_business_day(self, value: datetime.date) -> bool:
+        i = self._index(value)
+        return self.business[i + 1] > self.business[i]
+
+    def business_days(self, start: datetime.date, end: datetime.date) -> int:
+        """
+        Días hábiles entre dos fechas, ambas incluidas.
+        """
+        if end < start:
+            return -self.business_days(end, start)
+        return self.business[self._index(end) + 1] - self.business[self._index(start)]
+
+    def add_business_days(self, value: datetime.date, days: int) -> datetime.date:
+        """
+        Fecha del día hábil número `days` después (o antes, si es negativo) de `value`.
+        """
+        i = self._index(value)
+        if days >= 0:
+            position = bisect_left(self.business, self.business[i + 1] + days) - 1
+        else:
+            position = bisect_right(self.business, self.business[i] + days) - 1
+        if not 0 <= position < len(self.business) - 1:
+            raise ValueError("La fecha resultante está fuera del calendario")
+        return datetime.date.fromordinal(self.base + position)
+
+    def holidays_between(self, start: datetime.date, end: datetime.date) -> List[Tuple[datetime.date, str]]:
+        first = bisect_left(self.holiday_ordinals, start.toordinal())
+        last = bisect_right(self.holiday_ordinals, end.toordinal())
+        return [
+            (datetime.date.fromordinal(ordinal), self.holidays[ordinal])
+            for ordinal in self.holiday_ordinals[first:last]
+        ]
+
+
+class DateQuery(NamedTuple):
+    """
+    Consulta de fechas ya interpretada: operación, expresiones de fecha (o de
+    periodo) y, para OP_DATE, un desplazamiento sobre la fecha base.
+    """
+    op: str
+    specs: Tuple[Tuple[Any, ...], ...]
+    business: bool = False
+    offset: Optional[Tuple[int, str, bool]] = None
+
+
+class DateParser:
+    """
+    Intérprete de expresiones de fecha en español.
+
+    Reconoce fechas absolutas ("28 de julio de 2027", "28/07", "2027-07-28"),
+    relativas ("mañana", "dentro de 3 semanas", "el próximo lunes"), feriados
+    por su nombre ("Navidad", "Fiestas Patrias") y periodos ("agosto", "este
+    mes", "2027"). Las expresiones se buscan con una única expresión regular
+    compilada; cada consulta se interpreta una vez y se guarda en caché.
+    """
+
+    def __init__(self, holidays: Mapping[str, str]):
+        self.holiday_names: Dict[str, str] = {fold(name): name for name in holidays.values()}
+        for alias, name in HOLIDAY_ALIASES.items():
+            if name in holidays.values():
+                self.holiday_names[alias] = name
+        holiday_pattern = "|".join(re.escape(alias) for alias in sorted(self.holiday_names, key=len, reverse=True))
+        year = r"(?:\s+(?:de|del|en)\s+(?:el\s+)?(?P<{0}>\d{{4}}))?"
+        self._atoms = re.compile(
+            r"\b(?:"
+            r"(?P<iso_y>\d{4})-(?P<iso_m>\d{1,2})-(?P<iso_d>\d{1,2})"
+            r"|(?P<sl_d>\d{1,2})/(?P<sl_m>\d{1,2})(?:/(?P<sl_y>\d{2,4}))?"
+            rf"|(?:el\s+)?(?P<dm_d>\d{{1,2}}|primero)\s+de\s+(?P<dm_m>{_MONTH})" + year.format("dm_y") +
+            r"|(?P<rel>pasado\s+manana|anteayer|antier|hoy|manana|ayer)"
+            rf"|(?P<sh_dir>dentro\s+de|en|hace)\s+(?P<sh_n>{_NUM})\s+(?P<sh_u>{_UNIT})(?:\s+(?P<sh_b>{_BUSINESS}))?"
+            rf"|(?P<hol>{holiday_pattern})" + year.format("hol_y") +
+            rf"|(?:(?P<wd_pre>proximo|siguiente|este|pasado)\s+)?(?P<wd>{_WEEKDAY})(?:\s+(?P<wd_post>que\s+viene|proximo|pasado|siguiente))?"
+            r"|(?P<pr_q>este|esta|proximo|proxima|siguiente)\s+(?P<pr_u>mes|semana|ano)"
+            rf"|(?P<pm_m>{_MONTH})" + year.format("pm_y") +
+            r"|(?P<py>(?:19|20)\d{2})"
+            r")\b"
+        )
+        self._offset = re.compile(
+            rf"\b(?P<n>{_NUM})\s+(?P<u>{_UNIT})(?:\s+(?P<b>{_BUSINESS}))?\s+(?P<dir>despues|antes|luego)\s+(?:de|del)\b"
+        )
+        self.parse = lru_cache(maxsize=1024)(self._parse)
+
+    def _parse(self, text: str) -> Optional[DateQuery]:
+        """
+        Interpreta una consulta (texto ya normalizado con `fold`) o devuelve None
+        si no pide un cálculo de fechas.
+        """
+        business = bool(re.search(rf"\bdias?\s+{_BUSINESS}\b", text))
+        offset_match = self._offset.search(text)
+        atoms_from = offset_match.end() if offset_match else 0
+        specs = tuple(self._spec(match) for match in self._atoms.finditer(text, atoms_from))
+        if not specs:
+            return None
+        dates = [spec for spec in specs if spec[0] not in PERIOD_KINDS]
+
+        if offset_match:
+            n = self._number(offset_match.group("n"))
+            sign = -1 if offset_match.group("dir") == "antes" else 1
+            offset = (sign * n, offset_match.group("u"), bool(offset_match.group("b")))
+            return DateQuery(OP_DATE, specs[:1], business, offset)
+        if len(specs) >= 2 and re.search(r"\b(entre\b.*\by|desde\b.*\b(hasta|al?)|del\b.*\bal)\b", text):
+            return DateQuery(OP_BETWEEN, specs[:2], business)
+        if dates and re.search(r"\b(faltan?|quedan?)\b", text):
+            return DateQuery(OP_UNTIL, (dates[0],), business)
+        if dates and re.search(r"\b(han pasado|ha pasado|transcurrid[oa]s?|desde)\b", text):
+            return DateQuery(OP_SINCE, (dates[0],), business)
+        if re.search(r"\bcuant[oa]s\s+dias\b", text) and specs[0][0] in PERIOD_KINDS:
+            return DateQuery(OP_COUNT, specs[:1], business)
+        if dates and re.search(r"\b(que dia|que fecha|cuando|cae|caera|cayo)\b", text):
+            return DateQuery(OP_DATE, (dates[0],), business)
+        return None
+
+    @staticmethod
+    def _number(word: str) -> int:
+        return int(word) if word.isdigit() else NUMBER_WORDS[word]
+
+    def _spec(self, match: "re.Match") -> Tuple[Any, ...]:
+        groups = match.groupdict()
+        year = next((int(groups[key]) for key in ("iso_y", "sl_y", "dm_y", "hol_y", "pm_y") if groups.get(key)), None)
+        if year is not None and year < 100:
+            year += 2000
+        if groups["iso_y"]:
+            return ("date", year, int(groups["iso_m"]), int(groups["iso_d"]))
+        if groups["sl_d"]:
+            return ("date", year, int(groups["sl_m"]), int(groups["sl_d"]))
+        if groups["dm_d"]:
+            day = 1 if groups["dm_d"] == "primero" else int(groups["dm_d"])
+            return ("date", year, _MONTH_NUMBERS[groups["dm_m"]], day)
+        if groups["rel"]:
+            offsets = {"hoy": 0, "manana": 1, "pasado manana": 2, "ayer": -1, "anteayer": -2, "antier": -2}
+            return ("today", offsets[" ".join(groups["rel"].split())])
+        if groups["sh_dir"]:
+            sign = -1 if groups["sh_dir"] == "hace" else 1
+            return ("shift", sign * self._number(groups["sh_n"]), groups["sh_u"], bool(groups["sh_b"]))
+        if groups["hol"]:
+            return ("holiday", self.holiday_names[groups["hol"]], year)
+        if groups["wd"]:
+            markers = (groups["wd_pre"], groups["wd_post"])
+            mode = "last" if "pasado" in markers else "next" if any(markers) and "este" not in markers else "this"
+            return ("weekday", WEEKDAYS.index(groups["wd"]), mode)
+        if groups["pr_u"]:
+            return ("relperiod", groups["pr_u"], 0 if groups["pr_q"] in ("este", "esta") else 1)
+        if groups["pm_m"]:
+            return ("month", year, _MONTH_NUMBERS[groups["pm_m"]])
+        return ("year", int(groups["py"]))
+
+
+def _add_months(value: datetime.date, months: int) -> datetime.date:
+    month = value.month - 1 + months
+    year, month = value.year + month // 12, month % 12 + 1
+    return datetime.date(year, month, min(value.day, calendar.monthrange(year, month)[1]))
+
+
+class DateCalculator:
+    """
+    Evalúa consultas de fechas en español sobre una `CalendarTable`.
+
+    `evaluate` resuelve una consulta respecto a la fecha de hoy y devuelve un
+    diccionario con las fechas en ISO y las cifras calculadas;
+    `evaluate_many` evalúa un lote de consultas con la misma tabla.
+    """
+
+    def __init__(self, holidays: Mapping[str, str]):
+        self.holiday_dates = dict(holidays)
+        self.parser = DateParser(holidays)
+        self.table: Optional[CalendarTable] = None
+
+    def parse(self, text: str) -> Optional[DateQuery]:
+        return self.parser.parse(fold(text))
+
+    def _table(self, *dates: datetime.date) -> CalendarTable:
+        table = self.table
+        if table is None or not table.covers(*dates):
+            years = [value.year for value in dates]
+            first = min(years) - CALENDAR_YEARS_AROUND
+            last = max(years) + CALENDAR_YEARS_AROUND
+            if table is not None:
+                first, last = min(first, table.first_year), max(last, table.last_year)
+            table = CalendarTable(max(first, 1), min(last, 9999), self.holiday_dates)
+            self.table = table
+        return table
+
+    def evaluate(self, text: str, today: datetime.date) -> Optional[Dict[str, Any]]:
+        """
+        Resultado de una consulta de fechas (None si no es una consulta de fechas).
+        """
+        query = self.parse(text)
+        return self.evaluate_query(query, today) if query is not None else None
+
+    def evaluate_many(self, texts: Sequence[str], today: datetime.date) -> List[Optional[Dict[str, Any]]]:
+        return [self.evaluate(text, today) for text in texts]
+
+    def evaluate_query(self, query: DateQuery, today: datetime.date) -> Dict[str, Any]:
+        table = self._table(today)
+        result: Dict[str, Any] = {"op": query.op, "today": today.isoformat(), "business": query.business}
+
+        if query.op == OP_COUNT:
+            start, end = self._period(query.specs[0], today)
+            table = self._table(start, end)
+            result.update(self._span(table, start, end))
+            result["holidays"] = [
+                (value.isoformat(), name) for value, name in table.holidays_between(start, end)
+            ]
+            return result
+
+        if query.op == OP_BETWEEN:
+            # Un periodo empieza en su primer día y termina en el último ("entre enero y marzo")
+            start = self._bounds(query.specs[0], today)[0]
+            end = self._bounds(query.specs[1], today, after=start)[1]
+            table = self._table(start, end)
+            result.update(self._span(table, start, end))
+            # Días de diferencia entre las fechas; los hábiles incluyen ambos extremos
+            result["days"] = abs((end - start).days)
+            return result
+
+        value = self._bounds(query.specs[0], today, past=query.op == OP_SINCE)[0]
+        if query.offset:
+            amount, unit, business = query.offset
+            value = self._shift(self._table(value), value, amount, unit, business)
+        table = self._table(value, today)
+        result["date"] = value.isoformat()
+        result["weekday"] = value.weekday()
+        result["holiday"] = table.holidays.get(value.toordinal())
+        result["business_day"] = table.is_business_day(value)
+        if query.op in (OP_UNTIL, OP_SINCE):
+            result["days"] = abs((value - today).days)
+            # Días hábiles desde mañana hasta la fecha (o desde la fecha hasta ayer)
+            if value > today:
+                result["business_days"] = table.business_days(today + datetime.timedelta(days=1), value)
+            elif value < today:
+                result["business_days"] = table.business_days(value, today - datetime.timedelta(days=1))
+            else:
+                result["business_days"] = 0
+            result["past"] = value < today
+        return result
+
+    @staticmethod
+    def _span(table: CalendarTable, start: datetime.date, end: datetime.date) -> Dict[str, Any]:
+        if end < start:
+            start, end = end, start
+        return {
+            "start": start.isoformat(), "end": end.isoformat(),
+            "days": (end - start).days + 1, "business_days": table.business_days(start, end),
+        }
+
+    def _bounds(self, spec: Tuple[Any, ...], today: datetime.date, after: Optional[datetime.date] = None,
+                past: bool = False) -> Tuple[datetime.date, datetime.date]:
+        """
+        Primer y último día de una expresión (el mismo día si no es un periodo).
+        """
+        if spec[0] in PERIOD_KINDS:
+            return self._period(spec, today)
+        value = self._resolve(spec, today, after, past)
+        return value, value
+
+    def _resolve(self, spec: Tuple[Any, ...], today: datetime.date,
+                 after: Optional[datetime.date] = None, past: bool = False) -> datetime.date:
+        """
+        Fecha de una expresión. Las fechas sin año son la próxima ocurrencia a
+        partir de hoy (o de `after`, para el final de un intervalo); con `past`,
+        la última ocurrencia hasta hoy ("desde el 1 de enero").
+        """
+        reference = after or today
+        kind = spec[0]
+        if kind == "date":
+            _, year, month, day = spec
+            return self._occurrence(lambda y: datetime.date(y, month, day), year, reference, past)
+        if kind == "holiday":
+            _, name, year = spec
+            return self._occurrence(lambda y: self._holiday_date(name, y), year, reference, past)
+        if kind == "today":
+            return today + datetime.timedelta(days=spec[1])
+        if kind == "shift":
+            _, amount, unit, business = spec
+            return self._shift(self._table(today), today, amount, unit, business)
+        if kind == "weekday":
+            _, weekday, mode = spec
+            ahead = (weekday - today.weekday()) % 7
+            if mode == "next" and ahead == 0:
+                ahead = 7
+            if mode == "last":
+                return today - datetime.timedelta(days=(today.weekday() - weekday) % 7 or 7)
+            return today + datetime.timedelta(days=ahead)
+        raise ValueError(f"Expresión de fecha desconocida: {kind}")
+
+    @staticmethod
+    def _occurrence(build: Any, year: Optional[int], reference: datetime.date, past: bool) -> datetime.date:
+        if year is not None:
+            return build(year)
+        value = build(reference.year)
+        if past:
+            return value if value <= reference else build(reference.year - 1)
+        return value if value >= reference else build(reference.year + 1)
+
+    def _holiday_date(self, name: str, year: int) -> datetime.date:
+        if name in MOVABLE_HOLIDAYS:
+            return easter_sunday(year) + datetime.timedelta(days=MOVABLE_HOLIDAYS[name])
+        key = next(key for key, holiday in self.holiday_dates.items() if holiday == name)
+        month, day = (int(part) for part in key.split("-"))
+        return datetime.date(year, month, day)
+
+    @staticmethod
+    def _shift(table: CalendarTable, value: datetime.date, amount: int, unit: str, business: bool) -> datetime.date:
+        if unit.startswith("dia"):
+            return table.add_business_days(value, amount) if business else value + datetime.timedelta(days=amount)
+        if unit.startswith("semana"):
+            return value + datetime.timedelta(weeks=amount)
+        if unit.startswith("mes"):
+            return _add_months(value, amount)
+        return _add_months(value, 12 * amount)
+
+    @staticmethod
+    def _period(spec: Tuple[Any, ...], today: datetime.date) -> Tuple[datetime.date, datetime.date]:
+        kind = spec[0]
+        if kind == "month":
+            _, year, month = spec
+            if year is None:
+                year = today.year if month >= today.month else today.year + 1
+            return datetime.date(year, month, 1), datetime.date(year, month, calendar.monthrange(year, month)[1])
+        if kind == "year":
+            return datetime.date(spec[1], 1, 1), datetime.date(spec[1], 12, 31)
+        if kind == "relperiod":
+            _, unit, offset = spec
+            if unit == "semana":
+                start = today - datetime.timedelta(days=today.weekday()) + datetime.timedelta(weeks=offset)
+                return start, start + datetime.timedelta(days=6)
+            if unit == "mes":
+                start = _add_months(today.replace(day=1), offset)
+                return start, start.replace(day=calendar.monthrange(start.year, start.month)[1])
+            return datetime.date(today.year + offset, 1, 1), datetime.date(today.year + offset, 12, 31)
+        raise ValueError(f"La expresión no es un periodo: {kind}")
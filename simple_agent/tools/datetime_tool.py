@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 import datetime
 import pytz
 import re
@@ -6,10 +6,69 @@ import logging
 from typing import Dict, List, Optional, Any, ClassVar
 
 from .base import SimpleTool
+from .results import ToolResult, register_renderer
+from .date_expressions import OP_BETWEEN, OP_COUNT, OP_SINCE, OP_UNTIL, DateCalculator, fold
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Traducción de días y meses al español
+SPANISH_DAYS: Dict[str, str] = {
+    "Monday": "Lunes",
+    "Tuesday": "Martes",
+    "Wednesday": "Miércoles",
+    "Thursday": "Jueves",
+    "Friday": "Viernes",
+    "Saturday": "Sábado",
+    "Sunday": "Domingo"
+}
+
+SPANISH_MONTHS: Dict[str, str] = {
+    "January": "enero",
+    "February": "febrero",
+    "March": "marzo",
+    "April": "abril",
+    "May": "mayo",
+    "June": "junio",
+    "July": "julio",
+    "August": "agosto",
+    "September": "septiembre",
+    "October": "octubre",
+    "November": "noviembre",
+    "December": "diciembre"
+}
+
+# Ciudades mostradas cuando se pide la hora sin indicar una ciudad
+WORLD_CLOCK_CITIES: Dict[str, str] = {
+    "Lima": "America/Lima",
+    "Nueva York": "America/New_York",
+    "Londres": "Europe/London",
+    "Madrid": "Europe/Madrid",
+    "Tokio": "Asia/Tokyo",
+    "Sydney": "Australia/Sydney"
+}
+
+# Separadores de varias preguntas en un mismo mensaje (evaluación por lotes)
+QUESTION_SEPARATOR = re.compile(r"[?;\n]+")
+
+# Planificación de reuniones entre ciudades: intención, duración y periodo
+MEETING_PATTERN = re.compile(r"(reuni[oó]n|reunirnos|reunirse|meeting|llamada|videollamada|agendar|coordinar|horario com[uú]n)")
+DURATION_PATTERN = re.compile(r"(\d+)\s*(min|minutos|h|horas?)\b")
+NEXT_WEEK_PATTERN = re.compile(r"(pr[oó]xima semana|semana que viene|siguiente semana)")
+MEETING_DAYS = 7
+
+# Intenciones reconocidas; una consulta sin intención recibe la fecha y hora
+# actuales como contexto, pero no como respuesta final
+INTENT_MEETING = "meeting"
+INTENT_DATE_CALC = "date_calc"
+INTENT_HOLIDAY = "holiday"
+INTENT_TIMEZONE = "timezone"
+INTENT_DATETIME = "datetime"
+EXPLICIT_DATETIME_PATTERN = re.compile(r"\b(hora|fecha)\b")
+
+# Días de la semana abreviados (lunes = 0)
+SPANISH_WEEKDAY_ABBR = ("lun", "mar", "mié", "jue", "vie", "sáb", "dom")
+
 class DateTimeInput(BaseModel):
     """
     Modelo para la entrada de la herramienta de fecha y hora.
@@ -29,6 +88,7 @@ class DateTimeTool(SimpleTool):
         description="Descripción de la herramienta"
     )
     args_schema: ClassVar[type] = DateTimeInput
+    speculative: ClassVar[bool] = True
     
     # Ciudades principales de Perú con sus zonas horarias
     PERU_CITIES: Dict[str, str] = {
@@ -55,7 +115,25 @@ class DateTimeTool(SimpleTool):
         "tokio": "Asia/Tokyo",
         "sydney": "Australia/Sydney",
         "beijing": "Asia/Shanghai",
-        "río de janeiro": "America/Sao_Paulo"
+        "río de janeiro": "America/Sao_Paulo",
+        "são paulo": "America/Sao_Paulo",
+        "bogotá": "America/Bogota",
+        "ciudad de méxico": "America/Mexico_City",
+        "buenos aires": "America/Argentina/Buenos_Aires",
+        "santiago": "America/Santiago",
+        "chicago": "America/Chicago",
+        "toronto": "America/Toronto",
+        "miami": "America/New_York",
+        "san francisco": "America/Los_Angeles",
+        "roma": "Europe/Rome",
+        "lisboa": "Europe/Lisbon",
+        "ámsterdam": "Europe/Amsterdam",
+        "moscú": "Europe/Moscow",
+        "dubái": "Asia/Dubai",
+        "bombay": "Asia/Kolkata",
+        "singapur": "Asia/Singapore",
+        "hong kong": "Asia/Hong_Kong",
+        "seúl": "Asia/Seoul"
     }
     
     # Días festivos en Perú (simplificado para demostración)
@@ -75,23 +153,81 @@ class DateTimeTool(SimpleTool):
         "12-25": "Navidad"
     }
     
-    def run(self, input_str: str) -> str:
+    # Intérprete de expresiones de fecha y tabla de calendario (se crean en la primera consulta)
+    _dates: Optional[DateCalculator] = PrivateAttr(default=None)
+    
+    def run_structured(self, input_str: str) -> ToolResult:
         """
         Proporciona información sobre fecha y hora actual.
         """
         try:
             # Identificar el tipo de consulta
-            if self._is_holiday_query(input_str):
+            intent = self._query_intent(input_str)
+            if intent == INTENT_MEETING:
+                # Mejor horario para una reunión entre varias ciudades
+                result = self._get_meeting_plan(input_str)
+                if result is not None:
+                    return result
+            elif intent == INTENT_DATE_CALC:
+                # Cálculos con fechas: días que faltan, día de la semana, días hábiles
+                result = self._get_date_calculation(input_str)
+                if result is not None:
+                    return result
+            elif intent == INTENT_HOLIDAY:
                 return self._get_holiday_info()
-            elif self._is_timezone_query(input_str):
+            elif intent == INTENT_TIMEZONE:
                 return self._get_timezone_info(input_str)
-            else:
-                # Por defecto, mostrar fecha y hora actual
-                return self._get_current_datetime()
+            
+            # Por defecto, mostrar fecha y hora actual
+            return self._get_current_datetime()
                 
         except Exception as e:
-            logger.error(f"Error en herramienta de fecha/hora: {str(e)}")
-            return "No pude obtener la información de fecha y hora solicitada."
+            logger.error("Error en herramienta de fecha/hora: %s", e)
+            return ToolResult.message(self.name, "No pude obtener la información de fecha y hora solicitada.")
+    
+    def is_final_answer(self, input_str: str) -> bool:
+        """
+        Las consultas directas de fecha, hora, feriados, zona horaria, cálculos
+        con fechas o reuniones se responden tal cual con la salida de la
+        herramienta. La fecha y hora actuales que se devuelven por defecto a
+        una consulta no reconocida nunca son la respuesta final.
+        """
+        return self._is_pure_lookup(input_str) and self._query_intent(input_str) is not None
+    
+    def _query_intent(self, text: str) -> Optional[str]:
+        """
+        Intención reconocida de la consulta, o None si no se reconoce ninguna.
+        """
+        text_lower = text.lower()
+        meeting = bool(MEETING_PATTERN.search(text_lower))
+        if meeting and self._find_cities(text):
+            return INTENT_MEETING
+        if self._has_date_question(text):
+            return INTENT_DATE_CALC
+        if self._is_holiday_query(text):
+            return INTENT_HOLIDAY
+        if self._is_timezone_query(text):
+            return INTENT_TIMEZONE
+        if not meeting and EXPLICIT_DATETIME_PATTERN.search(text_lower):
+            return INTENT_DATETIME
+        return None
+    
+    def _has_date_question(self, text: str) -> bool:
+        """
+        Indica si alguna pregunta del mensaje es un cálculo de fechas (la
+        interpretación se guarda en caché y se reutiliza al evaluarla).
+        """
+        calculator = self._get_date_calculator()
+        for question in QUESTION_SEPARATOR.split(text):
+            if not question.strip():
+                continue
+            try:
+                if calculator.parse(question) is not None:
+                    return True
+            except ValueError:
+                # Fecha imposible: la herramienta responde que no la reconoce
+                return True
+        return False
     
     def _is_holiday_query(self, text: str) -> bool:
         """
@@ -115,64 +251,134 @@ class DateTimeTool(SimpleTool):
         
         return any(keyword in text.lower() for keyword in timezone_keywords)
     
-    def _get_current_datetime(self) -> str:
+    def _find_cities(self, text: str) -> Dict[str, str]:
         """
-        Obtiene la fecha y hora actual en Perú.
+        Ciudades conocidas mencionadas en el texto, en orden de aparición, con su zona horaria.
         """
-        # Usar zona horaria de Perú por defecto
+        folded = fold(text)
+        found = []
+        for city, timezone in {**self.PERU_CITIES, **self.INTERNATIONAL_TIMEZONES}.items():
+            match = re.search(rf"\b{re.escape(fold(city))}\b", folded)
+            if match:
+                found.append((match.start(), _city_name(city), timezone))
+        return {name: timezone for _, name, timezone in sorted(found)}
+    
+    def _get_meeting_plan(self, query: str) -> Optional[ToolResult]:
+        """
+        Propone horarios para una reunión entre las ciudades mencionadas ("mejor
+        hora para una reunión entre Lima, Madrid y Tokio esta semana"). Devuelve
+        None si el mensaje no menciona ciudades.
+        """
+        cities = self._find_cities(query)
+        if not cities:
+            return None
+        if len(cities) == 1 and "Lima" not in cities:
+            # Con una sola ciudad, la reunión es con Perú
+            cities = {"Lima": "America/Lima", **cities}
+        if len(cities) < 2:
+            return ToolResult.message(self.name, "¿Entre qué ciudades quieres coordinar la reunión?")
+        
+        text_lower = query.lower()
+        duration = 60
+        if "media hora" in text_lower:
+            duration = 30
+        elif "hora y media" in text_lower:
+            duration = 90
+        else:
+            match = DURATION_PATTERN.search(text_lower)
+            if match:
+                duration = int(match.group(1)) * (1 if match.group(2).startswith("min") else 60)
+        
+        # Periodo: los próximos 7 días, la próxima semana (lunes a domingo) o mañana
         peru_tz = pytz.timezone("America/Lima")
         now = datetime.datetime.now(peru_tz)
+        midnight = peru_tz.localize(datetime.datetime.combine(now.date(), datetime.time()))
+        days = MEETING_DAYS
+        if NEXT_WEEK_PATTERN.search(text_lower):
+            start = midnight + datetime.timedelta(days=7 - now.weekday())
+        elif re.search(r"\bmañana\b", text_lower) and "pasado mañana" not in text_lower:
+            start, days = midnight + datetime.timedelta(days=1), 1
+        else:
+            start = now
+        end = peru_tz.normalize(midnight + datetime.timedelta(days=(start.date() - now.date()).days + days))
         
-        # Formatear fecha y hora
-        date_str = now.strftime("%A %d de %B de %Y")
-        time_str = now.strftime("%H:%M:%S")
+        from .meeting_planner import BUSINESS_END_HOUR, BUSINESS_START_HOUR, MeetingPlanner
+        slots = MeetingPlanner().plan(cities, start, end, duration_minutes=duration)
+        if not slots:
+            return ToolResult.message(self.name, "No encontré horarios disponibles en ese periodo.")
         
-        # Traducir día y mes al español
-        spanish_days = {
-            "Monday": "Lunes",
-            "Tuesday": "Martes",
-            "Wednesday": "Miércoles",
-            "Thursday": "Jueves",
-            "Friday": "Viernes",
-            "Saturday": "Sábado",
-            "Sunday": "Domingo"
-        }
-        
-        spanish_months = {
-            "January": "enero",
-            "February": "febrero",
-            "March": "marzo",
-            "April": "abril",
-            "May": "mayo",
-            "June": "junio",
-            "July": "julio",
-            "August": "agosto",
-            "September": "septiembre",
-            "October": "octubre",
-            "November": "noviembre",
-            "December": "diciembre"
-        }
+        rows = []
+        for slot in slots:
+            local = [
+                f"{SPANISH_WEEKDAY_ABBR[value.weekday()]} {value.day:02d}/{value.month:02d} {value:%H:%M}"
+                for value in slot["local"].values()
+            ]
+            rows.append((slot["start"].strftime("%Y-%m-%dT%H:%MZ"), slot["cities_ok"], ", ".join(slot["outside"]), *local))
+        return ToolResult(
+            tool=self.name,
+            kind="meeting_plan",
+            meta={
+                "cities": ", ".join(cities), "duration_min": duration,
+                "from": start.date().isoformat(), "to": (end - datetime.timedelta(days=1)).date().isoformat(),
+                "hours": f"{BUSINESS_START_HOUR:02d}:00-{BUSINESS_END_HOUR:02d}:00",
+                "all_ok": slots[0]["cities_ok"] == len(cities),
+            },
+            columns=("utc", "cities_ok", "outside", *cities),
+            rows=tuple(rows)
+        )
+    
+    def _get_date_calculator(self) -> DateCalculator:
+        if self._dates is None:
+            self._dates = DateCalculator(self.PERU_HOLIDAYS)
+        return self._dates
+    
+    def _get_date_calculation(self, query: str) -> Optional[ToolResult]:
+        """
+        Resuelve las preguntas de fechas del mensaje ("¿cuántos días faltan para
+        el 28 de julio?", "¿qué día cae Navidad en 2027?", "¿cuántos días hábiles
+        hay en agosto?"). Varias preguntas se evalúan juntas y se devuelven en un
+        grupo. Devuelve None si el mensaje no pide ningún cálculo de fechas.
+        """
+        calculator = self._get_date_calculator()
+        questions = [part for part in QUESTION_SEPARATOR.split(query) if part.strip()]
+        today = datetime.datetime.now(pytz.timezone("America/Lima")).date()
+        try:
+            results = [result for result in calculator.evaluate_many(questions, today) if result is not None]
+        except ValueError as e:
+            logger.warning("Fecha no válida en la consulta (%d caracteres): %s", len(query), e)
+            return ToolResult.message(self.name, "No reconozco esa fecha. Prueba con un formato como \"28 de julio de 2027\".")
+        if not results:
+            return None
         
-        for english, spanish in spanish_days.items():
-            date_str = date_str.replace(english, spanish)
-            
-        for english, spanish in spanish_months.items():
-            date_str = date_str.replace(english, spanish)
+        parts = []
+        for result in results:
+            holidays = result.pop("holidays", ())
+            if "weekday" in result:
+                result["weekday"] = list(SPANISH_DAYS.values())[result["weekday"]].lower()
+            parts.append(ToolResult(
+                tool=self.name, kind="date_calc", meta=result,
+                columns=("date", "name") if holidays else (), rows=tuple(holidays)
+            ))
+        return parts[0] if len(parts) == 1 else ToolResult.group(self.name, parts)
+    
+    def _get_current_datetime(self) -> ToolResult:
+        """
+        Obtiene la fecha y hora actual en Perú.
+        """
+        # Usar zona horaria de Perú por defecto
+        peru_tz = pytz.timezone("America/Lima")
+        now = datetime.datetime.now(peru_tz)
         
         # Verificar si es un día festivo
-        month_day = now.strftime("%m-%d")
-        holiday = self.PERU_HOLIDAYS.get(month_day)
-        holiday_info = f"\nHoy es {holiday}." if holiday else ""
+        holiday = self.PERU_HOLIDAYS.get(now.strftime("%m-%d"))
         
-        return f"""Fecha y hora actual en Perú:
-        
-Fecha: {date_str}
-Hora: {time_str} (UTC-5, hora de Perú){holiday_info}
-
-Zona horaria: América/Lima (GMT-5)
-"""
+        return ToolResult(
+            tool=self.name,
+            kind="datetime",
+            meta={"now": now.isoformat(timespec="seconds"), "tz": "America/Lima", "holiday": holiday}
+        )
     
-    def _get_holiday_info(self) -> str:
+    def _get_holiday_info(self) -> ToolResult:
         """
         Obtiene información sobre días festivos en Perú.
         """
@@ -180,7 +386,6 @@ Zona horaria: América/Lima (GMT-5)
         peru_tz = pytz.timezone("America/Lima")
         now = datetime.datetime.now(peru_tz)
         current_date = now.strftime("%m-%d")
-        current_month = now.strftime("%m")
         
         # Verificar si hoy es un día festivo
         today_holiday = self.PERU_HOLIDAYS.get(current_date)
@@ -188,60 +393,26 @@ Zona horaria: América/Lima (GMT-5)
         # Encontrar próximos días festivos
         upcoming_holidays = []
         for date_str, holiday_name in self.PERU_HOLIDAYS.items():
-            month = date_str.split("-")[0]
-            day = date_str.split("-")[1]
-            
-            # Si el mes es posterior al actual o es el mismo mes pero día posterior
-            if (month > current_month) or (month == current_month and day > now.strftime("%d")):
-                # Crear fecha para este año
-                holiday_date = datetime.datetime(now.year, int(month), int(day))
+            # Feriados posteriores a hoy en el año en curso
+            if date_str > current_date:
+                month, day = date_str.split("-")
+                holiday_date = datetime.date(now.year, int(month), int(day))
                 # Calcular días restantes
-                days_remaining = (holiday_date - now.replace(tzinfo=None)).days
-                
-                upcoming_holidays.append({
-                    "name": holiday_name,
-                    "date": holiday_date.strftime("%d de %B"),
-                    "days_remaining": days_remaining
-                })
+                days_remaining = (holiday_date - now.date()).days
+                upcoming_holidays.append((holiday_date.isoformat(), holiday_name, days_remaining))
         
         # Ordenar por proximidad
-        upcoming_holidays.sort(key=lambda x: x["days_remaining"])
+        upcoming_holidays.sort(key=lambda holiday: holiday[2])
         
-        # Construir respuesta
-        result = "DÍAS FESTIVOS EN PERÚ\n\n"
-        
-        if today_holiday:
-            result += f"HOY ES FERIADO: {today_holiday}\n\n"
-            
-        result += "Próximos días festivos:\n"
-        
-        for i, holiday in enumerate(upcoming_holidays[:5], 1):
-            # Traducir mes al español
-            date_str = holiday["date"]
-            for english, spanish in {
-                "January": "enero",
-                "February": "febrero",
-                "March": "marzo",
-                "April": "abril",
-                "May": "mayo",
-                "June": "junio",
-                "July": "julio",
-                "August": "agosto",
-                "September": "septiembre",
-                "October": "octubre",
-                "November": "noviembre",
-                "December": "diciembre"
-            }.items():
-                date_str = date_str.replace(english, spanish)
-                
-            result += f"{i}. {holiday['name']} - {date_str} "
-            result += f"(en {holiday['days_remaining']} días)\n"
-            
-        result += "\nNota: Esta información puede no incluir feriados regionales o no laborables específicos."
-        
-        return result
+        return ToolResult(
+            tool=self.name,
+            kind="holidays",
+            meta={"today": now.date().isoformat(), "today_holiday": today_holiday},
+            columns=("date", "name", "days"),
+            rows=tuple(upcoming_holidays[:5])
+        )
     
-    def _get_timezone_info(self, query: str) -> str:
+    def _get_timezone_info(self, query: str) -> ToolResult:
         """
         Obtiene información sobre las zonas horarias mencionadas.
         """
@@ -256,73 +427,33 @@ Zona horaria: América/Lima (GMT-5)
         timezone_str = self._get_timezone_for_city(city)
         
         if not timezone_str:
-            return f"No pude encontrar información sobre la zona horaria de '{city}'. Puedo proporcionar información sobre ciudades principales de Perú y del mundo."
+            return ToolResult.message(self.name, f"No pude encontrar información sobre la zona horaria de '{city}'. Puedo proporcionar información sobre ciudades principales de Perú y del mundo.")
         
         # Mostrar la hora actual en esa zona horaria
         try:
-            timezone = pytz.timezone(timezone_str)
-            now = datetime.datetime.now(timezone)
-            
-            # Formatear fecha y hora
-            date_str = now.strftime("%A %d de %B de %Y")
-            time_str = now.strftime("%H:%M:%S")
+            now = datetime.datetime.now(pytz.timezone(timezone_str))
             
-            # Traducir día y mes al español
-            spanish_days = {
-                "Monday": "Lunes",
-                "Tuesday": "Martes",
-                "Wednesday": "Miércoles",
-                "Thursday": "Jueves",
-                "Friday": "Viernes",
-                "Saturday": "Sábado",
-                "Sunday": "Domingo"
-            }
-            
-            spanish_months = {
-                "January": "enero",
-                "February": "febrero",
-                "March": "marzo",
-                "April": "abril",
-                "May": "mayo",
-                "June": "junio",
-                "July": "julio",
-                "August": "agosto",
-                "September": "septiembre",
-                "October": "octubre",
-                "November": "noviembre",
-                "December": "diciembre"
-            }
-            
-            for english, spanish in spanish_days.items():
-                date_str = date_str.replace(english, spanish)
-                
-            for english, spanish in spanish_months.items():
-                date_str = date_str.replace(english, spanish)
-                
-            # Obtener diferencia con hora de Perú
-            peru_time = datetime.datetime.now(pytz.timezone("America/Lima"))
-            time_diff = (now.hour - peru_time.hour) % 24
-            
-            diff_str = ""
-            if time_diff > 0:
-                diff_str = f"{time_diff} horas más que en Perú"
-            elif time_diff < 0:
-                diff_str = f"{abs(time_diff)} horas menos que en Perú"
-            else:
-                diff_str = "misma hora que en Perú"
-            
-            city = city.capitalize()
-            return f"""Fecha y hora actual en {city}:
-            
-Fecha: {date_str}
-Hora: {time_str} ({diff_str})
-
-Zona horaria: {timezone_str}
-"""
+            return ToolResult(
+                tool=self.name,
+                kind="datetime",
+                meta={
+                    "now": now.isoformat(timespec="seconds"),
+                    "tz": timezone_str,
+                    "city": city.capitalize(),
+                    "diff_h": self._offset_from_peru(now)
+                }
+            )
             
         except Exception as e:
-            logger.error(f"Error obteniendo hora para {city}: {str(e)}")
-            return f"No pude obtener la hora actual para {city}."
+            logger.error("Error obteniendo hora para %s: %s", city, e)
+            return ToolResult.message(self.name, f"No pude obtener la hora actual para {city}.")
+    
+    def _offset_from_peru(self, now: datetime.datetime) -> float:
+        """
+        Diferencia en horas entre la zona horaria de `now` y la de Perú.
+        """
+        peru_time = now.astimezone(pytz.timezone("America/Lima"))
+        return (now.utcoffset() - peru_time.utcoffset()).total_seconds() / 3600
     
     def _extract_location(self, text: str) -> str:
         """
@@ -365,50 +496,188 @@ Zona horaria: {timezone_str}
                 
         return None
     
-    def _get_multiple_timezones(self) -> str:
+    def _get_multiple_timezones(self) -> ToolResult:
         """
         Muestra la hora actual en diferentes zonas horarias.
         """
-        result = "HORA ACTUAL EN DIFERENTES CIUDADES\n\n"
-        
-        # Seleccionar algunas ciudades importantes
-        selected_cities = {
-            "Lima": "America/Lima",
-            "Nueva York": "America/New_York",
-            "Londres": "Europe/London",
-            "Madrid": "Europe/Madrid",
-            "Tokio": "Asia/Tokyo",
-            "Sydney": "Australia/Sydney"
-        }
-        
-        # Obtener la hora actual en Perú como referencia
-        peru_time = datetime.datetime.now(pytz.timezone("America/Lima"))
+        rows = []
         
         # Mostrar hora para cada ciudad
-        for city, timezone_str in selected_cities.items():
+        for city, timezone_str in WORLD_CLOCK_CITIES.items():
             try:
-                timezone = pytz.timezone(timezone_str)
-                now = datetime.datetime.now(timezone)
-                time_str = now.strftime("%H:%M")
-                
-                # Calcular diferencia con Perú
-                time_diff = (now.hour - peru_time.hour) % 24
-                
-                diff_str = ""
-                if city == "Lima":
-                    diff_str = "(hora local)"
-                elif time_diff > 0:
-                    diff_str = f"(+{time_diff}h)"
-                elif time_diff < 0:
-                    diff_str = f"(-{abs(time_diff)}h)"
-                else:
-                    diff_str = "(=h)"
-                
-                result += f"{city}: {time_str} {diff_str}\n"
+                now = datetime.datetime.now(pytz.timezone(timezone_str))
+                rows.append((city, now.strftime("%H:%M"), self._offset_from_peru(now)))
                 
             except Exception as e:
-                logger.error(f"Error obteniendo hora para {city}: {str(e)}")
+                logger.error("Error obteniendo hora para %s: %s", city, e)
         
-        result += "\nPuedes preguntar por la hora en una ciudad específica para más detalles."
+        return ToolResult(tool=self.name, kind="world_clock", columns=("city", "time", "diff_h"), rows=tuple(rows))
+
+
+def _spanish_date(value: datetime.date, pattern: str) -> str:
+    """
+    Formatea una fecha con nombres de día y mes en español.
+    """
+    text = value.strftime(pattern)
+    for english, spanish in {**SPANISH_DAYS, **SPANISH_MONTHS}.items():
+        text = text.replace(english, spanish)
+    return text
+
+
+def _city_name(city: str) -> str:
+    # "nueva york" -> "Nueva York", "río de janeiro" -> "Río de Janeiro"
+    return " ".join(word if word in ("de", "del") else word.capitalize() for word in city.split())
+
+
+def _format_hours(hours: float) -> str:
+    return f"{hours:g}"
+
+
+@register_renderer("datetime")
+def render_datetime(result: ToolResult) -> str:
+    """
+    Presenta la fecha y hora actual de Perú o de la ciudad consultada.
+    """
+    now = datetime.datetime.fromisoformat(result.meta["now"])
+    date_str = _spanish_date(now, "%A %d de %B de %Y")
+    time_str = now.strftime("%H:%M:%S")
+    
+    city = result.meta.get("city")
+    if not city:
+        holiday = result.meta.get("holiday")
+        holiday_info = f"\nHoy es {holiday}." if holiday else ""
+        return f"""Fecha y hora actual en Perú:
+
+Fecha: {date_str}
+Hora: {time_str} (UTC-5, hora de Perú){holiday_info}
+
+Zona horaria: América/Lima (GMT-5)
+"""
+    
+    time_diff = result.meta.get("diff_h", 0)
+    if time_diff > 0:
+        diff_str = f"{_format_hours(time_diff)} horas más que en Perú"
+    elif time_diff < 0:
+        diff_str = f"{_format_hours(abs(time_diff))} horas menos que en Perú"
+    else:
+        diff_str = "misma hora que en Perú"
+    
+    return f"""Fecha y hora actual en {city}:
+
+Fecha: {date_str}
+Hora: {time_str} ({diff_str})
+
+Zona horaria: {result.meta["tz"]}
+"""
+
+
+@register_renderer("holidays")
+def render_holidays(result: ToolResult) -> str:
+    """
+    Presenta los próximos días festivos en Perú.
+    """
+    text = "DÍAS FESTIVOS EN PERÚ\n\n"
+    
+    if result.meta.get("today_holiday"):
+        text += f"HOY ES FERIADO: {result.meta['today_holiday']}\n\n"
+        
+    text += "Próximos días festivos:\n"
+    
+    for i, (date_iso, name, days_remaining) in enumerate(result.rows, 1):
+        date_str = _spanish_date(datetime.date.fromisoformat(date_iso), "%d de %B")
+        text += f"{i}. {name} - {date_str} "
+        text += f"(en {days_remaining} días)\n"
         
-        return result
\ No newline at end of file
+    text += "\nNota: Esta información puede no incluir feriados regionales o no laborables específicos."
+    
+    return text
+
+
+def _long_date(date_iso: str) -> str:
+    return _spanish_date(datetime.date.fromisoformat(date_iso), "%A %d de %B de %Y").lower()
+
+
+@register_renderer("date_calc")
+def render_date_calc(result: ToolResult) -> str:
+    """
+    Presenta el resultado de un cálculo con fechas.
+    """
+    meta = result.meta
+    op = meta["op"]
+    
+    if op == OP_COUNT:
+        text = f"Del {_long_date(meta['start'])} al {_long_date(meta['end'])}: "
+        text += f"{meta['days']} días, de los cuales {meta['business_days']} son hábiles (lunes a viernes sin feriados)."
+        if result.rows:
+            text += "\n\nFeriados en el periodo:\n"
+            for date_iso, name in result.rows:
+                text += f"- {name}: {_long_date(date_iso)}\n"
+        return text
+    
+    if op == OP_BETWEEN:
+        return (
+            f"Entre el {_long_date(meta['start'])} y el {_long_date(meta['end'])} hay {meta['days']} días "
+            f"({meta['business_days']} días hábiles contando ambas fechas)."
+        )
+    
+    date_str = _long_date(meta["date"])
+    if meta.get("holiday"):
+        day_info = f"Es feriado: {meta['holiday']}."
+    elif meta.get("business_day"):
+        day_info = "Es día hábil."
+    else:
+        day_info = "No es día hábil."
+    
+    if op in (OP_UNTIL, OP_SINCE):
+        if meta["days"] == 0:
+            return f"Es hoy, {date_str}. {day_info}"
+        if meta["past"]:
+            return f"Han pasado {meta['days']} días desde el {date_str} ({meta['business_days']} días hábiles). {day_info}"
+        return f"Faltan {meta['days']} días para el {date_str} ({meta['business_days']} días hábiles). {day_info}"
+    
+    return f"{date_str[0].upper()}{date_str[1:]}. {day_info}"
+
+
+@register_renderer("meeting_plan")
+def render_meeting_plan(result: ToolResult) -> str:
+    """
+    Presenta los horarios propuestos para una reunión entre ciudades.
+    """
+    meta = result.meta
+    cities = result.columns[3:]
+    text = f"MEJORES HORARIOS PARA UNA REUNIÓN DE {meta['duration_min']} MINUTOS\n"
+    text += f"Ciudades: {meta['cities']} (horario laboral {meta['hours']}, lunes a viernes)\n\n"
+    if not meta.get("all_ok"):
+        text += ("No hay ningún horario dentro de la jornada laboral de todas las ciudades; "
+                 "estas opciones dejan fuera de horario a las menos posibles y por el menor tiempo.\n\n")
+    
+    for i, (utc, cities_ok, outside, *local) in enumerate(result.rows, 1):
+        text += f"{i}. " + " · ".join(f"{city} {value}" for city, value in zip(cities, local)) + "\n"
+        if outside:
+            text += f"   Fuera de horario: {outside}\n"
+    
+    text += "\nHoras locales con los cambios de horario de verano de cada ciudad."
+    return text
+
+
+@register_renderer("world_clock")
+def render_world_clock(result: ToolResult) -> str:
+    """
+    Presenta la hora actual en varias ciudades respecto a Perú.
+    """
+    text = "HORA ACTUAL EN DIFERENTES CIUDADES\n\n"
+    
+    for city, time_str, time_diff in result.rows:
+        if city == "Lima":
+            diff_str = "(hora local)"
+        elif time_diff > 0:
+            diff_str = f"(+{_format_hours(time_diff)}h)"
+        elif time_diff < 0:
+            diff_str = f"(-{_format_hours(abs(time_diff))}h)"
+        else:
+            diff_str = "(=h)"
+        text += f"{city}: {time_str} {diff_str}\n"
+    
+    text += "\nPuedes preguntar por la hora en una ciudad específica para más detalles."
+    
+    return text
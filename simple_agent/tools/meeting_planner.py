@@ -0,0 +1,156 @@
+import datetime
+from functools import lru_cache
+import logging
+from typing import Any, Dict, List, Mapping, Tuple
+
+import numpy as np
+import pytz
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Horario laboral local (horas) y resolución de la rejilla (minutos)
+BUSINESS_START_HOUR = 9
+BUSINESS_END_HOUR = 18
+GRID_STEP_MINUTES = 30
+
+# Hora local preferida para una reunión (mitad de la jornada, sin la hora de almuerzo)
+PREFERRED_HOUR = 11.5
+
+# Penalización (minutos) de una ciudad a la que la reunión le cae en fin de semana
+WEEKEND_PENALTY_MINUTES = 12 * 60
+
+# El 1 de enero de 1970 fue jueves (lunes = 0)
+_EPOCH_WEEKDAY = 3
+_MINUTES_PER_DAY = 24 * 60
+
+
+@lru_cache(maxsize=256)
+def _transitions(tz_name: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Instantes UTC (minutos desde 1970) en que cambia el desfase de una zona
+    horaria y el desfase en minutos vigente desde cada uno, tomados de las
+    tablas de transiciones de pytz.
+    """
+    tz = pytz.timezone(tz_name)
+    times = getattr(tz, "_utc_transition_times", None)
+    infos = getattr(tz, "_transition_info", None)
+    if not times or not infos:
+        # Zona sin cambios de horario: un único desfase
+        offset = tz.utcoffset(datetime.datetime(2000, 1, 1)).total_seconds() // 60
+        return np.zeros(1, dtype=np.int64), np.array([offset], dtype=np.int64)
+    instants = np.array(times, dtype="datetime64[m]").astype(np.int64)
+    offsets = np.array([info[0].total_seconds() // 60 for info in infos], dtype=np.int64)
+    return instants, offsets
+
+
+def utc_offsets(tz_name: str, grid: np.ndarray) -> np.ndarray:
+    """
+    Desfase UTC en minutos de una zona horaria en cada instante de `grid`
+    (minutos UTC desde 1970), con los cambios de horario de verano.
+    """
+    instants, offsets = _transitions(tz_name)
+    positions = np.searchsorted(instants, grid, side="right") - 1
+    return offsets[np.clip(positions, 0, offsets.size - 1)]
+
+
+class MeetingPlanner:
+    """
+    Busca los mejores horarios para una reunión entre varias ciudades.
+
+    Recorre una rejilla de instantes UTC (cada 30 minutos por defecto) y
+    calcula con NumPy, para todas las ciudades a la vez, el desfase horario
+    de cada instante, la hora y el día locales y si caen en horario laboral
+    (lunes a viernes). Un horario candidato cubre toda la duración de la
+    reunión. Se ordenan por ciudades en horario laboral, minutos fuera de
+    horario de las demás, cercanía a la hora preferida y fecha.
+    """
+
+    def __init__(self, business_start: int = BUSINESS_START_HOUR, business_end: int = BUSINESS_END_HOUR,
+                 step_minutes: int = GRID_STEP_MINUTES):
+        self.business_start = business_start * 60
+        self.business_end = business_end * 60
+        self.step = step_minutes
+
+    def grid(self, start: datetime.datetime, end: datetime.datetime) -> np.ndarray:
+        """
+        Instantes UTC (minutos desde 1970) entre `start` y `end`, alineados a la rejilla.
+        """
+        first = int(start.timestamp() // 60)
+        first += -first % self.step
+        last = int(end.timestamp() // 60)
+        return np.arange(first, last, self.step, dtype=np.int64)
+
+    def local_times(self, tz_names: List[str], grid: np.ndarray) -> np.ndarray:
+        """
+        Matriz ciudades x instantes con la hora local en minutos desde 1970.
+        """
+        offsets = np.vstack([utc_offsets(name, grid) for name in tz_names])
+        return grid[None, :] + offsets
+
+    def plan(self, cities: Mapping[str, str], start: datetime.datetime, end: datetime.datetime,
+             duration_minutes: int = 60, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Devuelve hasta `limit` horarios para una reunión de `duration_minutes`
+        entre `start` y `end`. Cada horario indica el inicio en UTC, las
+        ciudades en horario laboral, las que quedan fuera y la hora local de
+        cada ciudad.
+        """
+        names = list(cities)
+        grid = self.grid(start, end)
+        slots = max(1, -(-duration_minutes // self.step))
+        if grid.size < slots or not names:
+            return []
+        local = self.local_times([cities[name] for name in names], grid)
+        minute_of_day = local % _MINUTES_PER_DAY
+        weekday = (local // _MINUTES_PER_DAY + _EPOCH_WEEKDAY) % 7
+
+        # Cada casilla de la rejilla está en horario laboral si empieza y termina dentro de él
+        working = (
+            (weekday < 5)
+            & (minute_of_day >= self.business_start)
+            & (minute_of_day + self.step <= self.business_end)
+        )
+        # Una reunión que empieza en i ocupa las casillas i..i+slots-1
+        window = np.lib.stride_tricks.sliding_window_view(working, slots, axis=1).all(axis=2)
+        cities_ok = window.sum(axis=0)
+
+        # Minutos fuera de horario de las ciudades que no están en horario laboral:
+        # lo que falta para empezar la jornada o lo que pasa de su final
+        begin = minute_of_day[:, :window.shape[1]]
+        finish = begin + slots * self.step
+        outside = np.minimum((self.business_start - begin) % _MINUTES_PER_DAY,
+                             (finish - self.business_end) % _MINUTES_PER_DAY)
+        outside = outside + np.where(weekday[:, :window.shape[1]] >= 5, WEEKEND_PENALTY_MINUTES, 0)
+        outside_total = np.where(window, 0, outside).sum(axis=0)
+
+        # Distancia media a la hora preferida de las ciudades en horario laboral
+        distance = np.abs(begin / 60.0 - PREFERRED_HOUR)
+        comfort = np.where(window, distance, 0.0).sum(axis=0) / np.maximum(cities_ok, 1)
+
+        candidates = np.arange(window.shape[1])
+        order = np.lexsort((candidates, comfort, outside_total, -cities_ok))
+
+        result = []
+        used_days = set()
+        for i in order:
+            # Si hay horarios con alguna ciudad en horario laboral, no se proponen los que no tienen ninguna
+            if result and not cities_ok[i]:
+                break
+            # Como mucho un horario por día UTC para dar opciones distintas
+            day = int(grid[i] // _MINUTES_PER_DAY)
+            if day in used_days:
+                continue
+            used_days.add(day)
+            result.append({
+                "start": datetime.datetime.fromtimestamp(int(grid[i]) * 60, tz=datetime.timezone.utc),
+                "cities_ok": int(cities_ok[i]),
+                "outside": [name for row, name in enumerate(names) if not window[row, i]],
+                "local": {
+                    name: datetime.datetime.fromtimestamp(int(local[row, i]) * 60, tz=datetime.timezone.utc).replace(tzinfo=None)
+                    for row, name in enumerate(names)
+                },
+            })
+            if len(result) == limit:
+                break
+        return result
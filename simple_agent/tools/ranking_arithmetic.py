@@ -0,0 +1,69 @@
+import re
+from typing import Any, Dict, NamedTuple, Optional
+
+from .ranking_data import fold_text
+
+# Intenciones de las consultas aritméticas sobre las métricas
+INTENT_DIFFERENCE = "difference"
+INTENT_RATIO = "ratio"
+INTENT_COMPARE = "compare"
+INTENT_SHARE = "share"
+
+# Patrones sobre el texto sin tildes ni mayúsculas; el orden importa
+# ("cuántas veces más" es una razón, no una diferencia)
+INTENT_PATTERNS = (
+    (INTENT_RATIO, re.compile(r"(cuantas veces|veces (mas|menos|mayor|menor)|\bratio\b|razon entre)")),
+    (INTENT_SHARE, re.compile(r"(porcentaje|que parte|participacion|cuota|proporcion|que fraccion)")),
+    (INTENT_DIFFERENCE, re.compile(r"(cuant[oa]s? (mas|menos)|diferencia|\b(mas|menos|mayor|menor) que\b|supera|por cuanto)")),
+    (INTENT_COMPARE, re.compile(r"(compar|\bvs\b|versus|frente a|contra)")),
+)
+
+
+def detect_intent(text: str) -> Optional[str]:
+    """
+    Intención aritmética de la consulta (diferencia, razón, comparación o
+    participación), o None si no pide ningún cálculo.
+    """
+    folded = fold_text(text)
+    return next((intent for intent, pattern in INTENT_PATTERNS if pattern.search(folded)), None)
+
+
+class CompanyFigure(NamedTuple):
+    """
+    Valor de una empresa en una métrica y su origen: el ranking vigente
+    (con su puesto) o el último año de la serie histórica (puesto 0).
+    """
+    name: str
+    rank: int
+    value: float
+    source: str
+
+
+def _round(value: float, digits: int) -> Any:
+    value = round(float(value), digits)
+    return int(value) if value.is_integer() else value
+
+
+def compare_figures(first: CompanyFigure, second: CompanyFigure) -> Dict[str, Any]:
+    """
+    Diferencia absoluta, razón y diferencia porcentual de `first` respecto a `second`.
+    """
+    result = {"difference": _round(first.value - second.value, 1)}
+    if second.value:
+        result["ratio"] = _round(first.value / second.value, 2)
+        result["pct_diff"] = _round((first.value - second.value) / second.value * 100, 1)
+    return result
+
+
+def share_pct(part: float, total: float) -> Optional[float]:
+    """
+    Porcentaje de `part` sobre `total` con un decimal (None si el total es 0).
+    """
+    return _round(part / total * 100, 1) if total else None
+
+
+def number(value: float) -> Any:
+    """
+    Enteros sin decimales; el resto con un decimal.
+    """
+    return _round(value, 1)
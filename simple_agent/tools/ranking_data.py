@@ -0,0 +1,346 @@
+from bisect import insort
+from dataclasses import dataclass, field
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Métricas de ranking: campo del registro, etiqueta, unidad y formato de presentación
+RANKING_METRICS: Dict[str, Dict[str, str]] = {
+    "inversión": {"field": "investment", "label": "Inversión estimada", "unit": "USD millones", "display": "USD {:,} millones"},
+    "ingresos": {"field": "revenue", "label": "Ingresos anuales", "unit": "USD millones", "display": "USD {:,} millones"},
+    "valor de mercado": {"field": "market_value", "label": "Valor de mercado", "unit": "USD millones", "display": "USD {:,} millones"},
+    "empleados": {"field": "employees", "label": "Número de empleados", "unit": "personas (mínimo)", "display": "{:,}+"},
+}
+
+# Nombre de la métrica a partir de su nombre o de su campo ("investment" -> "inversión")
+_METRIC_ALIASES = {
+    **{name: name for name in RANKING_METRICS},
+    **{metric["field"]: name for name, metric in RANKING_METRICS.items()},
+}
+
+# Operaciones del registro de cambios
+OP_UPSERT = "upsert"
+OP_DELETE = "delete"
+
+# Empresas que se muestran por ranking
+RANKING_TOP_N = 5
+
+# Variables de entorno con las rutas de los datos y el intervalo de sondeo
+ENV_DATA_PATH = "RANKING_DATA_PATH"
+ENV_CHANGES_PATH = "RANKING_CHANGES_PATH"
+ENV_POLL_INTERVAL = "RANKING_POLL_INTERVAL"
+
+
+class RankingEntry(NamedTuple):
+    """
+    Empresa dentro del índice de una métrica.
+    """
+    name: str
+    value: float
+    sector: str
+
+
+def _sort_key(entry: RankingEntry) -> Tuple[float, str]:
+    # Mayor valor primero; a igual valor, orden alfabético
+    return (-entry.value, entry.name)
+
+
+def resolve_metric(name: str) -> str:
+    """
+    Devuelve el nombre canónico de una métrica ("inversión" o "investment").
+    """
+    metric = _METRIC_ALIASES.get(str(name).strip().lower())
+    if metric is None:
+        raise ValueError(f"Métrica de ranking desconocida: {name}")
+    return metric
+
+
+def fold_text(text: str) -> str:
+    """
+    Texto en minúsculas y sin tildes, para comparar nombres y consultas.
+    """
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in text if not unicodedata.combining(char)).casefold()
+
+
+@dataclass(frozen=True)
+class RankingSnapshot:
+    """
+    Versión inmutable del conjunto de datos de rankings.
+
+    Cada métrica tiene su índice ordenado (tupla de `RankingEntry`); las
+    consultas toman una instantánea y la usan de principio a fin, de modo que
+    nunca ven una actualización a medio aplicar.
+    """
+    version: int
+    rankings: Mapping[str, Tuple[RankingEntry, ...]]
+    source: str = "built-in"
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def metrics(self) -> Tuple[str, ...]:
+        return tuple(self.rankings)
+
+    def top(self, metric: str, limit: int = RANKING_TOP_N) -> Tuple[Tuple[int, str, float, str], ...]:
+        """
+        Devuelve las primeras `limit` filas (posición, nombre, valor, sector) de una métrica.
+        """
+        entries = self.rankings.get(metric, ())
+        return tuple((rank, entry.name, entry.value, entry.sector) for rank, entry in enumerate(entries[:limit], 1))
+
+
+def _parse_value(value: Any) -> float:
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def build_indexes(data: Mapping[str, Iterable[Mapping[str, Any]]]) -> Dict[str, Tuple[RankingEntry, ...]]:
+    """
+    Construye los índices ordenados por métrica a partir de registros con la
+    forma de `CompanyRankingTool.COMPANY_RANKINGS` (el campo de la métrica o
+    "value"; la posición se ignora y se deriva del valor).
+    """
+    indexes = {}
+    for metric_name, records in data.items():
+        metric = resolve_metric(metric_name)
+        field_name = RANKING_METRICS[metric]["field"]
+        entries = [
+            RankingEntry(record["name"], _parse_value(record.get(field_name, record.get("value"))), record.get("sector", ""))
+            for record in records
+        ]
+        indexes[metric] = tuple(sorted(entries, key=_sort_key))
+    return indexes
+
+
+def apply_changes(indexes: Mapping[str, Tuple[RankingEntry, ...]],
+                  changes: Iterable[Mapping[str, Any]]) -> Dict[str, Tuple[RankingEntry, ...]]:
+    """
+    Aplica un lote de cambios y devuelve los nuevos índices. Solo se copian los
+    índices de las métricas afectadas; el resto se comparte con la versión anterior.
+
+    Cada cambio es {"op": "upsert", "metric", "name", "value", "sector"?} o
+    {"op": "delete", "metric", "name"}. Los cambios inválidos se omiten.
+    """
+    updated: Dict[str, List[RankingEntry]] = {}
+    for change in changes:
+        try:
+            op = change.get("op", OP_UPSERT)
+            metric = resolve_metric(change["metric"])
+            name = change["name"]
+            if op not in (OP_UPSERT, OP_DELETE):
+                raise ValueError(f"operación desconocida '{op}'")
+            # Validar el valor antes de tocar el índice: un cambio inválido no borra la entrada
+            value = _parse_value(change["value"]) if op == OP_UPSERT else None
+            entries = updated.get(metric)
+            if entries is None:
+                entries = updated[metric] = list(indexes.get(metric, ()))
+            position = next((i for i, entry in enumerate(entries) if entry.name == name), None)
+            previous = entries.pop(position) if position is not None else None
+            if op == OP_DELETE:
+                continue
+            sector = change.get("sector", previous.sector if previous else "")
+            insort(entries, RankingEntry(name, value, sector), key=_sort_key)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning("Cambio de ranking inválido omitido (%s): %s", change, e)
+    return {**indexes, **{metric: tuple(entries) for metric, entries in updated.items()}}
+
+
+class RankingDataset:
+    """
+    Gestor del conjunto de datos de rankings con recarga en caliente.
+
+    Parte de los datos base (un archivo JSON en `data_path` o los datos
+    incluidos) y de un registro de cambios de solo anexado en `changes_path`
+    (JSONL, un cambio por línea). `refresh()` aplica de forma incremental las
+    líneas nuevas del registro y recarga todo si cambia el archivo base. Cada
+    versión se publica como una `RankingSnapshot` inmutable que sustituye a la
+    anterior con una sola asignación, sin bloquear las consultas en curso.
+    """
+
+    def __init__(self, base_data: Optional[Mapping[str, Any]] = None,
+                 data_path: Optional[str] = None, changes_path: Optional[str] = None):
+        self.base_data = base_data or {}
+        self.data_path = data_path
+        self.changes_path = changes_path
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[RankingSnapshot], None]] = []
+        self._data_stat: Optional[Tuple[int, int]] = None
+        self._changes_offset = 0
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stats = {"reloads": 0, "incremental_updates": 0, "changes_applied": 0}
+        self._snapshot = RankingSnapshot(0, MappingProxyType({}))
+        with self._lock:
+            self._reload()
+
+    @classmethod
+    def from_env(cls, base_data: Optional[Mapping[str, Any]] = None) -> "RankingDataset":
+        """
+        Crea el gestor con las rutas de RANKING_DATA_PATH y RANKING_CHANGES_PATH
+        y, si hay alguna, empieza a vigilarlas cada RANKING_POLL_INTERVAL segundos.
+        """
+        dataset = cls(base_data, os.getenv(ENV_DATA_PATH), os.getenv(ENV_CHANGES_PATH))
+        if dataset.data_path or dataset.changes_path:
+            dataset.start_watching(float(os.getenv(ENV_POLL_INTERVAL, "2.0")))
+        return dataset
+
+    @property
+    def snapshot(self) -> RankingSnapshot:
+        """
+        Versión vigente de los datos (lectura sin bloqueo).
+        """
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def subscribe(self, callback: Callable[[RankingSnapshot], None]) -> None:
+        """
+        Registra una función que se llama con cada nueva versión publicada
+        (p. ej. para invalidar cachés por versión).
+        """
+        self._listeners.append(callback)
+
+    def refresh(self) -> bool:
+        """
+        Revisa los archivos y publica una nueva versión si cambiaron.
+        Devuelve True si se publicó una versión.
+        """
+        with self._lock:
+            data_stat = self._stat(self.data_path)
+            if data_stat != self._data_stat:
+                return self._reload()
+            if not self.changes_path:
+                return False
+            changes_stat = self._stat(self.changes_path)
+            size = changes_stat[1] if changes_stat else 0
+            if size < self._changes_offset:
+                # El registro se truncó o rotó: reconstruir desde la base
+                return self._reload()
+            if size == self._changes_offset:
+                return False
+            changes = self._read_changes()
+            if not changes:
+                return False
+            self._stats["incremental_updates"] += 1
+            return self._publish(apply_changes(self._snapshot.rankings, changes), len(changes))
+
+    def apply(self, changes: Iterable[Mapping[str, Any]]) -> RankingSnapshot:
+        """
+        Aplica cambios en memoria (sin registro de cambios) y publica la nueva versión.
+        """
+        changes = list(changes)
+        with self._lock:
+            self._stats["incremental_updates"] += 1
+            self._publish(apply_changes(self._snapshot.rankings, changes), len(changes))
+            return self._snapshot
+
+    def _reload(self) -> bool:
+        self._data_stat = self._stat(self.data_path)
+        base = self.base_data
+        if self.data_path and self._data_stat:
+            try:
+                with open(self.data_path, encoding="utf-8") as f:
+                    base = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error("No se pudo cargar %s, se mantienen los datos actuales: %s", self.data_path, e)
+                return False
+        try:
+            indexes = build_indexes(base)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error("Datos de ranking inválidos, se mantienen los datos actuales: %s", e)
+            return False
+        self._changes_offset = 0
+        changes = self._read_changes()
+        self._stats["reloads"] += 1
+        return self._publish(apply_changes(indexes, changes) if changes else indexes, len(changes))
+
+    def _read_changes(self) -> List[Dict[str, Any]]:
+        """
+        Lee las líneas completas añadidas al registro desde la última lectura.
+        """
+        if not self.changes_path or not os.path.exists(self.changes_path):
+            return []
+        with open(self.changes_path, "rb") as f:
+            f.seek(self._changes_offset)
+            data = f.read()
+        # Una línea a medio escribir se deja para la próxima lectura
+        end = data.rfind(b"\n") + 1
+        self._changes_offset += end
+        changes = []
+        for line in data[:end].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                changes.append(json.loads(line))
+            except ValueError:
+                logger.warning("Línea inválida en el registro de cambios omitida: %s", line[:80])
+        return changes
+
+    def _publish(self, indexes: Mapping[str, Tuple[RankingEntry, ...]], change_count: int) -> bool:
+        snapshot = RankingSnapshot(
+            version=self._snapshot.version + 1,
+            rankings=MappingProxyType(dict(indexes)),
+            source=self.data_path or "built-in"
+        )
+        self._stats["changes_applied"] += change_count
+        # Publicación atómica: las consultas en curso conservan la versión que tomaron
+        self._snapshot = snapshot
+        logger.info("Datos de ranking publicados: versión %d (%d cambios)", snapshot.version, change_count)
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.warning("Error notificando la versión %d: %s", snapshot.version, e)
+        return True
+
+    @staticmethod
+    def _stat(path: Optional[str]) -> Optional[Tuple[int, int]]:
+        if not path:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def start_watching(self, interval: float = 2.0) -> threading.Thread:
+        """
+        Revisa los archivos cada `interval` segundos en un hilo en segundo plano.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return self._watcher
+        self._stop.clear()
+
+        def _watch() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error("Error recargando los datos de ranking: %s", e)
+
+        self._watcher = threading.Thread(target=_watch, name="ranking-data-watcher", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watching(self) -> None:
+        self._stop.set()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version,
+            "source": snapshot.source,
+            "age_s": round(time.time() - snapshot.created_at, 1),
+            "companies": {metric: len(entries) for metric, entries in snapshot.rankings.items()},
+            **self._stats,
+        }
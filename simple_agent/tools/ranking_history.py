@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ranking_data import resolve_metric
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Variable de entorno con un archivo JSON de series históricas
+ENV_HISTORY_PATH = "RANKING_HISTORY_PATH"
+
+
+class DeltaSeries:
+    """
+    Serie anual de una empresa en una métrica, codificada por diferencias.
+
+    Guarda el primer valor y las diferencias año a año con el tipo entero más
+    pequeño que las admite (las cifras anuales cambian poco entre años). Solo
+    admite valores enteros: ValueError si alguno tiene decimales.
+    """
+
+    __slots__ = ("start", "base", "deltas")
+
+    def __init__(self, start: int, values: Sequence[float]):
+        raw = np.asarray(values, dtype=np.float64)
+        if not np.all(np.isfinite(raw)) or np.any(raw != np.rint(raw)):
+            raise ValueError("La serie histórica debe tener valores enteros")
+        values = raw.astype(np.int64)
+        deltas = np.diff(values)
+        dtype = np.result_type(np.min_scalar_type(int(deltas.min())), np.min_scalar_type(int(deltas.max()))) \
+            if deltas.size else np.int8
+        self.start = start
+        self.base = int(values[0])
+        self.deltas = deltas.astype(dtype)
+
+    def __len__(self) -> int:
+        return self.deltas.size + 1
+
+    def decode(self) -> np.ndarray:
+        values = np.empty(len(self), dtype=np.int64)
+        values[0] = self.base
+        np.cumsum(self.deltas, dtype=np.int64, out=values[1:])
+        values[1:] += self.base
+        return values
+
+    @property
+    def nbytes(self) -> int:
+        return self.deltas.nbytes + 16
+
+
+class RankingHistory:
+    """
+    Series históricas de los rankings: valor por empresa, métrica y año.
+
+    Las series se guardan codificadas por diferencias; cada consulta decodifica
+    la matriz empresas x años de su métrica (NaN donde no hay dato) y la
+    descarta al terminar, de modo que en memoria solo quedan las series
+    codificadas. Los puestos de todos los años se calculan de una vez con
+    `argsort` por columnas.
+    """
+
+    def __init__(self, years: Sequence[int], data: Mapping[str, Mapping[str, Sequence[Optional[float]]]]):
+        """
+        `data` tiene la forma {métrica: {empresa: [valor por año]}} con valores
+        enteros; se admiten `None` al principio o al final de una serie (años
+        sin dato). Las series incompletas o con decimales se omiten con un aviso.
+        """
+        self.years = np.asarray(years, dtype=np.int16)
+        if np.any(np.diff(self.years) <= 0):
+            raise ValueError("Los años de la serie histórica deben ser crecientes")
+        self._series: Dict[str, Dict[str, DeltaSeries]] = {}
+        for metric_name, companies in data.items():
+            metric = resolve_metric(metric_name)
+            series = self._series.setdefault(metric, {})
+            for company, values in companies.items():
+                present = [i for i, value in enumerate(values) if value is not None]
+                if not present:
+                    continue
+                first, last = present[0], present[-1]
+                if len(present) != last - first + 1 or len(values) > len(self.years):
+                    logger.warning("Serie histórica omitida (%s, %s): años incompletos", metric, company)
+                    continue
+                try:
+                    series[company] = DeltaSeries(first, values[first:last + 1])
+                except ValueError as e:
+                    logger.warning("Serie histórica omitida (%s, %s): %s", metric, company, e)
+
+    @classmethod
+    def from_file(cls, path: str) -> "RankingHistory":
+        """
+        Carga un JSON {"years": [...], "<métrica>": {"<empresa>": [valores enteros]}}.
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        years = data.pop("years")
+        return cls(years, data)
+
+    @classmethod
+    def from_env(cls, years: Sequence[int], data: Mapping[str, Any]) -> "RankingHistory":
+        """
+        Usa RANKING_HISTORY_PATH si está definida; si no, los datos indicados.
+        """
+        path = os.getenv(ENV_HISTORY_PATH)
+        if path:
+            try:
+                return cls.from_file(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.error("No se pudo cargar %s, se usan los datos incluidos: %s", path, e)
+        return cls(years, data)
+
+    @property
+    def metrics(self) -> Tuple[str, ...]:
+        return tuple(self._series)
+
+    @property
+    def first_year(self) -> int:
+        return int(self.years[0])
+
+    @property
+    def last_year(self) -> int:
+        return int(self.years[-1])
+
+    def companies(self, metric: str) -> Tuple[str, ...]:
+        return tuple(self._series.get(metric, {}))
+
+    def year_index(self, year: int) -> int:
+        """
+        Posición de un año en la serie; ValueError si no hay datos de ese año.
+        """
+        index = int(np.searchsorted(self.years, year))
+        if index >= self.years.size or self.years[index] != year:
+            raise ValueError(f"No hay datos históricos de {year} (disponibles {self.first_year}-{self.last_year})")
+        return index
+
+    def _matrix(self, metric: str) -> Tuple[Tuple[str, ...], np.ndarray, np.ndarray]:
+        """
+        Decodifica (empresas, valores, puestos) de una métrica. Los puestos son 0
+        donde no hay dato.
+        """
+        series = self._series.get(metric, {})
+        companies = tuple(series)
+        values = np.full((len(companies), self.years.size), np.nan)
+        for row, company in enumerate(companies):
+            item = series[company]
+            values[row, item.start:item.start + len(item)] = item.decode()
+
+        # Puestos por año: mayor valor primero, sin dato al final
+        order = np.argsort(np.where(np.isnan(values), np.inf, -values), axis=0, kind="stable")
+        ranks = np.empty_like(order)
+        np.put_along_axis(ranks, order, np.arange(1, len(companies) + 1)[:, None], axis=0)
+        ranks[np.isnan(values)] = 0
+        return companies, values, ranks
+
+    def series(self, metric: str, company: str, start_year: Optional[int] = None,
+               end_year: Optional[int] = None) -> List[Tuple[int, float, int]]:
+        """
+        Devuelve (año, valor, puesto) de una empresa en un rango de años.
+        """
+        companies, values, ranks = self._matrix(metric)
+        row = companies.index(company)
+        first = self.year_index(start_year) if start_year is not None else 0
+        last = self.year_index(end_year) if end_year is not None else self.years.size - 1
+        window = slice(first, last + 1)
+        valid = ~np.isnan(values[row, window])
+        return list(zip(
+            self.years[window][valid].tolist(),
+            values[row, window][valid].astype(np.int64).tolist(),
+            ranks[row, window][valid].tolist()
+        ))
+
+    def rank_at(self, metric: str, year: int, limit: int = 5) -> List[Tuple[int, str, float]]:
+        """
+        Devuelve el ranking (puesto, empresa, valor) de una métrica en un año.
+        """
+        companies, values, ranks = self._matrix(metric)
+        column = self.year_index(year)
+        rows = np.flatnonzero(ranks[:, column])
+        rows = rows[np.argsort(ranks[rows, column])][:limit]
+        return [(int(ranks[row, column]), companies[row], int(values[row, column])) for row in rows]
+
+    def compare(self, metric: str, start_year: int, end_year: int) -> List[Dict[str, Any]]:
+        """
+        Compara dos años para todas las empresas con dato en ambos: puestos,
+        valores, variación porcentual, puestos ganados y tasa de crecimiento
+        anual compuesta (CAGR). Ordenado por el puesto final.
+        """
+        companies, values, ranks = self._matrix(metric)
+        first, last = self.year_index(start_year), self.year_index(end_year)
+        start, end = values[:, first], values[:, last]
+        valid = ~(np.isnan(start) | np.isnan(end))
+        change_pct = np.full(start.shape, np.nan)
+        np.divide(end - start, start, out=change_pct, where=valid & (start > 0))
+        cagr_pct = self.cagr(start, end, end_year - start_year)
+
+        rows = np.flatnonzero(valid)
+        rows = rows[np.argsort(ranks[rows, last], kind="stable")]
+        return [
+            {
+                "name": companies[row],
+                "rank_from": int(ranks[row, first]),
+                "rank_to": int(ranks[row, last]),
+                "places": int(ranks[row, first] - ranks[row, last]),
+                "value_from": int(start[row]),
+                "value_to": int(end[row]),
+                "change_pct": round(float(change_pct[row]) * 100, 1) if not np.isnan(change_pct[row]) else None,
+                "cagr_pct": round(float(cagr_pct[row]) * 100, 1) if not np.isnan(cagr_pct[row]) else None,
+            }
+            for row in rows
+        ]
+
+    def movers(self, metric: str, start_year: int, end_year: int, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Empresas que más puestos ganaron (y, a igualdad, más crecieron) entre dos años.
+        """
+        rows = self.compare(metric, start_year, end_year)
+        rows.sort(key=lambda row: (-row["places"], -(row["change_pct"] or 0.0)))
+        return rows[:limit]
+
+    @staticmethod
+    def cagr(start: np.ndarray, end: np.ndarray, years: int) -> np.ndarray:
+        """
+        Tasa de crecimiento anual compuesta, vectorizada (NaN si no aplica).
+        """
+        start = np.asarray(start, dtype=np.float64)
+        end = np.asarray(end, dtype=np.float64)
+        result = np.full(np.broadcast(start, end).shape, np.nan)
+        if years <= 0:
+            return result
+        valid = (start > 0) & (end > 0)
+        np.power(end / np.where(valid, start, 1.0), 1.0 / years, out=result, where=valid)
+        result[valid] -= 1.0
+        return result
+
+    def nbytes(self) -> int:
+        """
+        Memoria de las series codificadas, en bytes.
+        """
+        return sum(item.nbytes for series in self._series.values() for item in series.values())
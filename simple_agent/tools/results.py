@@ -0,0 +1,120 @@
+from dataclasses import dataclass, field
+from functools import cached_property
+import logging
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Renderizadores de texto legible por tipo de resultado
+RENDERERS: Dict[str, Callable[["ToolResult"], str]] = {}
+
+# Tipos de resultado genéricos
+KIND_MESSAGE = "message"
+KIND_GROUP = "group"
+
+
+def register_renderer(kind: str) -> Callable:
+    """
+    Decorador que registra la función que convierte un tipo de resultado en texto.
+    """
+    def decorator(func: Callable[["ToolResult"], str]) -> Callable[["ToolResult"], str]:
+        RENDERERS[kind] = func
+        return func
+    return decorator
+
+
+def _compact_value(value: Any) -> str:
+    """
+    Serializa un valor escalar con el mínimo de caracteres.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+@dataclass
+class ToolResult:
+    """
+    Resultado estructurado de una herramienta.
+
+    Guarda los datos tipados (registros, números, fechas ISO) en lugar de texto
+    preformateado. `render()` produce el texto para el usuario y `compact()` la
+    forma mínima que se envía al LLM.
+    """
+    tool: str
+    kind: str
+    meta: Dict[str, Any] = field(default_factory=dict)
+    columns: Tuple[str, ...] = ()
+    rows: Sequence[Sequence[Any]] = ()
+    parts: Sequence["ToolResult"] = ()
+
+    @classmethod
+    def message(cls, tool: str, text: str) -> "ToolResult":
+        """
+        Crea un resultado de solo texto (ayuda, avisos o errores).
+        """
+        return cls(tool=tool, kind=KIND_MESSAGE, meta={"text": text})
+
+    @classmethod
+    def group(cls, tool: str, parts: List["ToolResult"], title: str = "") -> "ToolResult":
+        """
+        Agrupa varios resultados de una misma herramienta.
+        """
+        return cls(tool=tool, kind=KIND_GROUP, meta={"title": title} if title else {}, parts=tuple(parts))
+
+    def records(self) -> List[Dict[str, Any]]:
+        """
+        Devuelve las filas como diccionarios columna -> valor.
+        """
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+    @cached_property
+    def text(self) -> str:
+        renderer = RENDERERS.get(self.kind)
+        if renderer is None:
+            logger.warning("Sin renderizador para resultados de tipo '%s'", self.kind)
+            return self.compact()
+        return renderer(self)
+
+    def render(self) -> str:
+        """
+        Devuelve el texto legible del resultado (se calcula una sola vez).
+        """
+        return self.text
+
+    def compact(self) -> str:
+        """
+        Serializa el resultado para el prompt: una cabecera `tipo[clave=valor;...]`,
+        los nombres de columna y una fila por línea, separados por `|`.
+        """
+        if self.kind == KIND_MESSAGE:
+            return self.meta.get("text", "")
+        if self.kind == KIND_GROUP:
+            return "\n".join(part.compact() for part in self.parts)
+
+        meta = ";".join(f"{key}={_compact_value(value)}" for key, value in self.meta.items() if value is not None)
+        lines = [f"{self.kind}[{meta}]" if meta else self.kind]
+        if self.columns:
+            lines.append("|".join(self.columns))
+            lines.extend("|".join(_compact_value(value) for value in row) for row in self.rows)
+        return "\n".join(lines)
+
+    def __str__(self) -> str:
+        return self.render()
+
+
+@register_renderer(KIND_MESSAGE)
+def _render_message(result: ToolResult) -> str:
+    return result.meta.get("text", "")
+
+
+@register_renderer(KIND_GROUP)
+def _render_group(result: ToolResult) -> str:
+    title = result.meta.get("title")
+    body = "\n\n".join(part.render() for part in result.parts)
+    return f"{title}\n\n{body}" if title else body
@@ -0,0 +1,227 @@
+import re
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from .ranking_data import RankingEntry, RankingSnapshot, fold_text
+
+# Taxonomía de sectores: sector -> (sector padre, alias en las consultas)
+SECTOR_TAXONOMY: Dict[str, Tuple[Optional[str], Tuple[str, ...]]] = {
+    "Recursos naturales": (None, ("recursos naturales", "extractivo", "extractivas")),
+    "Minería": ("Recursos naturales", ("minero", "minera", "mineras", "mineros")),
+    "Energía": ("Recursos naturales", ("energetico", "energetica", "energeticas", "petroleo", "hidrocarburos")),
+    "Servicios financieros": (None, ("financiero", "financiera", "financieras", "finanzas")),
+    "Banca": ("Servicios financieros", ("banco", "bancos", "bancario", "bancaria", "bancarias")),
+    "Comercio y consumo": (None, ("consumo",)),
+    "Retail": ("Comercio y consumo", ("comercio minorista", "minorista", "minoristas")),
+    "Consumo masivo": ("Comercio y consumo", ()),
+    "Alimentos": ("Consumo masivo", ("alimentaria", "alimentarias", "alimentacion")),
+    "Bebidas": ("Consumo masivo", ("bebida",)),
+    "Diversificado": (None, ("diversificados", "conglomerado", "conglomerados")),
+}
+
+# Separadores de los sectores compuestos ("Minería/Banca")
+SECTOR_SEPARATOR = re.compile(r"\s*[/,;]\s*")
+
+# Conectores entre sectores en una consulta
+OP_AND = "and"
+OP_OR = "or"
+_OR_WORDS = re.compile(r"\b(o|u)\b")
+# La negación solo aplica si precede directamente al sector ("sin banca",
+# "excepto las empresas de banca"); "menos" no se incluye por ser comparativo
+_NOT_PREFIX = re.compile(
+    r"\b(?:no|ni|sin|excepto|salvo|fuera del?|excluyendo)\s+(?:(?:es|son)\s+)?"
+    r"(?:(?:el|las?|los)\s+)?(?:(?:empresas|sector)\s+(?:(?:de|del)\s+)?(?:(?:la|el)\s+)?)?$"
+)
+
+
+def split_sectors(sector: str) -> List[str]:
+    """
+    Separa un sector compuesto en sus partes ("Minería/Banca" -> ["Minería", "Banca"]).
+    """
+    return [part for part in SECTOR_SEPARATOR.split(sector.strip()) if part]
+
+
+class SectorTerm(NamedTuple):
+    """
+    Sector de un filtro con el conector que lo une al anterior.
+    """
+    op: str
+    negate: bool
+    sector: str
+
+
+def describe_filter(terms: Sequence[SectorTerm]) -> str:
+    """
+    Texto legible de un filtro ("Minería o Energía, sin Banca").
+    """
+    text = ""
+    for i, term in enumerate(terms):
+        if i:
+            text += " o " if term.op == OP_OR else " y "
+        text += f"sin {term.sector}" if term.negate else term.sector
+    return text
+
+
+class SectorTaxonomy:
+    """
+    Taxonomía jerárquica de sectores.
+
+    Normaliza los sectores de los datos (compuestos, con o sin tildes) a
+    sectores de la taxonomía más sus ancestros: una empresa de "Alimentos"
+    también pertenece a "Consumo masivo" y a "Comercio y consumo".
+
+    No se modifica después de construirse, así que se comparte entre hilos sin
+    candados. Los sectores de los datos que no están en la taxonomía se tratan
+    como sectores de primer nivel; para que también se reconozcan en las
+    consultas se usa la copia ampliada de `for_snapshot`, una por versión.
+    """
+
+    def __init__(self, taxonomy: Optional[Mapping[str, Tuple[Optional[str], Sequence[str]]]] = None):
+        self._definition = dict(taxonomy if taxonomy is not None else SECTOR_TAXONOMY)
+        self.parents: Dict[str, Optional[str]] = {}
+        self._aliases: Dict[str, str] = {}
+        for name, (parent, aliases) in self._definition.items():
+            self.parents[name] = parent
+            for alias in (name, *aliases):
+                self._aliases.setdefault(fold_text(alias), name)
+        aliases = sorted(self._aliases, key=len, reverse=True)
+        self._pattern = re.compile(r"\b(" + "|".join(re.escape(alias) for alias in aliases) + r")\b")
+
+    def for_snapshot(self, snapshot: RankingSnapshot) -> "SectorTaxonomy":
+        """
+        Copia de la taxonomía que añade como sectores de primer nivel los
+        sectores de la versión que no figuran en ella.
+        """
+        extra: Dict[str, Tuple[Optional[str], Sequence[str]]] = {}
+        for entries in snapshot.rankings.values():
+            for entry in entries:
+                for part in split_sectors(entry.sector):
+                    if fold_text(part) not in self._aliases:
+                        extra.setdefault(part, (None, ()))
+        return SectorTaxonomy({**self._definition, **extra}) if extra else self
+
+    def resolve(self, sector: str) -> str:
+        """
+        Sector de la taxonomía para un nombre o alias; un sector desconocido se
+        devuelve tal cual (sin ancestros).
+        """
+        return self._aliases.get(fold_text(sector.strip()), sector.strip())
+
+    def ancestors(self, name: str) -> List[str]:
+        result = []
+        parent = self.parents.get(name)
+        while parent is not None and parent not in result:
+            result.append(parent)
+            parent = self.parents.get(parent)
+        return result
+
+    def classify(self, sector: str) -> Tuple[str, ...]:
+        """
+        Sectores de una empresa a partir de su sector en los datos, con sus ancestros.
+        """
+        names: Dict[str, None] = {}
+        for part in split_sectors(sector):
+            name = self.resolve(part)
+            names[name] = None
+            for ancestor in self.ancestors(name):
+                names[ancestor] = None
+        return tuple(names)
+
+    def mentions(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        Sectores mencionados en el texto como (inicio, fin, sector), sin solaparse
+        (se prefiere el alias más largo: "consumo masivo" antes que "consumo").
+        """
+        folded = fold_text(text)
+        return [(match.start(), match.end(), self._aliases[match.group(1)]) for match in self._pattern.finditer(folded)]
+
+    def find(self, text: str) -> List[str]:
+        """
+        Sectores mencionados en el texto, sin repetir.
+        """
+        return list(dict.fromkeys(sector for _, _, sector in self.mentions(text)))
+
+    def parse_filter(self, text: str) -> List[SectorTerm]:
+        """
+        Convierte las menciones de sectores de una consulta en un filtro que se
+        evalúa de izquierda a derecha: "o" une, "y" (o una coma) interseca y
+        "no", "sin", "excepto"... justo delante de un sector lo excluyen.
+        """
+        folded = fold_text(text)
+        terms: List[SectorTerm] = []
+        previous_end = 0
+        for start, end, sector in self.mentions(text):
+            between = folded[previous_end:start]
+            op = OP_OR if terms and _OR_WORDS.search(between) else OP_AND
+            terms.append(SectorTerm(op, bool(_NOT_PREFIX.search(between)), sector))
+            previous_end = end
+        return terms
+
+
+class SectorBitmapIndex:
+    """
+    Índice de sectores con un conjunto de bits por sector y métrica.
+
+    En cada métrica el bit i corresponde a la empresa en el puesto i + 1, así
+    que un filtro AND/OR/NOT es una operación entre enteros de Python y el
+    top-k filtrado son los k bits más bajos del resultado.
+    """
+
+    def __init__(self, snapshot: RankingSnapshot, taxonomy: SectorTaxonomy):
+        self.version = snapshot.version
+        self.taxonomy = taxonomy
+        self.rankings = snapshot.rankings
+        self.universe: Dict[str, int] = {}
+        self.bits: Dict[str, Dict[str, int]] = {}
+        classified: Dict[str, Tuple[str, ...]] = {}
+        for metric, entries in snapshot.rankings.items():
+            # Los bits se marcan en un bytearray y se convierten a entero una
+            # sola vez por sector (sumar bits a un entero grande es O(n) cada vez)
+            buffers: Dict[str, bytearray] = {}
+            size = (len(entries) + 7) // 8
+            for position, entry in enumerate(entries):
+                sectors = classified.get(entry.sector)
+                if sectors is None:
+                    sectors = classified[entry.sector] = taxonomy.classify(entry.sector)
+                for sector in sectors:
+                    buffer = buffers.get(sector)
+                    if buffer is None:
+                        buffer = buffers[sector] = bytearray(size)
+                    buffer[position >> 3] |= 1 << (position & 7)
+            self.bits[metric] = {sector: int.from_bytes(buffer, "little") for sector, buffer in buffers.items()}
+            self.universe[metric] = (1 << len(entries)) - 1
+
+    def evaluate(self, metric: str, terms: Iterable[SectorTerm]) -> int:
+        """
+        Conjunto de bits de las empresas de una métrica que cumplen el filtro.
+        """
+        universe = self.universe.get(metric, 0)
+        sector_bits = self.bits.get(metric, {})
+        result: Optional[int] = None
+        for term in terms:
+            bits = sector_bits.get(term.sector, 0)
+            if term.negate:
+                bits = universe & ~bits
+            if result is None:
+                result = bits
+            elif term.op == OP_OR:
+                result |= bits
+            else:
+                result &= bits
+        return universe if result is None else result
+
+    def top(self, metric: str, mask: int, limit: int) -> List[Tuple[int, RankingEntry]]:
+        """
+        Primeras `limit` empresas (puesto, entrada) del conjunto de bits.
+        """
+        entries = self.rankings.get(metric, ())
+        result = []
+        while mask and len(result) < limit:
+            lowest = mask & -mask
+            position = lowest.bit_length() - 1
+            result.append((position + 1, entries[position]))
+            mask ^= lowest
+        return result
+
+    @staticmethod
+    def count(mask: int) -> int:
+        return bin(mask).count("1")
@@ -0,0 +1,160 @@
+import logging
+import warnings
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ranking_data import RankingSnapshot
+from .sector_index import SectorTaxonomy, split_sectors
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Percentiles que se calculan siempre (cuartiles)
+DEFAULT_PERCENTILES = (25, 75)
+
+
+class CompanyTable:
+    """
+    Tabla numérica de las empresas de una versión de los datos.
+
+    Cada empresa es una fila; cada métrica, una columna `float64` con NaN
+    donde la empresa no figura. La pertenencia a sectores es, por métrica, una
+    matriz booleana empresas x sectores (una empresa puede estar en varios)
+    construida con el sector de la entrada de esa métrica, igual que
+    `SectorBitmapIndex`; los sectores se normalizan con la taxonomía, que añade
+    los sectores padre.
+    """
+
+    def __init__(self, snapshot: RankingSnapshot, taxonomy: Optional[SectorTaxonomy] = None):
+        self.version = snapshot.version
+        self.taxonomy = taxonomy or SectorTaxonomy().for_snapshot(snapshot)
+        names: Dict[str, int] = {}
+        sectors: Dict[str, None] = {}
+        direct: Dict[str, None] = {}
+        classified: Dict[str, Tuple[str, ...]] = {}
+        for entries in snapshot.rankings.values():
+            for entry in entries:
+                names.setdefault(entry.name, len(names))
+                if entry.sector not in classified:
+                    classified[entry.sector] = self.taxonomy.classify(entry.sector)
+                    sectors.update(dict.fromkeys(classified[entry.sector]))
+                    for part in split_sectors(entry.sector):
+                        direct[self.taxonomy.resolve(part)] = None
+        self.names: Tuple[str, ...] = tuple(names)
+        self.rows = names
+
+        self.values: Dict[str, np.ndarray] = {}
+        for metric, entries in snapshot.rankings.items():
+            column = np.full(len(self.names), np.nan)
+            column[[names[entry.name] for entry in entries]] = [entry.value for entry in entries]
+            self.values[metric] = column
+
+        self.sector_names: Tuple[str, ...] = tuple(sectors)
+        # Sectores que figuran tal cual en los datos (sin los sectores padre)
+        self.direct_sectors: Tuple[str, ...] = tuple(direct)
+        # Una matriz por métrica: el sector de una empresa puede variar entre
+        # rankings y una etiqueta de un ranking no debe sumar en otro
+        positions = {name: i for i, name in enumerate(self.sector_names)}
+        self.membership: Dict[str, np.ndarray] = {}
+        for metric, entries in snapshot.rankings.items():
+            matrix = np.zeros((len(self.names), len(self.sector_names)), dtype=bool)
+            for entry in entries:
+                matrix[names[entry.name], [positions[name] for name in classified[entry.sector]]] = True
+            self.membership[metric] = matrix
+
+    def find_sectors(self, text: str) -> List[str]:
+        """
+        Devuelve los sectores de la tabla mencionados en el texto.
+        """
+        return [name for name in self.taxonomy.find(text) if name in self.sector_names]
+
+
+class SectorAggregator:
+    """
+    Estadísticas por sector de una métrica, calculadas con NumPy.
+
+    Suma y conteo salen de un producto matricial con la matriz de pertenencia;
+    media, mediana y percentiles de `nanpercentile` sobre una matriz empresas x
+    sectores con NaN fuera del sector. Los resultados se cachean por métrica y
+    percentiles; el agregador se construye una vez por versión de los datos.
+    """
+
+    def __init__(self, table: CompanyTable):
+        self.table = table
+        self.version = table.version
+        self._cache: Dict[Tuple[str, Tuple[int, ...]], Dict[str, np.ndarray]] = {}
+
+    def stats(self, metric: str, percentiles: Sequence[int] = DEFAULT_PERCENTILES) -> Dict[str, np.ndarray]:
+        """
+        Devuelve arrays alineados con `table.sector_names`: companies, sum, mean,
+        median, share (sobre el total de la métrica) y p<q> por percentil.
+        """
+        key = (metric, tuple(sorted(set(percentiles))))
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        values = self.table.values.get(metric)
+        if values is None:
+            raise ValueError(f"No hay datos de la métrica {metric}")
+        membership = self.table.membership[metric]
+        valid = ~np.isnan(values)
+        in_sector = membership & valid[:, None]
+
+        counts = in_sector.sum(axis=0)
+        sums = np.where(valid, values, 0.0) @ membership
+        total = values[valid].sum()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, sums / counts, np.nan)
+        shares = sums / total if total else np.full(sums.shape, np.nan)
+
+        # Matriz empresas x sectores con el valor de la empresa o NaN
+        grid = np.where(in_sector, values[:, None], np.nan)
+        quantiles = (50,) + key[1]
+        with warnings.catch_warnings():
+            # Un sector sin datos en la métrica deja una columna solo con NaN
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            computed = np.nanpercentile(grid, quantiles, axis=0) if grid.size else np.full((len(quantiles), 0), np.nan)
+
+        result = {"companies": counts, "sum": sums, "mean": means, "median": computed[0], "share": shares}
+        for q, row in zip(key[1], computed[1:]):
+            result[f"p{q}"] = row
+        self._cache[key] = result
+        return result
+
+    def rows(self, metric: str, sectors: Optional[Sequence[str]] = None,
+             percentiles: Sequence[int] = DEFAULT_PERCENTILES) -> Tuple[Tuple[str, ...], List[Tuple[Any, ...]]]:
+        """
+        Devuelve (columnas, filas) de las estadísticas por sector, ordenadas por
+        suma descendente. Con `sectors` solo se incluyen esos sectores; sin ellos,
+        los sectores que figuran en los datos (sin los sectores padre).
+        """
+        stats = self.stats(metric, percentiles)
+        quantile_columns = [f"p{q}" for q in sorted(set(percentiles))]
+        columns = ("sector", "companies", "sum", "mean", "median", *quantile_columns, "share_pct")
+        wanted = sectors if sectors is not None else self.table.direct_sectors
+        selected = [
+            i for i, name in enumerate(self.table.sector_names)
+            if stats["companies"][i] > 0 and name in wanted
+        ]
+        selected.sort(key=lambda i: -stats["sum"][i])
+        rows = [
+            (
+                self.table.sector_names[i],
+                int(stats["companies"][i]),
+                _number(stats["sum"][i]),
+                _number(stats["mean"][i]),
+                _number(stats["median"][i]),
+                *(_number(stats[column][i]) for column in quantile_columns),
+                round(float(stats["share"][i]) * 100, 1),
+            )
+            for i in selected
+        ]
+        return columns, rows
+
+
+def _number(value: float) -> Any:
+    # Enteros sin decimales; el resto con un decimal
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 1)
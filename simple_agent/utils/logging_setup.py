@@ -0,0 +1,234 @@
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterator, Mapping, Optional, TextIO
+
+# Variables de entorno de la configuración de logging
+ENV_LOG_LEVEL = "LOG_LEVEL"
+ENV_LOG_FORMAT = "LOG_FORMAT"
+ENV_LOG_SAMPLE = "LOG_SAMPLE"
+
+# Formato de texto (LOG_FORMAT=text), el mismo que usaba logging.basicConfig
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Registros que caben en la cola antes de empezar a descartar
+DEFAULT_QUEUE_SIZE = 10000
+
+# Sesión y turno en curso: se añaden a cada registro emitido en el mismo contexto
+_session_id: ContextVar[Optional[str]] = ContextVar("log_session_id", default=None)
+_turn_id: ContextVar[Optional[str]] = ContextVar("log_turn_id", default=None)
+
+_setup_lock = threading.Lock()
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["BoundedQueueHandler"] = None
+_sampling: Optional["SamplingFilter"] = None
+
+
+@contextmanager
+def log_context(session_id: Optional[str] = None, turn_id: Optional[str] = None) -> Iterator[None]:
+    """
+    Asocia una sesión y un turno a los registros emitidos dentro del bloque.
+    """
+    session_token = _session_id.set(session_id)
+    turn_token = _turn_id.set(turn_id)
+    try:
+        yield
+    finally:
+        _turn_id.reset(turn_token)
+        _session_id.reset(session_token)
+
+
+class ContextFilter(logging.Filter):
+    """
+    Copia la sesión y el turno del contexto actual al registro. Se ejecuta en el
+    hilo que emite el registro, antes de encolarlo.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.session_id = _session_id.get()
+        record.turn_id = _turn_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Muestreo por logger de los registros INFO y DEBUG.
+
+    `rates` asigna a un prefijo de logger ("agent.conversation", "tools") la
+    fracción de registros que se conserva; se aplica el prefijo más largo. Los
+    registros WARNING o superiores se conservan siempre.
+    """
+
+    def __init__(self, rates: Mapping[str, float]):
+        super().__init__()
+        self.rates = dict(rates)
+        self.sampled_out = 0
+        self._by_logger: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._by_logger.get(name)
+        if rate is None:
+            prefixes = [prefix for prefix in self.rates if name == prefix or name.startswith(prefix + ".")]
+            rate = self.rates[max(prefixes, key=len)] if prefixes else 1.0
+            self._by_logger[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Encola los registros sin formatearlos y sin bloquear al hilo que los emite.
+
+    El mensaje (`msg % args`) se formatea en el hilo del `QueueListener`; si la
+    cola está llena el registro se descarta y se cuenta en `dropped`.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # La cola es del mismo proceso: no hace falta convertir el registro en texto
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _DrainingListener(QueueListener):
+    """
+    `QueueListener` que espera a que haya sitio para la marca de fin: al
+    detenerse con la cola llena se escriben los registros pendientes.
+    """
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Un objeto JSON por línea con la hora UTC, el nivel, el logger, el mensaje,
+    el hilo y, si existen, la sesión, el turno y la traza de la excepción.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        session_id = getattr(record, "session_id", None)
+        if session_id is not None:
+            data["session_id"] = session_id
+        turn_id = getattr(record, "turn_id", None)
+        if turn_id is not None:
+            data["turn_id"] = turn_id
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+def _parse_rates(text: str) -> Dict[str, float]:
+    # "agent.conversation=0.1,tools=0.5" -> {"agent.conversation": 0.1, "tools": 0.5}
+    rates = {}
+    for item in text.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def configure_logging(level: Optional[str] = None,
+                      json_format: Optional[bool] = None,
+                      sample_rates: Optional[Mapping[str, float]] = None,
+                      queue_size: int = DEFAULT_QUEUE_SIZE,
+                      stream: Optional[TextIO] = None) -> QueueListener:
+    """
+    Configura el logging raíz del proceso con una cola acotada y un hilo que
+    escribe los registros, de modo que registrar no hace E/S en el hilo del turno.
+
+    Sin argumentos se usan `LOG_LEVEL` (INFO), `LOG_FORMAT` ("json" por
+    defecto o "text") y `LOG_SAMPLE` ("logger=fracción,..."). Llamadas
+    posteriores devuelven el mismo listener (Streamlit vuelve a ejecutar el
+    script en cada interacción).
+    """
+    global _listener, _queue_handler, _sampling
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+
+        level = level or os.getenv(ENV_LOG_LEVEL, "INFO")
+        if json_format is None:
+            json_format = os.getenv(ENV_LOG_FORMAT, "json").lower() != "text"
+        if sample_rates is None:
+            sample_rates = _parse_rates(os.getenv(ENV_LOG_SAMPLE, ""))
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+
+        log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        _queue_handler = BoundedQueueHandler(log_queue)
+        _queue_handler.addFilter(ContextFilter())
+        _sampling = None
+        if sample_rates:
+            _sampling = SamplingFilter(sample_rates)
+            _queue_handler.addFilter(_sampling)
+
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(_queue_handler)
+        root.setLevel(level.upper() if isinstance(level, str) else level)
+
+        _listener = _DrainingListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+
+def stop_logging() -> None:
+    """
+    Escribe los registros pendientes y detiene el hilo de logging.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            logging.getLogger().removeHandler(_queue_handler)
+
+
+def get_logging_metrics() -> Dict[str, Any]:
+    """
+    Estado de la cola de logging: registros pendientes, descartados y no muestreados.
+    """
+    if _queue_handler is None:
+        return {}
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "capacity": _queue_handler.queue.maxsize,
+        "dropped": _queue_handler.dropped,
+        "sampled_out": _sampling.sampled_out if _sampling is not None else 0,
+    }
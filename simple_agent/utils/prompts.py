@@ -14,6 +14,7 @@ REGLAS CRÍTICAS PARA EL USO DE HERRAMIENTAS:
    - Horas (qué hora es ahora, hora en otra ciudad, etc.)
    - Días festivos (cuáles son los feriados, próximos días festivos, etc.)
    - Zonas horarias (diferencia horaria, hora en otro país, etc.)
+   - Horarios de reuniones entre ciudades (mejor hora para una reunión entre Lima, Madrid y Tokio)
 
 2. SIEMPRE usa la herramienta "company_ranking" cuando el usuario pregunte CUALQUIER cosa relacionada con:
    - Rankings o clasificaciones de empresas
@@ -52,4 +53,56 @@ Sigue estas pautas generales:
 3. No inventes información o fuentes
 4. Mantén un tono conversacional natural
 5. Recuerda información importante sobre el usuario
-"""
\ No newline at end of file
+"""
+
+# Plantillas locales para responder sin LLM cuando la herramienta ya da la respuesta completa
+TOOL_ANSWER_TEMPLATES = {
+    "datetime": "{result}",
+    "company_ranking": "Aquí tienes el ranking solicitado:\n\n{result}"
+}
+
+DEFAULT_TOOL_ANSWER_TEMPLATE = "{result}"
+
+# Explicación del formato compacto con el que se envían los resultados de herramientas al LLM
+TOOL_RESULTS_FORMAT_NOTE = """Los resultados de herramientas vienen en formato compacto: una cabecera `tipo[clave=valor;...]`,
+una línea con los nombres de columna y una fila por línea, con los campos separados por `|`.
+Las fechas están en formato ISO y los importes son números en la unidad indicada en la cabecera.
+Preséntalos al usuario en español natural y con formato legible (por ejemplo, "USD 1,250 millones")."""
+
+# Respuestas múltiples en tubería: introducción, sección por solicitud y cierre
+MULTI_REQUEST_INTRO = "Aquí tienes la información que solicitaste:\n\n"
+
+MULTI_REQUEST_SECTION = "**{title}**\n\n{body}\n\n"
+
+MULTI_REQUEST_SECTION_PROMPT = """{system_prompt}
+
+El usuario pidió varias cosas a la vez. Redacta solo la sección sobre "{request}",
+breve y sin saludos ni despedidas, usando exactamente estos datos:
+
+{format_note}
+
+{result}
+"""
+
+MULTI_REQUEST_CLOSING = "¿Quieres que profundice en alguno de estos temas?"
+
+MULTI_REQUEST_CLOSING_PROMPT = """Acabas de responder al usuario sobre: {requests}.
+Escribe una o dos frases de cierre, en español, que conecten esos temas y ofrezcan más detalle.
+No repitas los datos."""
+
+MULTI_REQUEST_TIMEOUT_NOTICE = "No pude completar a tiempo: {requests}.\n\n"
+
+# Instrucciones finales del prompt de respuesta
+RESPONSE_INSTRUCTIONS = """Por favor, genera una respuesta apropiada para el usuario basada en toda esta información.
+Recuerda: 
+1. Usa EXACTAMENTE los datos proporcionados por las herramientas, no los inventes ni modifiques.
+2. Si las herramientas proporcionan nombres, cifras o datos específicos, úsalos tal cual.
+3. Cuando las herramientas devuelven resultados, haz que tu respuesta sea clara y directa."""
+
+# Prompt de respuesta combinada para solicitudes múltiples (modo sin tubería)
+COMBINED_RESPONSE_INTRO = """El usuario ha solicitado múltiples tipos de información. He obtenido los siguientes resultados:
+
+{format_note}"""
+
+COMBINED_RESPONSE_INSTRUCTIONS = """Por favor, genera una respuesta única que combine todos estos resultados de manera coherente y natural.
+La respuesta debe fluir bien y no parecer simplemente una lista de resultados pegados juntos."""
@@ -0,0 +1,59 @@
+import base64
+import os
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+# Avatares locales (se incrustan como data URI para no depender de servicios externos)
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+
+AVATAR_FILES = {
+    "user": "avatar_user.svg",
+    "assistant": "avatar_bot.svg"
+}
+
+# Clase CSS de la burbuja según el rol
+MESSAGE_CLASSES = {
+    "user": "user",
+    "assistant": "bot"
+}
+
+
+@lru_cache(maxsize=None)
+def avatar_data_uri(role: str) -> str:
+    """
+    Devuelve el avatar del rol como data URI SVG (se lee una sola vez por proceso).
+    """
+    path = os.path.join(STATIC_DIR, AVATAR_FILES.get(role, AVATAR_FILES["assistant"]))
+    with open(path, "rb") as f:
+        encoded = base64.b64encode(f.read()).decode("ascii")
+    return f"data:image/svg+xml;base64,{encoded}"
+
+
+def render_message_html(role: str, content: str) -> str:
+    """
+    Construye el bloque HTML de un mensaje del chat.
+    """
+    message_html = content.replace('\n', '<br>')
+    css_class = MESSAGE_CLASSES.get(role, "bot")
+    return (
+        f'<div class="chat-message {css_class}">'
+        f'<img src="{avatar_data_uri(role)}" class="avatar">'
+        f'<div class="message">{message_html}</div>'
+        f'</div>'
+    )
+
+
+def make_message(role: str, content: str) -> Dict[str, str]:
+    """
+    Crea una entrada del historial visual con su HTML ya renderizado, para que
+    cada mensaje se formatee una sola vez y no en cada re-ejecución.
+    """
+    return {"role": role, "content": content, "html": render_message_html(role, content)}
+
+
+def history_window(history: List[Dict[str, str]], visible_count: int) -> Tuple[int, List[Dict[str, str]]]:
+    """
+    Devuelve cuántos mensajes quedan ocultos y los últimos `visible_count` mensajes.
+    """
+    hidden = max(0, len(history) - visible_count)
+    return hidden, history[hidden:]